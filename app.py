@@ -1,16 +1,39 @@
 import streamlit as st
 import shutil
 from pathlib import Path
-from scripts.run_batch import run_batch, check_docker, fasta_txt_check
+import time
+from scripts.run_batch import check_docker
+from scripts.job_queue import (
+    submit_job,
+    list_jobs,
+    read_lines,
+    ensure_worker,
+    worker_alive,
+    read_max_jobs,
+    write_max_jobs,
+    LOG_FILE,
+    QUEUED,
+    RUNNING
+)
+from scripts.fasta_io import (
+    is_fasta_name,
+    is_supported_name,
+    open_upload,
+    save_upload,
+    validate_fasta_stream
+)
+from scripts.bgc_index import query_bgcs, known_products, remove_batch
+from scripts.domain_similarity import run_prescreen, OUTPUT_DIR as PRESCREEN_DIR
+from scripts.genome_preflight import (
+    preflight_batch,
+    observed_seconds_per_mb,
+    estimate_antismash_seconds
+)
 
 repo_root = Path(__file__).resolve().parent
 
 st.title("BGC Discovery Pipeline")
 
-### status log ###
-if "status_log" not in st.session_state:
-    st.session_state["status_log"] = []
-
 ### session state messages ###
 
 if "batch_created" in st.session_state:
@@ -32,8 +55,9 @@ with st.form("create_batch_form", clear_on_submit=True):
     )
 
     uploaded_files = st.file_uploader(
-        "Upload genome files. [fna / fasta / gbk / txt]",
-        type=["fna", "fasta", "gbk", "txt"],
+        "Upload genome files. [fna / fasta / gbk / txt, "
+        "or gzipped fna.gz / fasta.gz]",
+        type=["fna", "fasta", "gbk", "txt", "gz"],
         accept_multiple_files=True,
         key="create_batch_files"
     )
@@ -75,12 +99,21 @@ if (
 ### button creation ###
 if ready_to_create:
 
-    # validation tests
+    # validation tests, streamed record by record
     for uploaded_file in uploaded_files:
-        if uploaded_file.name.endswith(".txt"):
-            if not fasta_txt_check(uploaded_file.getvalue()):
+        if not is_supported_name(uploaded_file.name):
+            st.error(
+                f"{uploaded_file.name} is not a supported genome file."
+            )
+            st.stop()
+
+        if is_fasta_name(uploaded_file.name):
+            error = validate_fasta_stream(
+                open_upload(uploaded_file, uploaded_file.name)
+            )
+            if error is not None:
                 st.error(
-                    f"{uploaded_file.name} does not look like a FASTA file."
+                    f"{uploaded_file.name} is not a valid FASTA file: {error}."
                 )
                 st.stop()
 
@@ -88,11 +121,9 @@ if ready_to_create:
     input_dir = batch_dir / "input"
     input_dir.mkdir(parents=True)
 
-    # write the files
+    # write the files in chunks, decompressing gzip uploads
     for uploaded_file in uploaded_files:
-        file_path = input_dir / uploaded_file.name
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        save_upload(uploaded_file, uploaded_file.name, input_dir)
 
     # pass parameters and update session state
     st.session_state["batch_created"] = new_batch_name
@@ -137,6 +168,7 @@ if submitted and not delete_disabled:
 
     if batch_dir.exists():
         shutil.rmtree(batch_dir)
+        remove_batch(batch)
 
         # store message across rerun
         st.session_state["batch_deleted"] = batch
@@ -160,22 +192,135 @@ if cutoff_05:
 if cutoff_07:
     bigscape_cutoffs.append(0.7)
 
+### antismash settings ###
+
+st.subheader("antiSMASH settings")
+
+antismash_workers = st.number_input(
+    "Genomes to run at the same time",
+    min_value=1,
+    value=1,
+    step=1
+)
+
+antismash_cpus = st.number_input(
+    "CPUs per antiSMASH container (0 = antiSMASH default)",
+    min_value=0,
+    value=0,
+    step=1
+)
+
+antismash_core_budget = st.number_input(
+    "Total CPU cores shared by all antiSMASH containers "
+    "(0 = off; larger genomes start first and get more CPUs)",
+    min_value=0,
+    value=0,
+    step=1
+)
+
+split_chunks = st.number_input(
+    "Split multi-contig genomes into up to this many parallel antiSMASH runs "
+    "(1 = off; for large assemblies and MAGs)",
+    min_value=1,
+    value=1,
+    step=1
+)
+
+use_antismash_cache = st.checkbox(
+    "Reuse antiSMASH results and BiG-SCAPE domain annotations "
+    "of identical genomes and regions from other batches",
+    value=True
+)
+
+dedupe_genomes = st.checkbox(
+    "Run antiSMASH once per group of near-identical genomes "
+    "(e.g. clonal isolates) and reuse its results for the rest of the group",
+    value=False
+)
+
+genome_identity = st.number_input(
+    "ANI at or above which genomes count as near-identical",
+    min_value=0.9,
+    max_value=1.0,
+    value=0.999,
+    step=0.0005,
+    format="%.4f",
+    disabled=not dedupe_genomes
+)
+
+dedupe_regions = st.checkbox(
+    "Give BiG-SCAPE only one copy of identical regions "
+    "(copies share its gene cluster family)",
+    value=True
+)
+
+compact_outputs = st.checkbox(
+    "Compact antiSMASH outputs into indexed archives after the run "
+    "(saves disk; restore a genome's HTML report with scripts/antismash_archive.py extract)",
+    value=False
+)
+
+resume_run = st.checkbox(
+    "Resume: skip steps that already finished with the same inputs "
+    "(e.g. after an interrupted or failed run)",
+    value=True
+)
+
+### input check ###
+
+st.subheader("Check genome inputs")
+
+if st.button("Check inputs and estimate runtime"):
+    input_stats = preflight_batch(batches_dir / batch, batch)
+
+    st.dataframe([
+        {
+            "genome": s.genome_file,
+            "length (bp)": s.total_length,
+            "contigs": s.n_contigs,
+            "N50": s.n50,
+            "GC": f"{s.gc_content:.1%}",
+            "ambiguous": f"{s.ambiguous_fraction:.2%}",
+            "warnings": ", ".join(s.flags),
+        }
+        for s in input_stats
+    ])
+
+    flagged = [s.genome_file for s in input_stats if s.flags]
+    if flagged:
+        st.warning(
+            "Likely fragmented, truncated or unusual inputs: "
+            + ", ".join(flagged)
+        )
+
+    seconds_per_mb = observed_seconds_per_mb(batches_dir)
+    estimate = estimate_antismash_seconds(
+        input_stats,
+        workers=int(antismash_workers),
+        seconds_per_mb=seconds_per_mb
+    )
+    basis = "earlier runs" if seconds_per_mb else "a default rate"
+    st.info(
+        f"Estimated antiSMASH time: about {estimate / 3600:.1f} h "
+        f"with {int(antismash_workers)} genome(s) at a time (based on {basis})."
+    )
 
 ### run button ###
 
-status_box = st.empty()
+st.subheader("Run pipeline")
 
-def stream_status(msg: str):
-    """
-    Receive status updates from run_batch and display them live in Streamlit.
-    """
-    st.session_state["status_log"].append(msg)
-    status_box.write("\n".join(st.session_state["status_log"]))
+max_jobs = st.number_input(
+    "Pipeline runs executed at the same time (shared by all users)",
+    min_value=1,
+    value=read_max_jobs(),
+    step=1
+)
+if max_jobs != read_max_jobs():
+    write_max_jobs(max_jobs)
 
-if st.button("Run Pipeline"):
+status_box = st.empty()
 
-    # clear previous run messages
-    st.session_state["status_log"] = []
+if st.button("Run Pipeline"):
 
     # check Docker availability
     try:
@@ -189,16 +334,160 @@ if st.button("Run Pipeline"):
         status_box.error("Select at least one BiG-SCAPE cutoff.")
         st.stop()
 
+    # queue the run; a background worker executes it
+    job_id = submit_job(
+        batch,
+        bigscape_cutoffs,
+        options={
+            "antismash_workers": int(antismash_workers),
+            "antismash_cpus": int(antismash_cpus) or None,
+            "antismash_core_budget": int(antismash_core_budget) or None,
+            "antismash_cache_dir": (
+                str(repo_root / "cache" / "antismash")
+                if use_antismash_cache else None
+            ),
+            "domain_cache_dir": (
+                str(repo_root / "cache" / "bigscape_domains")
+                if use_antismash_cache else None
+            ),
+            "resume": resume_run,
+            "split_chunks": int(split_chunks) if split_chunks > 1 else None,
+            "genome_identity": float(genome_identity) if dedupe_genomes else None,
+            "dedupe_genomes": dedupe_genomes,
+            "dedupe_regions": dedupe_regions,
+            "compact_outputs": compact_outputs,
+        }
+    )
+    ensure_worker()
+
+    st.session_state["selected_job"] = job_id
     status_box.info(
-        f"Running batch `{batch}` with cutoffs {bigscape_cutoffs} "
+        f"Queued batch `{batch}` with cutoffs {bigscape_cutoffs} "
+        f"as job {job_id}."
     )
 
-    # run pipeline with live progress updates
-    with st.spinner("Pipeline running… this may take a while."):
-        run_batch(
-            batch,
-            bigscape_cutoffs,
-            status_callback=stream_status
-        )
+### jobs ###
+
+st.subheader("Pipeline jobs")
+
+jobs = list_jobs()
+jobs_active = any(j["status"] in (QUEUED, RUNNING) for j in jobs)
+
+if not jobs:
+    st.write("No pipeline runs yet.")
+else:
+    st.dataframe([
+        {
+            "job": j["id"],
+            "batch": j["batch"],
+            "cutoffs": ", ".join(str(c) for c in j["cutoffs"]),
+            "status": j["status"],
+            "error": j["error"] or "",
+        }
+        for j in jobs
+    ])
+
+    job_ids = [j["id"] for j in jobs]
+    selected = st.session_state.get("selected_job")
+    selected_job = st.selectbox(
+        "Show progress of job",
+        job_ids,
+        index=job_ids.index(selected) if selected in job_ids else 0
+    )
+    st.session_state["selected_job"] = selected_job
+
+    st.text("\n".join(read_lines(selected_job)) or "Waiting to start…")
+
+    with st.expander("Full log"):
+        st.text("\n".join(read_lines(selected_job, name=LOG_FILE)))
+
+    if jobs_active and not worker_alive():
+        ensure_worker()
+
+auto_refresh = st.checkbox(
+    "Refresh job progress automatically",
+    value=True
+)
+if st.button("Refresh now"):
+    st.rerun()
+
+### cross-batch search ###
+
+st.subheader("Search BGCs across batches")
+
+with st.form("bgc_search_form"):
+
+    search_products = st.multiselect(
+        "BGC types (all selected types must be present, e.g. NRPS + T1PKS "
+        "for hybrids)",
+        known_products()
+    )
+
+    search_min_kb = st.number_input(
+        "Minimum BGC length (kb)",
+        min_value=0.0,
+        value=0.0,
+        step=5.0
+    )
 
-    status_box.success("Pipeline finished successfully.")
\ No newline at end of file
+    search_genome = st.text_input("Genome ID (optional)")
+
+    search_batch = st.selectbox(
+        "Batch",
+        ["All batches"] + batches
+    )
+
+    searched = st.form_submit_button("Search")
+
+if searched:
+    results = query_bgcs(
+        products=search_products,
+        genome_id=search_genome or None,
+        batch_id=None if search_batch == "All batches" else search_batch,
+        min_length=int(search_min_kb * 1000) or None
+    )
+
+    if results:
+        st.write(f"{len(results)} BGCs found")
+        st.dataframe(results)
+    else:
+        st.info("No BGCs match this search.")
+
+### domain pre-screen ###
+
+st.subheader("Quick domain pre-screen")
+
+st.caption(
+    "Groups the antiSMASH regions of the selected batch into families by "
+    "shared domain content at the selected cutoffs, without Docker or "
+    "BiG-SCAPE. Needs finished antiSMASH results."
+)
+
+if st.button("Run domain pre-screen"):
+    batch_dir = batches_dir / batch
+
+    if not (batch_dir / "antismash").is_dir():
+        st.error("Run antiSMASH on this batch first.")
+    elif not bigscape_cutoffs:
+        st.error("Select at least one cutoff.")
+    else:
+        with st.spinner("Comparing domain content..."):
+            prescreen = run_prescreen(batch_dir, bigscape_cutoffs)
+
+        st.write(
+            f"{prescreen['regions']} regions, "
+            f"{prescreen['edges']} similar pairs"
+        )
+        st.dataframe([
+            {"cutoff": cutoff, "families": n}
+            for cutoff, n in prescreen["families"].items()
+        ])
+        st.caption(f"Results written to {batch_dir / PRESCREEN_DIR}")
+
+### job polling ###
+
+# rerun while jobs are active so their state stays current; the pipeline
+# itself runs in the background worker, not in this session
+if auto_refresh and jobs_active:
+    time.sleep(3)
+    st.rerun()
@@ -0,0 +1,227 @@
+from pathlib import Path
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from benchmarks.synthetic_batch import generate_batch
+from scripts.bgc_stats import DERIVED_TABLES, build_table
+from scripts.build_antismash_bgc_table import build_master_table
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_SCALES = [10, 100, 1000]
+BATCH_NAME = "bench"
+
+# slowdown (fraction) tolerated before a step counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# steps faster than this are too noisy to compare
+MIN_SECONDS = 0.1
+
+STEPS = ["master_table", *DERIVED_TABLES]
+
+### measurement ###
+
+def _peak_memory_bytes() -> int:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_step(step: str, batch_dir: Path, workers: int, results) -> None:
+    start = time.perf_counter()
+    if step == "master_table":
+        n_rows = build_master_table(
+            batch_dir,
+            BATCH_NAME,
+            incremental=False,
+            workers=workers
+        ).n_rows
+    else:
+        n_rows = build_table(batch_dir, BATCH_NAME, step)
+
+    results.put({
+        "seconds": round(time.perf_counter() - start, 4),
+        "peak_memory_bytes": _peak_memory_bytes(),
+        "rows": n_rows,
+    })
+
+
+def measure_step(step: str, batch_dir: Path, workers: int = 1) -> dict:
+    """
+    Run one pipeline step in a fresh process and measure its wall time and
+    peak memory, so steps do not inherit each other's memory high-water
+    mark.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_run_step,
+        args=(step, batch_dir, workers, results)
+    )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def run_benchmarks(
+    scales: list,
+    work_dir: Path,
+    workers: int = 1,
+    with_sequence: bool = True,
+    report=print
+) -> dict:
+    """
+    Generate a synthetic batch per scale (reused when already present) and
+    time the master table and every derived table on it.
+
+    Returns
+    ----
+    dict
+        ``{scale: {step: {"seconds", "peak_memory_bytes", "rows",
+        "genomes_per_second"}}}`` with scales as strings.
+    """
+    results = {}
+
+    for n_genomes in scales:
+        batch_dir = work_dir / f"synthetic_{n_genomes}"
+        if not (batch_dir / "antismash").exists():
+            report(f"Generating {n_genomes} synthetic genomes in {batch_dir}")
+            generate_batch(batch_dir, n_genomes, with_sequence=with_sequence)
+
+        scale_results = {}
+        for step in STEPS:
+            result = measure_step(step, batch_dir, workers=workers)
+            result["genomes_per_second"] = round(
+                n_genomes / max(result["seconds"], 1e-9), 1
+            )
+            scale_results[step] = result
+
+            memory = result["peak_memory_bytes"]
+            memory_label = f"{memory / 1024 ** 2:8.1f} MiB" if memory else "       n/a"
+            report(
+                f"{n_genomes:>6} genomes  {step:<28} {result['seconds']:9.3f} s  "
+                f"{result['genomes_per_second']:>10.1f} genomes/s  "
+                f"{memory_label}  {result['rows']} rows"
+            )
+
+        results[str(n_genomes)] = scale_results
+
+    return results
+
+### baseline ###
+
+def compare_to_baseline(
+    results: dict,
+    baseline: dict,
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_seconds: float = MIN_SECONDS
+) -> list:
+    """
+    Compare benchmark results against a stored baseline.
+
+    A step regresses when it is more than ``tolerance`` slower or uses more
+    than ``tolerance`` more peak memory than its baseline, or when it
+    produces a different number of rows. Steps where both runs took less
+    than ``min_seconds`` are not compared on time.
+
+    Returns
+    ----
+    list
+        One message per regression.
+    """
+    regressions = []
+
+    for scale, steps in results.items():
+        for step, result in steps.items():
+            base = baseline.get(scale, {}).get(step)
+            if base is None:
+                continue
+            label = f"{step} at {scale} genomes"
+
+            if result["rows"] != base["rows"]:
+                regressions.append(
+                    f"{label}: {result['rows']} rows, baseline {base['rows']}"
+                )
+
+            slow = max(result["seconds"], base["seconds"]) >= min_seconds
+            if slow and result["seconds"] > base["seconds"] * (1 + tolerance):
+                regressions.append(
+                    f"{label}: {result['seconds']:.3f} s, "
+                    f"baseline {base['seconds']:.3f} s"
+                )
+
+            memory, base_memory = result["peak_memory_bytes"], base["peak_memory_bytes"]
+            if memory and base_memory and memory > base_memory * (1 + tolerance):
+                regressions.append(
+                    f"{label}: peak memory {memory / 1024 ** 2:.1f} MiB, "
+                    f"baseline {base_memory / 1024 ** 2:.1f} MiB"
+                )
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the BGC table and statistics steps on synthetic batches"
+    )
+    parser.add_argument(
+        "--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+        help="numbers of genomes to benchmark"
+    )
+    parser.add_argument(
+        "--work-dir", type=Path, default=None,
+        help="where synthetic batches are generated and reused "
+             "(default: a temporary directory)"
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--no-sequence", action="store_true",
+        help="generate region files without the ORIGIN block"
+    )
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help="store these results as the new baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = run_benchmarks(
+            args.scales,
+            args.work_dir or Path(tmp_dir),
+            workers=args.workers,
+            with_sequence=not args.no_sequence
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    elif args.baseline.exists():
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
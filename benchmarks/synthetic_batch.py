@@ -0,0 +1,299 @@
+from pathlib import Path
+import argparse
+import random
+import sys
+import zlib
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# antiSMASH products with rough relative frequencies in bacterial genomes
+PRODUCTS = {
+    "NRPS": 18,
+    "T1PKS": 14,
+    "terpene": 14,
+    "NRPS-like": 10,
+    "RiPP-like": 8,
+    "siderophore": 6,
+    "lanthipeptide-class-i": 4,
+    "betalactone": 4,
+    "T3PKS": 4,
+    "arylpolyene": 3,
+    "butyrolactone": 3,
+    "ectoine": 3,
+    "hserlactone": 2,
+    "lassopeptide": 2,
+    "thiopeptide": 1,
+    "ladderane": 1,
+    "nucleoside": 1,
+    "phosphonate": 1,
+}
+
+# share of regions that are hybrids of two or three products
+HYBRID_RATE = 0.2
+
+# Pfam accessions typical for each product, so regions of the same product
+# share domain content; other domains are drawn from the whole of Pfam
+N_PFAM = 20000
+PRODUCT_DOMAINS = {
+    product: random.Random(zlib.crc32(product.encode())).sample(range(1, N_PFAM), 12)
+    for product in PRODUCTS
+}
+PRODUCT_DOMAIN_RATE = 0.8
+
+ORIGIN_WIDTH = 60
+QUALIFIER_WIDTH = 58
+FEATURE_INDENT = " " * 21
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+
+def _wrap_qualifier(key: str, value: str) -> list:
+    """
+    Lay out a quoted qualifier over continuation lines like GenBank does.
+    """
+    text = f'/{key}="{value}"'
+    return [
+        FEATURE_INDENT + text[i:i + QUALIFIER_WIDTH]
+        for i in range(0, len(text), QUALIFIER_WIDTH)
+    ]
+
+
+def _feature(key: str, location: str, qualifiers: list) -> list:
+    lines = [f"     {key:<16}{location}"]
+    for name, value in qualifiers:
+        lines += _wrap_qualifier(name, value)
+    return lines
+
+
+def _origin(sequence: str) -> list:
+    lines = ["ORIGIN"]
+    for i in range(0, len(sequence), ORIGIN_WIDTH):
+        chunk = sequence[i:i + ORIGIN_WIDTH]
+        blocks = " ".join(chunk[j:j + 10] for j in range(0, len(chunk), 10))
+        lines.append(f"{i + 1:>9} {blocks}")
+    lines.append("//")
+    return lines
+
+
+def region_record(
+    rng: random.Random,
+    contig_id: str,
+    region_number: int,
+    products: list,
+    length: int,
+    with_sequence: bool = True,
+    with_domains: bool = True
+) -> str:
+    """
+    Text of one antiSMASH-style region GenBank record.
+
+    The record has the header lines, protocluster/proto_core/region features
+    with antiSMASH's qualifiers, one CDS every ~1.2 kb with a translation,
+    optionally up to three ``PFAM_domain`` features per CDS drawn mostly
+    from the products' domain pools, and optionally the full nucleotide
+    sequence.
+    """
+    locus = contig_id.split(".")[0][:16]
+    offset = rng.randint(0, 5_000_000)
+
+    lines = [
+        f"LOCUS       {locus:<16} {length:>11} bp    DNA     linear   UNK 01-JAN-1980",
+        f"DEFINITION  {contig_id} region {region_number}.",
+        f"ACCESSION   {contig_id.split('.')[0]}",
+        f"VERSION     {contig_id}",
+        "KEYWORDS    .",
+        "SOURCE      synthetic",
+        "  ORGANISM  synthetic",
+        "            Unclassified.",
+        "FEATURES             Location/Qualifiers",
+    ]
+    lines += _feature("source", f"1..{length}", [
+        ("organism", "synthetic"),
+        ("mol_type", "genomic DNA"),
+    ])
+
+    for i, product in enumerate(products, start=1):
+        core_start = rng.randint(1, max(1, length // 3))
+        core_end = min(length, core_start + rng.randint(5_000, 20_000))
+        lines += _feature("protocluster", f"1..{length}", [
+            ("aStool", "rule-based-clusters"),
+            ("contig_edge", "False"),
+            ("core_location", f"[{core_start + offset}:{core_end + offset}]"),
+            ("cutoff", "20000"),
+            ("detection_rule", "cds(Condensation and (AMP-binding or A-OX))"),
+            ("neighbourhood", "20000"),
+            ("product", product),
+            ("protocluster_number", str(i)),
+            ("tool", "antismash"),
+        ])
+        lines += _feature("proto_core", f"{core_start}..{core_end}", [
+            ("aStool", "rule-based-clusters"),
+            ("product", product),
+            ("protocluster_number", str(i)),
+            ("tool", "antismash"),
+        ])
+
+    lines += _feature("region", f"1..{length}", [
+        ("candidate_cluster_numbers", "1"),
+        ("contig_edge", rng.choice(["True", "False"])),
+        *[("product", p) for p in products],
+        ("region_number", str(region_number)),
+        ("rules", "cds(Condensation and (AMP-binding or A-OX))"),
+        ("tool", "antismash"),
+    ])
+
+    position = 1
+    gene = 0
+    while position + 900 < length:
+        gene += 1
+        gene_length = rng.randint(300, 1800) // 3 * 3
+        end = min(length, position + gene_length - 1)
+        location = f"{position}..{end}"
+        if rng.random() < 0.5:
+            location = f"complement({location})"
+        translation = "".join(rng.choices(AMINO_ACIDS, k=gene_length // 3 - 1))
+        lines += _feature("CDS", location, [
+            ("codon_start", "1"),
+            ("gene_functions", "biosynthetic (rule-based-clusters)"),
+            ("locus_tag", f"{locus}_{gene:05d}"),
+            ("product", "hypothetical protein"),
+            ("protein_id", f"{locus}_{gene:05d}"),
+            ("transl_table", "11"),
+            ("translation", "M" + translation),
+        ])
+
+        if with_domains:
+            domain_start = position
+            for _ in range(rng.randint(0, 3)):
+                if rng.random() < PRODUCT_DOMAIN_RATE:
+                    accession = rng.choice(PRODUCT_DOMAINS[rng.choice(products)])
+                else:
+                    accession = rng.randint(1, N_PFAM)
+                domain_end = min(end, domain_start + rng.randint(150, 600))
+                lines += _feature("PFAM_domain", f"{domain_start}..{domain_end}", [
+                    ("aSTool", "fullhmmer"),
+                    ("db_xref", f"PF{accession:05d}.{rng.randint(10, 30)}"),
+                    ("locus_tag", f"{locus}_{gene:05d}"),
+                    ("score", f"{rng.uniform(20, 400):.1f}"),
+                ])
+                domain_start = domain_end + 1
+                if domain_start >= end:
+                    break
+
+        position = end + rng.randint(20, 300)
+
+    if with_sequence:
+        lines += _origin("".join(rng.choices("acgt", k=length)))
+    else:
+        lines.append("//")
+
+    return "\n".join(lines) + "\n"
+
+
+def _pick_products(rng: random.Random) -> list:
+    names = list(PRODUCTS)
+    weights = list(PRODUCTS.values())
+    n_products = 1
+    if rng.random() < HYBRID_RATE:
+        n_products = rng.choice([2, 2, 3])
+
+    products = []
+    while len(products) < n_products:
+        product = rng.choices(names, weights)[0]
+        if product not in products:
+            products.append(product)
+    return products
+
+
+def generate_batch(
+    batch_dir: Path,
+    n_genomes: int,
+    seed: int = 0,
+    regions_per_genome: tuple = (5, 40),
+    region_length: tuple = (10_000, 120_000),
+    contigs_per_genome: tuple = (1, 30),
+    with_sequence: bool = True,
+    with_domains: bool = True
+) -> int:
+    """
+    Write a synthetic batch with an ``antismash/`` directory shaped like
+    real antiSMASH output: one directory per genome holding
+    ``<contig>.region<NNN>.gbk`` files, numbered per contig.
+
+    The same seed always produces the same batch.
+
+    Parameters
+    ----
+    batch_dir : Path
+        Batch directory to create.
+    n_genomes : int
+        Number of genome directories.
+    seed : int
+        Random seed.
+    regions_per_genome, region_length, contigs_per_genome : tuple
+        Inclusive ranges the per-genome values are drawn from.
+    with_sequence : bool
+        Write the ORIGIN sequence block. Without it files are much smaller
+        but parsers that stop at the features are favoured.
+    with_domains : bool
+        Add ``PFAM_domain`` features to the CDSs.
+
+    Returns
+    ----
+    int
+        Number of region files written.
+    """
+    rng = random.Random(seed)
+    antismash_dir = batch_dir / "antismash"
+    antismash_dir.mkdir(parents=True, exist_ok=True)
+    n_files = 0
+
+    for g in range(n_genomes):
+        genome_dir = antismash_dir / f"genome_{g:05d}"
+        genome_dir.mkdir(exist_ok=True)
+
+        n_contigs = rng.randint(*contigs_per_genome)
+        contigs = [f"SYN{g:05d}{c:04d}.1" for c in range(n_contigs)]
+        region_counts = dict.fromkeys(contigs, 0)
+
+        for _ in range(rng.randint(*regions_per_genome)):
+            contig = rng.choice(contigs)
+            region_counts[contig] += 1
+            region_number = region_counts[contig]
+
+            record = region_record(
+                rng,
+                contig,
+                region_number,
+                _pick_products(rng),
+                rng.randint(*region_length),
+                with_sequence=with_sequence,
+                with_domains=with_domains
+            )
+            path = genome_dir / f"{contig.split('.')[0]}.region{region_number:03d}.gbk"
+            path.write_text(record)
+            n_files += 1
+
+    return n_files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic batch of antiSMASH region files"
+    )
+    parser.add_argument("batch_dir", type=Path)
+    parser.add_argument("--genomes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-sequence", action="store_true",
+        help="omit the ORIGIN block to keep the batch small"
+    )
+    args = parser.parse_args()
+
+    n_files = generate_batch(
+        args.batch_dir,
+        args.genomes,
+        seed=args.seed,
+        with_sequence=not args.no_sequence
+    )
+    print(f"{n_files} region files written to {args.batch_dir / 'antismash'}")
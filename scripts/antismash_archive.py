@@ -0,0 +1,350 @@
+from pathlib import Path
+import argparse
+import json
+import os
+import shutil
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import NamedTuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+try:
+    import zstandard
+except ImportError:  # archives are written with zlib instead
+    zstandard = None
+
+ARCHIVE_FILE = "antismash.pack"
+INDEX_FILE = "antismash.pack.json"
+ARCHIVE_VERSION = 1
+
+# region files extracted on demand from a compacted genome directory
+EXTRACTED_DIR = ".regions"
+
+REGION_PATTERN = "*.region*.gbk"
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 6
+
+# bytes compressed or decompressed at once
+COPY_SIZE = 1 << 20
+
+
+class CompactResult(NamedTuple):
+    genome_id: str
+    n_files: int
+    bytes_before: int
+    bytes_after: int
+    already_compacted: bool = False
+
+### codecs ###
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compressor(codec: str):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(ZLIB_LEVEL)
+
+
+def _decompressor(codec: str):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError(
+                "This antiSMASH archive is zstd-compressed; install the "
+                "'zstandard' package to read it"
+            )
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj()
+
+### index ###
+
+def is_archived(genome_dir: Path) -> bool:
+    return (genome_dir / INDEX_FILE).exists()
+
+
+@lru_cache(maxsize=256)
+def _load_index(index_path: str, mtime_ns: int) -> dict:
+    with open(index_path) as f:
+        index = json.load(f)
+    if index.get("version") != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported antiSMASH archive version in {index_path}")
+    return index
+
+
+def read_index(genome_dir: Path) -> dict:
+    """
+    The archive index of a compacted genome directory: its codec and, per
+    member path, ``[offset, compressed size, size, mtime_ns]``. Loaded
+    once per process while the index file is unchanged.
+    """
+    index_path = genome_dir / INDEX_FILE
+    return _load_index(str(index_path), index_path.stat().st_mtime_ns)
+
+
+def archive_has(genome_dir: Path, name: str) -> bool:
+    return is_archived(genome_dir) and name in read_index(genome_dir)["members"]
+
+### compaction ###
+
+def _loose_files(genome_dir: Path) -> list:
+    """
+    Files of an antiSMASH output directory that go into its archive;
+    dot files (markers, extracted regions) stay outside.
+    """
+    files = []
+    for path in sorted(genome_dir.rglob("*")):
+        rel = path.relative_to(genome_dir)
+        if path.is_file() and not any(part.startswith(".") for part in rel.parts):
+            if rel.as_posix() not in (ARCHIVE_FILE, INDEX_FILE):
+                files.append(path)
+    return files
+
+
+def _remove_loose(genome_dir: Path, files: list) -> None:
+    for path in files:
+        path.unlink(missing_ok=True)
+    for path in sorted(genome_dir.rglob("*"), reverse=True):
+        if path.is_dir() and not path.name.startswith("."):
+            try:
+                path.rmdir()
+            except OSError:
+                pass
+    shutil.rmtree(genome_dir / EXTRACTED_DIR, ignore_errors=True)
+
+
+def compact_genome_dir(genome_dir: Path, codec: str = None) -> CompactResult:
+    """
+    Replace the files of an antiSMASH output directory with one archive.
+
+    Every file is compressed as an independent frame into
+    ``antismash.pack``; ``antismash.pack.json`` records the byte offset
+    and sizes of each, so any member, e.g. one region GenBank file, is
+    read with a single seek and one small decompression. Both files are
+    written under temporary names and the index is put in place last,
+    before the originals are deleted, so an interrupted compaction leaves
+    the loose files readable. A directory that already has an index only
+    has leftover loose files removed, once they match it, and is reported
+    as ``already_compacted``.
+
+    Returns
+    ----
+    CompactResult
+        File count and disk usage before and after.
+    """
+    files = _loose_files(genome_dir)
+    bytes_before = sum(p.stat().st_size for p in files)
+
+    if is_archived(genome_dir):
+        members = read_index(genome_dir)["members"]
+        if all(
+            members.get(p.relative_to(genome_dir).as_posix(), [None] * 3)[2] == p.stat().st_size
+            for p in files
+        ):
+            _remove_loose(genome_dir, files)
+        archive_bytes = (genome_dir / ARCHIVE_FILE).stat().st_size
+        return CompactResult(
+            genome_dir.name, len(files), bytes_before, archive_bytes,
+            already_compacted=True
+        )
+
+    codec = codec or default_codec()
+    tmp_archive = genome_dir / f".{ARCHIVE_FILE}.tmp"
+    tmp_index = genome_dir / f".{INDEX_FILE}.tmp"
+    members = {}
+
+    with open(tmp_archive, "wb") as out:
+        for path in files:
+            offset = out.tell()
+            compressor = _compressor(codec)
+            with open(path, "rb") as src:
+                for chunk in iter(lambda: src.read(COPY_SIZE), b""):
+                    out.write(compressor.compress(chunk))
+            out.write(compressor.flush())
+            stat = path.stat()
+            members[path.relative_to(genome_dir).as_posix()] = [
+                offset, out.tell() - offset, stat.st_size, stat.st_mtime_ns
+            ]
+        out.flush()
+        os.fsync(out.fileno())
+
+    with open(tmp_index, "w") as f:
+        json.dump({"version": ARCHIVE_VERSION, "codec": codec, "members": members}, f)
+
+    os.replace(tmp_archive, genome_dir / ARCHIVE_FILE)
+    os.replace(tmp_index, genome_dir / INDEX_FILE)
+    _remove_loose(genome_dir, files)
+
+    bytes_after = (genome_dir / ARCHIVE_FILE).stat().st_size + (genome_dir / INDEX_FILE).stat().st_size
+    return CompactResult(genome_dir.name, len(files), bytes_before, bytes_after)
+
+
+def compact_batch(antismash_dir: Path, workers: int = 1, genome_ids: list = None) -> list:
+    """
+    Compact every genome directory of a batch (or those in
+    ``genome_ids``), spread over ``workers`` processes.
+
+    Returns
+    ----
+    list
+        ``CompactResult`` per genome directory.
+    """
+    genome_dirs = sorted(
+        d for d in antismash_dir.iterdir()
+        if d.is_dir() and not d.name.startswith(".")
+        and (genome_ids is None or d.name in genome_ids)
+    )
+    if workers > 1 and len(genome_dirs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(compact_genome_dir, genome_dirs))
+    return [compact_genome_dir(d) for d in genome_dirs]
+
+### access ###
+
+def _read_frame(genome_dir: Path, name: str, out=None) -> bytes:
+    index = read_index(genome_dir)
+    try:
+        offset, compressed, _, _ = index["members"][name]
+    except KeyError:
+        raise FileNotFoundError(f"{name} is not in the archive of {genome_dir}") from None
+
+    decompressor = _decompressor(index["codec"])
+    parts = []
+    with open(genome_dir / ARCHIVE_FILE, "rb") as f:
+        f.seek(offset)
+        remaining = compressed
+        while remaining:
+            data = f.read(min(COPY_SIZE, remaining))
+            if not data:
+                raise ValueError(f"Truncated antiSMASH archive in {genome_dir}")
+            remaining -= len(data)
+            chunk = decompressor.decompress(data)
+            if out is None:
+                parts.append(chunk)
+            else:
+                out.write(chunk)
+    return b"".join(parts)
+
+
+def read_member(genome_dir: Path, name: str) -> bytes:
+    """
+    Contents of one file of a compacted genome directory, e.g.
+    ``"NZ_CP012345.1.region001.gbk"``.
+    """
+    return _read_frame(genome_dir, name)
+
+
+def extract_member(genome_dir: Path, name: str, dest: Path) -> Path:
+    """
+    Write one archived file to ``dest``, streamed, with its original
+    modification time.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dest = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    with open(tmp_dest, "wb") as out:
+        _read_frame(genome_dir, name, out=out)
+    mtime_ns = read_index(genome_dir)["members"][name][3]
+    os.utime(tmp_dest, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp_dest, dest)
+    return dest
+
+
+def archived_region_files(genome_dir: Path) -> list:
+    """
+    Region GenBank files of a compacted genome directory, extracted on
+    first use to ``<genome>/.regions/`` and reused afterwards.
+    """
+    members = read_index(genome_dir)["members"]
+    paths = []
+    for name in members:
+        if "/" in name or not Path(name).match(REGION_PATTERN):
+            continue
+        dest = genome_dir / EXTRACTED_DIR / name
+        if not dest.exists() or dest.stat().st_size != members[name][2]:
+            extract_member(genome_dir, name, dest)
+        paths.append(dest)
+    return paths
+
+
+def extract_batch_regions(antismash_dir: Path) -> int:
+    """
+    Make sure the region files of every compacted genome directory are
+    extracted, e.g. before BiG-SCAPE reads ``antismash/`` directly.
+
+    Returns
+    ----
+    int
+        Number of compacted genome directories.
+    """
+    n_archived = 0
+    for genome_dir in sorted(antismash_dir.iterdir()):
+        if genome_dir.is_dir() and not genome_dir.name.startswith(".") and is_archived(genome_dir):
+            archived_region_files(genome_dir)
+            n_archived += 1
+    return n_archived
+
+
+def extract_genome_dir(genome_dir: Path) -> int:
+    """
+    Restore the full output directory of a compacted genome, e.g. to open
+    its HTML report, and remove the archive.
+
+    Returns
+    ----
+    int
+        Number of files restored.
+    """
+    members = read_index(genome_dir)["members"]
+    for name in members:
+        extract_member(genome_dir, name, genome_dir / name)
+    (genome_dir / INDEX_FILE).unlink()
+    (genome_dir / ARCHIVE_FILE).unlink()
+    shutil.rmtree(genome_dir / EXTRACTED_DIR, ignore_errors=True)
+    return len(members)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compact antiSMASH output directories into indexed archives"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = subparsers.add_parser("compact", help="compact every genome of a batch")
+    compact_parser.add_argument("--batch", required=True)
+    compact_parser.add_argument("--workers", type=int, default=1)
+
+    extract_parser = subparsers.add_parser("extract", help="restore a genome's full output")
+    extract_parser.add_argument("--batch", required=True)
+    extract_parser.add_argument("--genome", required=True)
+
+    cat_parser = subparsers.add_parser("cat", help="print one archived file")
+    cat_parser.add_argument("--batch", required=True)
+    cat_parser.add_argument("--genome", required=True)
+    cat_parser.add_argument("name")
+
+    args = parser.parse_args()
+
+    PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+    ANTISMASH_DIR = PIPELINE_ROOT / "batches" / args.batch / "antismash"
+
+    if args.command == "compact":
+        results = compact_batch(ANTISMASH_DIR, workers=args.workers)
+        compacted = [r for r in results if not r.already_compacted]
+        n_already = len(results) - len(compacted)
+        before = sum(r.bytes_before for r in compacted)
+        after = sum(r.bytes_after for r in compacted)
+        print(
+            f"Compacted {len(compacted)} genome(s): {before / 1e6:.1f} MB of files "
+            f"into {after / 1e6:.1f} MB of archives"
+            + (f"; {n_already} already compacted" if n_already else "")
+        )
+    elif args.command == "extract":
+        n_files = extract_genome_dir(ANTISMASH_DIR / args.genome)
+        print(f"Restored {n_files} file(s) to {ANTISMASH_DIR / args.genome}")
+    else:
+        sys.stdout.buffer.write(read_member(ANTISMASH_DIR / args.genome, args.name))
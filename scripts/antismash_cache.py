@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 200 * 1024 ** 3
+MANIFEST = "manifest.json"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """
+    Hardlink ``src`` to ``dst``, copying when a link is not possible
+    (different filesystem, unsupported, or not permitted).
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def image_digest(image: str, runner=subprocess.run) -> str:
+    """
+    Return the local image id of a docker image, or None if it cannot be
+    determined (image not pulled, docker unavailable).
+    """
+    try:
+        result = runner(
+            ["docker", "image", "inspect", "--format", "{{.Id}}", image],
+            check=True,
+            capture_output=True,
+            text=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    digest = (getattr(result, "stdout", "") or "").strip()
+    return digest or None
+
+
+class AntismashCache:
+    """
+    Content-addressed store of antiSMASH output directories shared by all
+    batches.
+
+    Entries are keyed by the genome file's content hash, the antiSMASH image
+    digest and the antiSMASH options. Each entry keeps a manifest with the
+    size and SHA-256 of every file, checked before the entry is reused, and
+    the least recently used entries are evicted once the cache grows beyond
+    ``max_bytes``.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    ### keys ###
+
+    @staticmethod
+    def key(genome: Path, digest: str, options: list) -> str:
+        h = hashlib.sha256(file_sha256(genome).encode())
+        h.update(b"\0" + digest.encode())
+        h.update(b"\0" + json.dumps(list(options)).encode())
+        return h.hexdigest()
+
+    def entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    ### reuse ###
+
+    def _read_manifest(self, entry: Path) -> dict:
+        try:
+            with open(entry / MANIFEST) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _verify(self, entry: Path, manifest: dict) -> bool:
+        output = entry / "output"
+        for rel, (size, sha) in manifest["files"].items():
+            path = output / rel
+            try:
+                if path.stat().st_size != size:
+                    return False
+            except OSError:
+                return False
+            if file_sha256(path) != sha:
+                return False
+        return True
+
+    def materialize(self, key: str, dest: Path, basename: str) -> bool:
+        """
+        Place a cached antiSMASH output directory at ``dest``.
+
+        Files are hardlinked where possible. Files named after the genome
+        the entry was created from are renamed to ``basename``. A corrupt
+        entry is dropped and reported as a miss. Batches in other
+        processes may evict the entry meanwhile, so the placed files are
+        checked against the manifest before ``dest`` is put in place, and
+        an incomplete copy is a miss too.
+
+        Returns
+        ----
+        bool
+            True on a cache hit, False on a miss.
+        """
+        entry = self.entry_dir(key)
+        manifest = self._read_manifest(entry)
+        if manifest is None:
+            return False
+
+        if not self._verify(entry, manifest):
+            shutil.rmtree(entry, ignore_errors=True)
+            return False
+
+        old_prefix = manifest["basename"] + "."
+        tmp_dest = dest.with_name(f".{dest.name}.cache-tmp")
+        shutil.rmtree(tmp_dest, ignore_errors=True)
+
+        try:
+            for rel, (size, _) in manifest["files"].items():
+                rel_path = Path(rel)
+                name = rel_path.name
+                if name.startswith(old_prefix):
+                    name = f"{basename}.{name[len(old_prefix):]}"
+                placed = tmp_dest / rel_path.parent / name
+                link_or_copy(entry / "output" / rel, placed)
+                if placed.stat().st_size != size:
+                    raise OSError(f"{placed} is incomplete")
+        except OSError:
+            # evicted by another process while being placed
+            shutil.rmtree(tmp_dest, ignore_errors=True)
+            return False
+
+        tmp_dest.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_dest, dest)
+        os.utime(entry / MANIFEST)
+        return True
+
+    ### store ###
+
+    def store(self, key: str, output_dir: Path, basename: str) -> None:
+        """
+        Add a finished antiSMASH output directory to the cache.
+        """
+        entry = self.entry_dir(key)
+        if (entry / MANIFEST).exists():
+            return
+
+        tmp_entry = entry.with_name(f"{key}.tmp-{os.getpid()}-{threading.get_ident()}")
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        files = {}
+        for path in sorted(output_dir.rglob("*")):
+            if not path.is_file():
+                continue
+            rel = path.relative_to(output_dir).as_posix()
+            link_or_copy(path, tmp_entry / "output" / rel)
+            files[rel] = [path.stat().st_size, file_sha256(path)]
+
+        manifest = {
+            "basename": basename,
+            "created": time.time(),
+            "total_bytes": sum(size for size, _ in files.values()),
+            "files": files,
+        }
+        with open(tmp_entry / MANIFEST, "w") as f:
+            json.dump(manifest, f)
+
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # another worker stored the same key first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        self.evict()
+
+    ### eviction ###
+
+    def evict(self) -> list:
+        """
+        Remove least recently used entries until the cache fits in
+        ``max_bytes``. Batches in other processes may evict at the same
+        time; ``materialize`` treats an entry removed under it as a miss.
+
+        Returns
+        ----
+        list
+            Keys of the removed entries.
+        """
+        with self._lock:
+            entries = []
+            for manifest_path in self.root.glob(f"*/*/{MANIFEST}"):
+                manifest = self._read_manifest(manifest_path.parent)
+                try:
+                    mtime = manifest_path.stat().st_mtime
+                except OSError:
+                    # evicted by another process
+                    continue
+                if manifest is None:
+                    continue
+                entries.append((mtime, manifest["total_bytes"], manifest_path.parent))
+
+            total = sum(size for _, size, _ in entries)
+            removed = []
+
+            for _, size, entry in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                removed.append(entry.name)
+
+            return removed
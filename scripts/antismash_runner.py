@@ -0,0 +1,441 @@
+import os
+import shutil
+import subprocess
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from scripts.antismash_archive import archive_has
+from scripts.antismash_cache import image_digest, file_sha256, AntismashCache
+from scripts.batch_state import fingerprint, BatchState
+from scripts.run_manifest import container_name, RunManifest
+from scripts.genome_scheduler import CoreBudget
+from scripts.genome_split import (
+    write_chunks,
+    merge_chunk_outputs,
+    remove_split,
+    index_fasta,
+    SPLIT_DIR,
+    CHUNKS_DIR
+)
+
+ANTISMASH_IMAGE = "antismash/standalone"
+
+# antiSMASH options that affect its results; part of the result cache key
+ANTISMASH_OPTIONS = ["--genefinding-tool", "prodigal"]
+
+# antiSMASH writes its HTML report last; output directories from before
+# checkpointing that have it are taken as complete
+LEGACY_COMPLETE_MARKER = "index.html"
+
+
+def antismash_step(genome: Path) -> str:
+    """
+    Name of a genome's antiSMASH step in the batch state.
+    """
+    return f"antismash:{genome.name}"
+
+
+def antismash_fingerprint(genome: Path) -> str:
+    return fingerprint(file_sha256(genome), ANTISMASH_OPTIONS)
+
+
+def partial_dir(antismash_dir: Path, genome: Path) -> Path:
+    """
+    Hidden directory antiSMASH writes to before its output is renamed into
+    place; skipped by everything reading ``antismash/``.
+    """
+    return antismash_dir / f".{genome.stem}.partial"
+
+
+def antismash_complete(
+    genome: Path,
+    genome_out: Path,
+    state: BatchState,
+    record_legacy: bool = True
+) -> bool:
+    """
+    Whether an existing output directory holds a finished antiSMASH run of
+    the current genome file. Without a batch state any existing directory
+    counts as finished. A legacy output directory is recorded in the state
+    unless ``record_legacy`` is False, e.g. for shard workers, which only
+    read the batch state.
+    """
+    if state is None:
+        return True
+
+    step = antismash_step(genome)
+    genome_fingerprint = antismash_fingerprint(genome)
+
+    if state.step(step) is None:
+        if (
+            (genome_out / LEGACY_COMPLETE_MARKER).exists()
+            or archive_has(genome_out, LEGACY_COMPLETE_MARKER)
+        ):
+            if record_legacy:
+                state.mark_complete(step, genome_fingerprint, [genome_out])
+            return True
+        return False
+
+    return state.is_complete(step, genome_fingerprint)
+
+
+def antismash_command(
+    genome: Path,
+    input_dir: Path,
+    antismash_dir: Path,
+    cpus: int = None,
+    name: str = None,
+    output_name: str = None
+) -> list:
+    """
+    Build the docker command running antiSMASH on a single genome.
+
+    Parameters
+    ----
+    genome : Path
+        Genome file inside the batch input directory.
+    input_dir : Path
+        Batch input directory, mounted as /input.
+    antismash_dir : Path
+        Batch antiSMASH directory, mounted as /output.
+    cpus : int, optional
+        CPU budget for the container. Applied both as the docker
+        ``--cpus`` limit and as antiSMASH's own ``--cpus`` thread count.
+    name : str, optional
+        Docker container name, e.g. for sampling its resource use.
+    output_name : str, optional
+        Output directory inside ``antismash_dir``; defaults to the genome
+        file's stem.
+
+    Returns
+    ----
+    list
+        The command, ready to be passed to ``subprocess.run``.
+    """
+    cmd = [
+        "docker", "run", "--rm",
+        "--platform", "linux/amd64",
+    ]
+    if cpus:
+        cmd += ["--cpus", str(cpus)]
+    if name:
+        cmd += ["--name", name]
+
+    cmd += [
+        "-v", f"{input_dir}:/input",
+        "-v", f"{antismash_dir}:/output",
+        ANTISMASH_IMAGE,
+        genome.name,
+        *ANTISMASH_OPTIONS,
+        "--output-dir", f"/output/{output_name or genome.stem}"
+    ]
+    if cpus:
+        cmd += ["--cpus", str(cpus)]
+
+    return cmd
+
+
+def run_antismash(
+    genome: Path,
+    input_dir: Path,
+    antismash_dir: Path,
+    cpus: int = None,
+    runner=subprocess.run,
+    name: str = None,
+    output_name: str = None
+) -> None:
+    """
+    Run antiSMASH on a single genome.
+
+    Raises
+    ----
+    subprocess.CalledProcessError
+        if the container exits with a non-zero status.
+    """
+    cmd = antismash_command(
+        genome,
+        input_dir,
+        antismash_dir,
+        cpus=cpus,
+        name=name,
+        output_name=output_name
+    )
+    runner(cmd, check=True)
+
+
+def run_antismash_split(
+    genome: Path,
+    input_dir: Path,
+    antismash_dir: Path,
+    output_name: str,
+    n_chunks: int,
+    cpus: int = None,
+    runner=subprocess.run,
+    name: str = None
+) -> int:
+    """
+    Run antiSMASH on a multi-contig genome as up to ``n_chunks`` parallel
+    containers and merge their results.
+
+    The contigs are split into FASTA chunks of balanced total length under
+    ``input/.split/<genome>/``; each chunk runs with an equal share of
+    ``cpus`` and writes to ``<output_name>/chunks/<chunk>``. The results
+    are merged into ``<output_name>`` as if antiSMASH had run on the whole
+    genome, see ``merge_chunk_outputs``.
+
+    Returns
+    ----
+    int
+        Number of chunks run.
+
+    Raises
+    ----
+    subprocess.CalledProcessError
+        if any chunk's container exits with a non-zero status.
+    """
+    split_dir = input_dir / SPLIT_DIR / genome.stem
+    remove_split(split_dir)
+    chunks = write_chunks(genome, n_chunks, split_dir)
+    chunk_cpus = max(1, cpus // len(chunks)) if cpus else None
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            futures = [
+                pool.submit(
+                    run_antismash,
+                    chunk.path,
+                    split_dir,
+                    antismash_dir,
+                    cpus=chunk_cpus,
+                    runner=runner,
+                    name=f"{name}-p{i}" if name else None,
+                    output_name=f"{output_name}/{CHUNKS_DIR}/{chunk.path.stem}"
+                )
+                for i, chunk in enumerate(chunks, start=1)
+            ]
+            for future in futures:
+                future.result()
+
+        merge_chunk_outputs(
+            antismash_dir / output_name,
+            genome,
+            chunks,
+            [contig.contig_id for contig in index_fasta(genome)]
+        )
+    finally:
+        remove_split(split_dir)
+
+    return len(chunks)
+
+
+def run_antismash_pool(
+    genomes: list,
+    input_dir: Path,
+    antismash_dir: Path,
+    workers: int = 1,
+    cpus: int = None,
+    runner=subprocess.run,
+    update_status=print,
+    cache: AntismashCache = None,
+    manifest: RunManifest = None,
+    genome_cpus: dict = None,
+    core_budget: CoreBudget = None,
+    state: BatchState = None,
+    genome_chunks: dict = None
+) -> dict:
+    """
+    Run antiSMASH on several genomes at once with a bounded worker pool.
+
+    Genomes are started in the order given. antiSMASH writes to a hidden
+    ``.<genome>.partial`` directory that is renamed into place once the
+    container succeeds, so a killed run never leaves a partial output
+    directory behind. Genomes with a finished output directory are
+    skipped; with ``state``, only if it was produced from the current
+    genome file, otherwise it is removed and antiSMASH runs again. A
+    failing genome is reported and recorded but does not stop the others.
+
+    Parameters
+    ----
+    genomes : list
+        Genome files inside ``input_dir``.
+    input_dir : Path
+        Batch input directory.
+    antismash_dir : Path
+        Batch antiSMASH directory.
+    workers : int
+        Maximum number of antiSMASH containers running at the same time.
+    cpus : int, optional
+        Per-container CPU budget, see ``antismash_command``.
+    runner : callable
+        Replacement for ``subprocess.run``, e.g. a stub docker runner.
+    update_status : callable
+        Receives per-genome status messages. Always called from the
+        calling thread, so it is safe to pass a Streamlit callback.
+    cache : AntismashCache, optional
+        Cross-batch result cache. Genomes found in it are materialized
+        instead of run, and fresh results are added to it.
+    manifest : RunManifest, optional
+        Receives an ``antismash`` stage per processed genome.
+    genome_cpus : dict, optional
+        Per-genome CPU counts overriding ``cpus``, e.g. from
+        ``plan_antismash_jobs``.
+    core_budget : CoreBudget, optional
+        Shared core budget; a container only starts once its CPUs are free.
+    state : BatchState, optional
+        Batch checkpoint record; every finished genome is marked complete
+        in it with the fingerprint of its genome file.
+    genome_chunks : dict, optional
+        Maps genomes to a number of chunks; those genomes are split by
+        contig and run as parallel containers, see ``run_antismash_split``.
+
+    Returns
+    ----
+    dict
+        Maps the file name of every failed genome to an error message.
+    """
+    messages = queue.Queue()
+    failures = {}
+
+    digest = None
+    if cache is not None:
+        digest = image_digest(ANTISMASH_IMAGE, runner=runner)
+        if digest is None:
+            update_status(
+                "antiSMASH result cache disabled "
+                "(could not determine the antiSMASH image digest)"
+            )
+
+    def process(genome: Path) -> None:
+        if manifest is None:
+            run_genome(genome, {}, None)
+            return
+
+        name = container_name("antismash", genome.stem)
+        with manifest.stage("antismash", genome.name, container=name,
+                            runner=runner) as record:
+            run_genome(genome, record, name)
+
+    def mark_complete(genome: Path, genome_out: Path) -> None:
+        if state is not None:
+            state.mark_complete(
+                antismash_step(genome),
+                antismash_fingerprint(genome),
+                [genome_out]
+            )
+
+    def run_genome(genome: Path, record: dict, name: str) -> None:
+        genome_out = antismash_dir / genome.stem
+        partial = partial_dir(antismash_dir, genome)
+        key = None
+
+        if state is not None:
+            state.invalidate(antismash_step(genome))
+
+        if digest is not None:
+            key = cache.key(genome, digest, ANTISMASH_OPTIONS)
+            if cache.materialize(key, genome_out, genome.stem):
+                mark_complete(genome, genome_out)
+                record["status"] = "cached"
+                messages.put(
+                    f"Reused cached antiSMASH results for {genome.name}"
+                )
+                return
+
+        genome_cpu_count = (genome_cpus or {}).get(genome, cpus)
+        if core_budget is not None:
+            genome_cpu_count = core_budget.acquire(genome_cpu_count or 1)
+
+        try:
+            cpu_label = f" with {genome_cpu_count} CPUs" if genome_cpu_count else ""
+            messages.put(f"Running antiSMASH on {genome.name}{cpu_label}")
+            shutil.rmtree(partial, ignore_errors=True)
+            n_chunks = (genome_chunks or {}).get(genome, 1)
+            if n_chunks > 1:
+                messages.put(f"Splitting {genome.name} into up to {n_chunks} chunks")
+                run_antismash_split(
+                    genome,
+                    input_dir,
+                    antismash_dir,
+                    partial.name,
+                    n_chunks,
+                    cpus=genome_cpu_count,
+                    runner=runner,
+                    name=name
+                )
+            else:
+                run_antismash(
+                    genome,
+                    input_dir,
+                    antismash_dir,
+                    cpus=genome_cpu_count,
+                    runner=runner,
+                    name=name,
+                    output_name=partial.name
+                )
+        finally:
+            if core_budget is not None:
+                core_budget.release(genome_cpu_count)
+
+        os.replace(partial, genome_out)
+        mark_complete(genome, genome_out)
+        record["exit_code"] = 0
+        messages.put(f"Finished antiSMASH on {genome.name}")
+
+        if key is not None:
+            try:
+                cache.store(key, genome_out, genome.stem)
+            except OSError as e:
+                messages.put(
+                    f"Could not add {genome.name} to the antiSMASH cache ({e})"
+                )
+
+    def drain() -> None:
+        while True:
+            try:
+                update_status(messages.get_nowait())
+            except queue.Empty:
+                return
+
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+
+        for genome in genomes:
+            genome_out = antismash_dir / genome.stem
+            if genome_out.exists():
+                if antismash_complete(genome, genome_out, state):
+                    update_status(
+                        f"Skipping antiSMASH for {genome.name} (already exists)"
+                    )
+                    continue
+
+                update_status(
+                    f"Re-running antiSMASH for {genome.name} "
+                    "(output incomplete or from a different genome file)"
+                )
+                shutil.rmtree(genome_out)
+
+            pending[pool.submit(process, genome)] = genome
+
+        while pending:
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            drain()
+
+            for future in done:
+                genome = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    continue
+
+                if isinstance(error, subprocess.CalledProcessError):
+                    reason = f"exit code {error.returncode}"
+                else:
+                    reason = str(error) or type(error).__name__
+
+                failures[genome.name] = reason
+                update_status(f"antiSMASH failed on {genome.name} ({reason})")
+
+        drain()
+
+    return failures
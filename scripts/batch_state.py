@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+STATE_FILE = "batch_state.json"
+STATE_VERSION = 1
+
+
+def fingerprint(*parts) -> str:
+    """
+    Stable hash of JSON-serializable step inputs, e.g. file hashes,
+    options and upstream fingerprints.
+    """
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class BatchState:
+    """
+    Checkpoint record of the completed steps of a batch.
+
+    Each step is stored with the fingerprint of its inputs and the outputs
+    it produced, relative to the batch directory. A step counts as complete
+    only while its fingerprint matches and all of its outputs still exist,
+    so changed inputs or deleted results invalidate it. A step is
+    invalidated before it runs, so a run killed halfway never leaves a
+    step marked complete over partial outputs. The state file is replaced
+    atomically after every change.
+    """
+
+    def __init__(self, batch_dir: Path):
+        self.batch_dir = Path(batch_dir)
+        self.path = self.batch_dir / STATE_FILE
+        self._lock = threading.Lock()
+        self.steps = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if state.get("version") != STATE_VERSION:
+            return {}
+        return state.get("steps", {})
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_name(f".{STATE_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": STATE_VERSION, "steps": self.steps}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def step(self, step: str) -> dict:
+        """
+        The recorded entry of a step, or None.
+        """
+        with self._lock:
+            entry = self.steps.get(step)
+            return dict(entry) if entry else None
+
+    def is_complete(self, step: str, step_fingerprint: str) -> bool:
+        entry = self.step(step)
+        if entry is None or entry["fingerprint"] != step_fingerprint:
+            return False
+        return all((self.batch_dir / rel).exists() for rel in entry["outputs"])
+
+    def mark_complete(
+        self,
+        step: str,
+        step_fingerprint: str,
+        outputs: list = (),
+        **detail
+    ) -> None:
+        """
+        Record a step as complete.
+
+        Parameters
+        ----
+        step : str
+            Step name, e.g. ``"antismash:genome.fna"``.
+        step_fingerprint : str
+            Fingerprint of the step's inputs, see ``fingerprint``.
+        outputs : list
+            Paths the step produced; all must exist for it to stay
+            complete.
+        **detail
+            Extra JSON-serializable values, e.g. the step's outcome.
+        """
+        entry = {
+            "fingerprint": step_fingerprint,
+            "outputs": [
+                Path(p).relative_to(self.batch_dir).as_posix()
+                if Path(p).is_absolute() else str(p)
+                for p in outputs
+            ],
+            "completed": time.time(),
+            **detail
+        }
+        with self._lock:
+            self.steps[step] = entry
+            self._save()
+
+    def invalidate(self, step: str) -> None:
+        with self._lock:
+            if self.steps.pop(step, None) is not None:
+                self._save()
+
+    def combined_fingerprint(self, steps: list) -> str:
+        """
+        Fingerprint over the recorded fingerprints of ``steps``, used as
+        the input fingerprint of a step that depends on all of them.
+        """
+        with self._lock:
+            return fingerprint(sorted(
+                (step, (self.steps.get(step) or {}).get("fingerprint"))
+                for step in steps
+            ))
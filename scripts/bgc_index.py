@@ -0,0 +1,260 @@
+from pathlib import Path
+import argparse
+import csv
+import sqlite3
+import sys
+
+PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_INDEX = PIPELINE_ROOT / "bgc_index.sqlite"
+
+COLUMNS = [
+    "batch_id",
+    "genome_id",
+    "contig_id",
+    "bgc_id",
+    "region_number",
+    "bgc_type",
+    "bgc_length_bp",
+    "bgc_start",
+    "bgc_end",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bgcs (
+    id INTEGER PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    genome_id TEXT NOT NULL,
+    contig_id TEXT,
+    bgc_id TEXT NOT NULL,
+    region_number TEXT,
+    bgc_type TEXT,
+    bgc_length_bp INTEGER,
+    bgc_start INTEGER,
+    bgc_end INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_bgcs_batch ON bgcs (batch_id);
+CREATE INDEX IF NOT EXISTS idx_bgcs_genome ON bgcs (genome_id);
+CREATE INDEX IF NOT EXISTS idx_bgcs_type ON bgcs (bgc_type);
+CREATE INDEX IF NOT EXISTS idx_bgcs_length ON bgcs (bgc_length_bp);
+
+-- one row per product of a (possibly hybrid) BGC
+CREATE TABLE IF NOT EXISTS bgc_products (
+    product TEXT NOT NULL,
+    bgc_rowid INTEGER NOT NULL REFERENCES bgcs (id),
+    PRIMARY KEY (product, bgc_rowid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_products_bgc ON bgc_products (bgc_rowid);
+"""
+
+
+def connect(db_path: Path = DEFAULT_INDEX) -> sqlite3.Connection:
+    """
+    Open the cross-batch BGC index, creating it if needed.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _delete_batch(conn: sqlite3.Connection, batch_name: str) -> None:
+    conn.execute(
+        "DELETE FROM bgc_products WHERE bgc_rowid IN "
+        "(SELECT id FROM bgcs WHERE batch_id = ?)",
+        (batch_name,)
+    )
+    conn.execute("DELETE FROM bgcs WHERE batch_id = ?", (batch_name,))
+
+
+def index_catalog(
+    batch_name: str,
+    catalog_csv: Path,
+    db_path: Path = DEFAULT_INDEX
+) -> int:
+    """
+    Replace the indexed BGCs of a batch with the rows of its
+    ``bgc_catalog.csv``.
+
+    Returns
+    ----
+    int
+        Number of BGCs indexed.
+    """
+    conn = connect(db_path)
+    n_rows = 0
+
+    try:
+        with conn, open(catalog_csv, newline="") as f:
+            _delete_batch(conn, batch_name)
+
+            for row in csv.DictReader(f):
+                cursor = conn.execute(
+                    f"INSERT INTO bgcs ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [
+                        batch_name,
+                        row["genome_id"],
+                        row["contig_id"],
+                        row["bgc_id"],
+                        row["region_number"],
+                        row["bgc_type"],
+                        int(row["bgc_length_bp"]),
+                        int(row["bgc_start"]),
+                        int(row["bgc_end"]),
+                    ]
+                )
+                products = {t.strip() for t in row["bgc_type"].split(";")}
+                conn.executemany(
+                    "INSERT INTO bgc_products (product, bgc_rowid) VALUES (?, ?)",
+                    [(p, cursor.lastrowid) for p in products]
+                )
+                n_rows += 1
+    finally:
+        conn.close()
+
+    return n_rows
+
+
+def remove_batch(batch_name: str, db_path: Path = DEFAULT_INDEX) -> None:
+    """
+    Drop every indexed BGC of a batch, e.g. after the batch was deleted.
+    """
+    if not Path(db_path).exists():
+        return
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            _delete_batch(conn, batch_name)
+    finally:
+        conn.close()
+
+
+def query_bgcs(
+    products: list = None,
+    genome_id: str = None,
+    batch_id: str = None,
+    min_length: int = None,
+    max_length: int = None,
+    limit: int = 1000,
+    db_path: Path = DEFAULT_INDEX
+) -> list:
+    """
+    Query indexed BGCs across all batches.
+
+    Parameters
+    ----
+    products : list, optional
+        antiSMASH products that must all be present, e.g.
+        ``["NRPS", "T1PKS"]`` for NRPS-T1PKS hybrids.
+    genome_id, batch_id : str, optional
+        Restrict the search to one genome or batch.
+    min_length, max_length : int, optional
+        BGC length bounds in bp, inclusive.
+    limit : int
+        Maximum number of rows returned.
+
+    Returns
+    ----
+    list
+        One dict per BGC with the catalog columns.
+    """
+    if not Path(db_path).exists():
+        return []
+
+    clauses = []
+    params = []
+
+    if products:
+        products = sorted(set(products))
+        clauses.append(
+            "id IN (SELECT bgc_rowid FROM bgc_products "
+            f"WHERE product IN ({', '.join('?' * len(products))}) "
+            "GROUP BY bgc_rowid HAVING COUNT(*) = ?)"
+        )
+        params += products + [len(products)]
+    if genome_id:
+        clauses.append("genome_id = ?")
+        params.append(genome_id)
+    if batch_id:
+        clauses.append("batch_id = ?")
+        params.append(batch_id)
+    if min_length is not None:
+        clauses.append("bgc_length_bp >= ?")
+        params.append(min_length)
+    if max_length is not None:
+        clauses.append("bgc_length_bp <= ?")
+        params.append(max_length)
+
+    sql = f"SELECT {', '.join(COLUMNS)} FROM bgcs"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY batch_id, genome_id, bgc_id LIMIT ?"
+    params.append(limit)
+
+    conn = connect(db_path)
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def known_products(db_path: Path = DEFAULT_INDEX) -> list:
+    """
+    All distinct antiSMASH products present in the index.
+    """
+    if not Path(db_path).exists():
+        return []
+
+    conn = connect(db_path)
+    try:
+        return [
+            row[0] for row in
+            conn.execute("SELECT DISTINCT product FROM bgc_products ORDER BY product")
+        ]
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Index and query BGCs across all batches"
+    )
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_cmd = commands.add_parser("index", help="(re)index a batch catalog")
+    index_cmd.add_argument("--batch", required=True)
+
+    query_cmd = commands.add_parser("query", help="search indexed BGCs")
+    query_cmd.add_argument(
+        "--type", action="append", dest="products",
+        help="product that must be present; repeat for hybrids"
+    )
+    query_cmd.add_argument("--genome")
+    query_cmd.add_argument("--batch")
+    query_cmd.add_argument("--min-length", type=int)
+    query_cmd.add_argument("--max-length", type=int)
+    query_cmd.add_argument("--limit", type=int, default=1000)
+
+    args = parser.parse_args()
+
+    if args.command == "index":
+        catalog = PIPELINE_ROOT / "batches" / args.batch / "bgc_catalog.csv"
+        n_rows = index_catalog(args.batch, catalog, db_path=args.index)
+        print(f"{n_rows} BGCs indexed from {catalog}")
+
+    else:
+        rows = query_bgcs(
+            products=args.products,
+            genome_id=args.genome,
+            batch_id=args.batch,
+            min_length=args.min_length,
+            max_length=args.max_length,
+            limit=args.limit,
+            db_path=args.index
+        )
+        writer = csv.DictWriter(sys.stdout, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,439 @@
+from pathlib import Path
+import csv
+import statistics
+from collections import defaultdict
+
+try:
+    import pandas as pd
+except ImportError:  # falls back to the pure Python summary
+    pd = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # columnar output is skipped
+    pa = None
+
+### file names ###
+
+MASTER_CSV = "master_bgc_antismash.csv"
+MASTER_PARQUET = "master_bgc_antismash.parquet"
+CATALOG_PARQUET = "bgc_catalog.parquet"
+GENOME_STATS_CSV = "genome_bgc_stats.csv"
+BATCH_STATS_CSV = "batch_bgc_stats.csv"
+TYPE_STATS_CSV = "bgc_type_stats.csv"
+CATALOG_CSV = "bgc_catalog.csv"
+
+### headers ###
+
+GENOME_STATS_HEADER = [
+    "batch_id",
+    "genome_id",
+    "total_bgcs",
+    "unique_bgc_types",
+    "mean_bgc_length",
+    "median_bgc_length",
+    "min_bgc_length",
+    "max_bgc_length"
+]
+
+BATCH_STATS_HEADER = [
+    "batch_id",
+    "total_genomes",
+    "total_bgcs",
+    "mean_bgcs_per_genome",
+    "median_bgcs_per_genome",
+    "unique_bgc_types",
+    "mean_bgc_length"
+]
+
+TYPE_STATS_HEADER = [
+    "batch_id",
+    "bgc_type",
+    "count"
+]
+
+MASTER_HEADER = [
+    "batch_id",
+    "genome_id",
+    "contig_id",
+    "bgc_id",
+    "region_number",
+    "bgc_type",
+    "bgc_start",
+    "bgc_end",
+    "bgc_length_bp",
+    "source_tool"
+]
+
+INTEGER_COLUMNS = {"bgc_start", "bgc_end", "bgc_length_bp"}
+
+CATALOG_HEADER = [
+    "batch_id",
+    "genome_id",
+    "contig_id",
+    "bgc_id",
+    "region_number",
+    "bgc_type",
+    "bgc_length_bp",
+    "bgc_start",
+    "bgc_end",
+]
+
+
+class BgcSummary:
+    """
+    Accumulates everything the derived tables need from a single pass over
+    the master BGC table.
+    """
+
+    def __init__(self):
+        self.genome_lengths = defaultdict(list)
+        self.genome_types = defaultdict(set)
+        self.type_counts = defaultdict(int)
+        self.bgc_types = set()
+        self.bgc_lengths = []
+        self.catalog = []
+
+    def add(self, row: dict) -> None:
+        genome_id = row["genome_id"]
+        length = int(row["bgc_length_bp"])
+        bgc_type = row["bgc_type"]
+
+        self.genome_lengths[genome_id].append(length)
+        self.genome_types[genome_id].add(bgc_type)
+        self.bgc_lengths.append(length)
+        self.bgc_types.add(bgc_type)
+
+        for t in bgc_type.split(";"):
+            self.type_counts[t.strip()] += 1
+
+        self.catalog.append([row[col] for col in CATALOG_HEADER])
+
+
+def _mean(values: list) -> float:
+    return round(statistics.mean(values), 2) if values else 0
+
+
+def _median(values: list) -> float:
+    return round(statistics.median(values), 2) if values else 0
+
+
+def load_master_table(batch_dir: Path) -> BgcSummary:
+    """
+    Read ``master_bgc_antismash.csv`` of a batch once and summarize it.
+    """
+    summary = BgcSummary()
+
+    with open(batch_dir / MASTER_CSV, newline="") as f:
+        for row in csv.DictReader(f):
+            summary.add(row)
+
+    return summary
+
+
+def genome_stats_rows(summary: BgcSummary, batch_name: str) -> list:
+    rows = []
+    for genome_id, lengths in summary.genome_lengths.items():
+        rows.append([
+            batch_name,
+            genome_id,
+            len(lengths),
+            len(summary.genome_types[genome_id]),
+            _mean(lengths),
+            _median(lengths),
+            min(lengths),
+            max(lengths)
+        ])
+    return rows
+
+
+def batch_stats_rows(summary: BgcSummary, batch_name: str) -> list:
+    bgcs_per_genome = [len(v) for v in summary.genome_lengths.values()]
+    return [[
+        batch_name,
+        len(bgcs_per_genome),
+        sum(bgcs_per_genome),
+        _mean(bgcs_per_genome),
+        _median(bgcs_per_genome),
+        len(summary.bgc_types),
+        _mean(summary.bgc_lengths)
+    ]]
+
+
+def type_stats_rows(summary: BgcSummary, batch_name: str) -> list:
+    return [
+        [batch_name, bgc_type, count]
+        for bgc_type, count in sorted(
+            summary.type_counts.items(), key=lambda x: -x[1]
+        )
+    ]
+
+
+def catalog_rows(summary: BgcSummary, batch_name: str) -> list:
+    return summary.catalog
+
+
+def write_table(path: Path, header: list, rows: list) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+### columnar output ###
+
+def columnar_available() -> bool:
+    return pa is not None
+
+
+def write_columnar(path: Path, header: list, rows: list) -> bool:
+    """
+    Write rows as a typed Parquet file next to the CSV. Length and
+    coordinate columns are stored as int64, everything else as strings.
+
+    Returns
+    ----
+    bool
+        False when pyarrow is not installed and nothing was written.
+    """
+    if pa is None:
+        return False
+
+    columns = {}
+    for i, col in enumerate(header):
+        values = [row[i] for row in rows]
+        if col in INTEGER_COLUMNS:
+            columns[col] = pa.array([int(v) for v in values], type=pa.int64())
+        else:
+            columns[col] = pa.array([str(v) for v in values], type=pa.string())
+
+    pq.write_table(pa.table(columns), path)
+    return True
+
+
+def load_master_frame(batch_dir: Path):
+    """
+    Load the master BGC table as a pandas DataFrame, preferring the Parquet
+    copy when it is at least as new as the CSV.
+    """
+    csv_path = batch_dir / MASTER_CSV
+    parquet_path = batch_dir / MASTER_PARQUET
+
+    if (
+        pa is not None
+        and parquet_path.exists()
+        and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+    ):
+        return pd.read_parquet(parquet_path)
+
+    dtypes = {
+        col: ("int64" if col in INTEGER_COLUMNS else str)
+        for col in MASTER_HEADER
+    }
+    return pd.read_csv(csv_path, dtype=dtypes, keep_default_na=False)
+
+
+### vectorized statistics ###
+
+def _format_mean(value: float):
+    # statistics.mean returns an int for integral means of ints
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+def _format_median(value: float, n: int):
+    # statistics.median returns the middle element itself for odd counts
+    return int(value) if n % 2 else round(float(value), 2)
+
+
+def _genome_frame(df, batch_name: str):
+    by_genome = df.groupby("genome_id", sort=False)
+    lengths = by_genome["bgc_length_bp"]
+
+    genome = pd.DataFrame({
+        "total_bgcs": lengths.size(),
+        "unique_bgc_types": by_genome["bgc_type"].nunique(),
+        "mean_bgc_length": lengths.mean(),
+        "median_bgc_length": lengths.median(),
+        "min_bgc_length": lengths.min(),
+        "max_bgc_length": lengths.max(),
+    })
+    # object columns keep the int / float distinction of the CSV output
+    genome["mean_bgc_length"] = pd.Series(
+        [_format_mean(m) for m in genome["mean_bgc_length"]],
+        index=genome.index,
+        dtype=object
+    )
+    genome["median_bgc_length"] = pd.Series(
+        [
+            _format_median(m, n)
+            for m, n in zip(genome["median_bgc_length"], genome["total_bgcs"])
+        ],
+        index=genome.index,
+        dtype=object
+    )
+    genome = genome.reset_index()
+    genome.insert(0, "batch_id", batch_name)
+    return genome[GENOME_STATS_HEADER]
+
+
+def _batch_frame(df, batch_name: str):
+    per_genome = df.groupby("genome_id", sort=False).size()
+    return pd.DataFrame([[
+        batch_name,
+        len(per_genome),
+        int(per_genome.sum()),
+        _format_mean(per_genome.mean()),
+        _format_median(per_genome.median(), len(per_genome)),
+        df["bgc_type"].nunique(),
+        _format_mean(df["bgc_length_bp"].mean())
+    ]], columns=BATCH_STATS_HEADER)
+
+
+def _type_frame(df, batch_name: str):
+    types = (
+        df["bgc_type"].str.split(";").explode().str.strip()
+        .to_frame("bgc_type")
+        .groupby("bgc_type", sort=False).size()
+        .sort_values(ascending=False, kind="stable")
+        .rename("count")
+        .reset_index()
+    )
+    types.insert(0, "batch_id", batch_name)
+    return types[TYPE_STATS_HEADER]
+
+
+def _catalog_frame(df, batch_name: str):
+    return df[CATALOG_HEADER]
+
+
+def frame_tables(df, batch_name: str, output_names: list = None) -> dict:
+    """
+    Compute the derived tables named in ``output_names`` (all by default)
+    from the master DataFrame with group-bys instead of per-row Python
+    loops.
+
+    Returns
+    ----
+    dict
+        Maps each output file name to a DataFrame ready for ``to_csv``.
+    """
+    return {
+        output_name: build_frame(df, batch_name)
+        for output_name, build_frame in FRAME_TABLES.items()
+        if output_names is None or output_name in output_names
+    }
+
+
+### building ###
+
+# output file -> (header, row builder)
+DERIVED_TABLES = {
+    GENOME_STATS_CSV: (GENOME_STATS_HEADER, genome_stats_rows),
+    BATCH_STATS_CSV: (BATCH_STATS_HEADER, batch_stats_rows),
+    TYPE_STATS_CSV: (TYPE_STATS_HEADER, type_stats_rows),
+    CATALOG_CSV: (CATALOG_HEADER, catalog_rows),
+}
+
+# output file -> DataFrame builder, used when pandas is installed
+FRAME_TABLES = {
+    GENOME_STATS_CSV: _genome_frame,
+    BATCH_STATS_CSV: _batch_frame,
+    TYPE_STATS_CSV: _type_frame,
+    CATALOG_CSV: _catalog_frame,
+}
+
+
+def derived_tables(
+    batch_dir: Path,
+    batch_name: str,
+    output_names: list = None
+) -> dict:
+    """
+    Compute the derived tables named in ``output_names`` (all by default)
+    of a batch from one read of the master table, vectorized with pandas
+    when it is installed.
+
+    Returns
+    ----
+    dict
+        Maps each output file name to either a DataFrame or a
+        ``(header, rows)`` pair.
+    """
+    if pd is not None:
+        df = load_master_frame(batch_dir)
+        if len(df):
+            return frame_tables(df, batch_name, output_names)
+
+    summary = load_master_table(batch_dir)
+    return {
+        output_name: (header, build_rows(summary, batch_name))
+        for output_name, (header, build_rows) in DERIVED_TABLES.items()
+        if output_names is None or output_name in output_names
+    }
+
+
+def _write_output(path: Path, table) -> int:
+    if isinstance(table, tuple):
+        header, rows = table
+        write_table(path, header, rows)
+        return len(rows)
+
+    table.to_csv(path, index=False, lineterminator="\r\n")
+    return len(table)
+
+
+def build_table(batch_dir: Path, batch_name: str, output_name: str) -> int:
+    """
+    Build a single derived table, used by the per-table CLI scripts.
+
+    Returns
+    ----
+    int
+        Number of rows written.
+    """
+    table = derived_tables(batch_dir, batch_name, [output_name])[output_name]
+    return _write_output(batch_dir / output_name, table)
+
+
+def build_all_stats(
+    batch_dir: Path,
+    batch_name: str,
+    catalog_parquet: bool = False
+) -> dict:
+    """
+    Build every derived table of a batch from one read of the master table.
+
+    Parameters
+    ----
+    batch_dir : Path
+        Batch directory containing ``master_bgc_antismash.csv``.
+    batch_name : str
+        Batch name written to the ``batch_id`` column.
+    catalog_parquet : bool
+        Also write ``bgc_catalog.parquet`` when pyarrow is installed.
+
+    Returns
+    ----
+    dict
+        Maps each output file name to its path.
+    """
+    outputs = {}
+    tables = derived_tables(batch_dir, batch_name)
+
+    for output_name, table in tables.items():
+        output = batch_dir / output_name
+        _write_output(output, table)
+        outputs[output_name] = output
+
+    if catalog_parquet and pa is not None:
+        output = batch_dir / CATALOG_PARQUET
+        catalog = tables[CATALOG_CSV]
+        if isinstance(catalog, tuple):
+            write_columnar(output, *catalog)
+        else:
+            catalog.to_parquet(output, index=False)
+        outputs[CATALOG_PARQUET] = output
+
+    return outputs
@@ -0,0 +1,406 @@
+from pathlib import Path
+import argparse
+import csv
+import statistics
+import sys
+from collections import Counter
+from typing import NamedTuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.bigscape_runner import cutoff_dir_name, CUTOFF_SUFFIX
+from scripts.build_antismash_bgc_table import region_files
+from scripts.genbank_regions import read_region_header
+from scripts.genome_sketch import propagated_from
+from scripts.region_dedup import read_region_groups
+from scripts.union_find import UnionFind
+
+### file names ###
+
+GCF_MEMBERS_CSV = "gcf_members.csv"
+GCF_STATS_CSV = "gcf_stats.csv"
+GCF_SUMMARY_CSV = "gcf_summary.csv"
+
+NETWORK_GLOB = "*.network"
+CLUSTERING_GLOB = "*_clustering_c*.tsv"
+
+# BiG-SCAPE's class combining every BGC, written because of --mix
+MIX_CLASS = "mix"
+
+### headers ###
+
+GCF_MEMBERS_HEADER = [
+    "batch_id",
+    "cutoff",
+    "bgc_id",
+    "genome_id",
+    "contig_id",
+    "bgc_name",
+    "gcf_id",
+    "gcf_size",
+]
+
+GCF_STATS_HEADER = [
+    "batch_id",
+    "cutoff",
+    "gcf_id",
+    "n_bgcs",
+    "n_genomes",
+    "singleton",
+]
+
+GCF_SUMMARY_HEADER = [
+    "batch_id",
+    "cutoff",
+    "source",
+    "total_bgcs",
+    "total_gcfs",
+    "singleton_gcfs",
+    "singleton_rate",
+    "mean_gcf_size",
+    "max_gcf_size",
+    "mean_genomes_per_gcf",
+    "unmatched_names",
+]
+
+
+class BgcNode(NamedTuple):
+    bgc_id: str
+    genome_id: str
+    contig_id: str
+    bgc_name: str
+
+
+class CutoffFamilies(NamedTuple):
+    cutoff: float
+    source: str
+    family_numbers: list
+    unmatched: int
+
+
+class BatchRegions(NamedTuple):
+    nodes: list
+    names: dict
+    copies: list
+
+### BiG-SCAPE names ###
+
+def region_contig_id(gbk_file: Path) -> str:
+    """
+    Record identifier of a region file as written to the master table's
+    ``contig_id``; the file name's record prefix when the header cannot
+    be read.
+    """
+    try:
+        region = read_region_header(gbk_file)
+    except Exception:
+        region = None
+    if region is None:
+        return gbk_file.stem.rpartition(".region")[0]
+    return region.contig_id
+
+
+def batch_regions(antismash_dir: Path, region_groups: dict = None) -> BatchRegions:
+    """
+    Every region of a batch as a family node, and the BiG-SCAPE name
+    (region file stem) of each node.
+
+    Names that occur in more than one genome directory are left out of the
+    name map, since BiG-SCAPE itself only keeps one of them; those regions
+    stay singletons.
+
+    Regions BiG-SCAPE did not see are not named but listed as copies of
+    the region standing in for them, and join its family. With
+    ``region_groups`` (see ``scripts/region_dedup.py``) these are the
+    regions that were not staged, mapped by ``(genome_id, name)`` to their
+    representative. Otherwise they are the regions of genomes whose results
+    were propagated from a near-identical genome (see
+    ``scripts/genome_sketch.py``), standing in for its region of the same
+    name.
+
+    Returns
+    ----
+    BatchRegions
+        Nodes ordered by genome and region, names mapping each BiG-SCAPE
+        name to its node index, and ``(copy node, original node)`` pairs.
+    """
+    nodes = []
+    names = {}
+    duplicates = set()
+    located = {}
+    pending = []
+
+    genome_dirs = sorted(
+        d for d in antismash_dir.iterdir()
+        if d.is_dir() and not d.name.startswith(".")
+    )
+
+    for genome_dir in genome_dirs:
+        genome_id = genome_dir.name
+        source = None if region_groups is not None else propagated_from(genome_dir)
+        for gbk_file in region_files(genome_dir):
+            region_number = gbk_file.stem.split(".region")[-1]
+            located[(genome_id, gbk_file.stem)] = len(nodes)
+
+            if region_groups is not None:
+                original = region_groups.get((genome_id, gbk_file.stem))
+            else:
+                original = (source, gbk_file.stem) if source is not None else None
+
+            if original is not None:
+                pending.append((len(nodes), original))
+            else:
+                if gbk_file.stem in names:
+                    duplicates.add(gbk_file.stem)
+                names[gbk_file.stem] = len(nodes)
+            nodes.append(BgcNode(
+                f"{genome_id}|region{region_number}",
+                genome_id,
+                region_contig_id(gbk_file),
+                gbk_file.stem
+            ))
+
+    for name in duplicates:
+        del names[name]
+
+    copies = [
+        (node, located[original])
+        for node, original in pending
+        if original in located
+    ]
+    return BatchRegions(nodes, names, copies)
+
+### streaming readers ###
+
+def _data_rows(path: Path):
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        for row in csv.reader(f, delimiter="\t"):
+            if row and not row[0].startswith("#"):
+                yield row
+
+
+def iter_network_edges(path: Path):
+    """
+    Yield ``(name_a, name_b, raw_distance)`` for every edge of a BiG-SCAPE
+    ``.network`` file, one line at a time.
+    """
+    for row in _data_rows(path):
+        if len(row) < 3:
+            continue
+        try:
+            distance = float(row[2])
+        except ValueError:  # header line
+            continue
+        yield row[0], row[1], distance
+
+
+def iter_clustering(path: Path):
+    """
+    Yield ``(bgc name, family number)`` for every row of a BiG-SCAPE
+    ``_clustering_cX.XX.tsv`` file.
+    """
+    for row in _data_rows(path):
+        if len(row) >= 2:
+            yield row[0], row[1].strip()
+
+
+def cutoff_files(cutoff_dir: Path, cutoff: float, pattern: str) -> list:
+    """
+    BiG-SCAPE files of one cutoff matching ``pattern``, restricted to the
+    ``mix`` class when it has any.
+    """
+    network_dir = cutoff_dir / "network_files"
+    if not network_dir.is_dir():
+        return []
+
+    files = []
+    for path in sorted(network_dir.rglob(pattern)):
+        match = CUTOFF_SUFFIX.search(path.name)
+        if match and round(float(match.group(1)), 2) == round(cutoff, 2):
+            files.append(path)
+
+    mix = [p for p in files if p.parent.name == MIX_CLASS]
+    return mix or files
+
+### families ###
+
+def _numbered(sets: UnionFind, n_nodes: int) -> list:
+    roots = [sets.find(i) for i in range(n_nodes)]
+    sizes = Counter(roots)
+    first = {}
+    for i, root in enumerate(roots):
+        first.setdefault(root, i)
+
+    order = sorted(sizes, key=lambda r: (-sizes[r], first[r]))
+    numbers = {root: n for n, root in enumerate(order, start=1)}
+    return [numbers[root] for root in roots]
+
+
+def cutoff_families(
+    cutoff_dir: Path,
+    cutoff: float,
+    names: dict,
+    n_nodes: int,
+    copies: list = ()
+) -> CutoffFamilies:
+    """
+    Gene cluster families of one cutoff.
+
+    BiG-SCAPE's clustering files are used when present; BGCs sharing a
+    family number in the same file are joined, and families of different
+    class files that share a BGC are merged. Without clustering files the
+    families are the connected components of the network files, counting
+    only edges closer than ``cutoff``. Files are read line by line, so
+    memory grows with the number of BGCs, not with the number of edges.
+    Each ``(copy, original)`` node pair in ``copies`` is joined as well.
+
+    Returns
+    ----
+    CutoffFamilies
+        The source used (``"clustering"``, ``"network"`` or ``"none"``),
+        the family number of every node and the number of names that did
+        not match a region of the batch (e.g. MIBiG reference BGCs).
+    """
+    sets = UnionFind(n_nodes)
+    unmatched = set()
+    source = "none"
+
+    clustering = cutoff_files(cutoff_dir, cutoff, CLUSTERING_GLOB)
+    if clustering:
+        source = "clustering"
+        for path in clustering:
+            first_member = {}
+            for name, family in iter_clustering(path):
+                node = names.get(name)
+                if node is None:
+                    unmatched.add(name)
+                    continue
+                sets.union(first_member.setdefault(family, node), node)
+    else:
+        networks = cutoff_files(cutoff_dir, cutoff, NETWORK_GLOB)
+        if networks:
+            source = "network"
+        for path in networks:
+            for name_a, name_b, distance in iter_network_edges(path):
+                a = names.get(name_a)
+                b = names.get(name_b)
+                if a is None or b is None:
+                    unmatched.update(
+                        n for n, i in ((name_a, a), (name_b, b)) if i is None
+                    )
+                    continue
+                if distance < cutoff:
+                    sets.union(a, b)
+
+    for copy, original in copies:
+        sets.union(copy, original)
+
+    return CutoffFamilies(cutoff, source, _numbered(sets, n_nodes), len(unmatched))
+
+### output ###
+
+def _write(path: Path, header: list, rows) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def gcf_id(number: int) -> str:
+    return f"GCF{number:05d}"
+
+
+def build_gcf_tables(
+    batch_dir: Path,
+    batch_name: str,
+    cutoffs: list
+) -> list:
+    """
+    Build the gene cluster family tables of every cutoff of a batch.
+
+    Writes ``gcf_members.csv`` (one row per BGC) and ``gcf_stats.csv`` (one
+    row per family with its size and genome count) to each
+    ``bigscape/cutoff_X/``, and ``bigscape/gcf_summary.csv`` with the
+    family count, singleton rate and mean family size per cutoff. Regions
+    left out of BiG-SCAPE's input as duplicates are given the family of the
+    region that was run in their place.
+
+    ``gcf_members.csv`` joins with ``master_bgc_antismash.csv`` on
+    ``bgc_id`` and ``contig_id``. antiSMASH numbers regions per record, so
+    ``bgc_id`` alone repeats across the contigs of a genome. ``bgc_name``
+    is the region file name.
+
+    Returns
+    ----
+    list
+        The summary rows, one per cutoff.
+    """
+    bigscape_dir = batch_dir / "bigscape"
+    nodes, names, copies = batch_regions(
+        batch_dir / "antismash",
+        read_region_groups(bigscape_dir)
+    )
+    summary = []
+
+    for cutoff in cutoffs:
+        cutoff_dir = bigscape_dir / cutoff_dir_name(cutoff)
+        cutoff_dir.mkdir(parents=True, exist_ok=True)
+
+        result = cutoff_families(cutoff_dir, cutoff, names, len(nodes), copies)
+        numbers = result.family_numbers
+        sizes = Counter(numbers)
+        genomes = {}
+        for node, number in zip(nodes, numbers):
+            genomes.setdefault(number, set()).add(node.genome_id)
+
+        _write(cutoff_dir / GCF_MEMBERS_CSV, GCF_MEMBERS_HEADER, (
+            [batch_name, cutoff, node.bgc_id, node.genome_id, node.contig_id,
+             node.bgc_name, gcf_id(number), sizes[number]]
+            for node, number in zip(nodes, numbers)
+        ))
+
+        _write(cutoff_dir / GCF_STATS_CSV, GCF_STATS_HEADER, (
+            [batch_name, cutoff, gcf_id(number), sizes[number],
+             len(genomes[number]), int(sizes[number] == 1)]
+            for number in sorted(sizes)
+        ))
+
+        singletons = sum(1 for size in sizes.values() if size == 1)
+        summary.append([
+            batch_name,
+            cutoff,
+            result.source,
+            len(nodes),
+            len(sizes),
+            singletons,
+            round(singletons / len(nodes), 4) if nodes else 0,
+            round(statistics.mean(sizes.values()), 2) if sizes else 0,
+            max(sizes.values(), default=0),
+            round(statistics.mean(len(g) for g in genomes.values()), 2) if genomes else 0,
+            result.unmatched,
+        ])
+
+    _write(bigscape_dir / GCF_SUMMARY_CSV, GCF_SUMMARY_HEADER, summary)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build gene cluster family tables from BiG-SCAPE results"
+    )
+    parser.add_argument("--batch", required=True)
+    parser.add_argument("--cutoffs", type=float, nargs="+", default=[0.3])
+    args = parser.parse_args()
+
+    PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+    BATCH_DIR = PIPELINE_ROOT / "batches" / args.batch
+
+    for row in build_gcf_tables(BATCH_DIR, args.batch, args.cutoffs):
+        summary = dict(zip(GCF_SUMMARY_HEADER, row))
+        print(
+            f"Cutoff {summary['cutoff']}: {summary['total_gcfs']} GCFs from "
+            f"{summary['total_bgcs']} BGCs ({summary['source']}), "
+            f"singleton rate {summary['singleton_rate']}"
+        )
+    print(f"GCF summary written to {BATCH_DIR / 'bigscape' / GCF_SUMMARY_CSV}")
@@ -0,0 +1,318 @@
+import queue
+import re
+import shutil
+import subprocess
+import threading
+from collections import deque
+from pathlib import Path
+from typing import NamedTuple
+
+from scripts.antismash_cache import link_or_copy
+
+BIGSCAPE_IMAGE = "quay.io/biocontainers/bigscape:1.1.5--pyhdfd78af_0"
+
+# stderr fragments of BiG-SCAPE errors that do not invalidate its results
+KNOWN_NONFATAL = [
+    "no aligned sequences found",
+    "starting with 0 files",
+    "file with list of anchor domains not found",
+    "html_template",
+    "cannot copy tree",
+    "distutilsfileerror",
+    "running with skip_ma parameter",
+    "unicodedecodeerror",
+    "pickle.load"
+]
+
+# output fragments showing BiG-SCAPE got past domain prediction
+PROGRESS_MARKERS = [
+    "predicting domains",
+    "finished generating pfs and pfd",
+    "processing domains sequence files",
+    "running with skip_ma parameter",
+    "using hmmalign",
+    "calculating distance matrix",
+    "launch_hmmalign"
+]
+
+CUTOFF_SUFFIX = re.compile(r"_c(\d+\.\d+)")
+
+LOG_FILE = "bigscape.log"
+TAIL_LINES = 200
+
+
+class BigscapeRun(NamedTuple):
+    returncode: int
+    stdout_tail: str
+    stderr_tail: str
+    progressed: bool
+    nonfatal_hit: bool
+    log_path: Path
+
+
+def cutoff_dir_name(cutoff: float) -> str:
+    """
+    Name of the per-cutoff results directory inside ``bigscape/``.
+    """
+    return f"cutoff_{cutoff}"
+
+
+def bigscape_command(
+    input_dir: Path,
+    output_dir: Path,
+    pfam_dir: Path,
+    cutoffs: list,
+    name: str = None
+) -> list:
+    """
+    Build the docker command running a single BiG-SCAPE invocation for all
+    selected cutoffs.
+
+    Domain prediction, pfs/pfd generation and the distance calculation are
+    shared by every cutoff; only the network and clustering files differ.
+
+    Parameters
+    ----
+    input_dir : Path
+        Directory holding the antiSMASH region GenBank files.
+    output_dir : Path
+        Directory BiG-SCAPE writes all of its results to.
+    pfam_dir : Path
+        Directory holding the Pfam database.
+    cutoffs : list
+        Similarity cutoffs to produce networks and families for.
+    name : str, optional
+        Docker container name, e.g. for sampling its resource use.
+
+    Returns
+    ----
+    list
+        The command, ready to be passed to ``subprocess.run``.
+    """
+    cmd = [
+        "docker", "run", "--rm",
+        "--platform", "linux/amd64",
+    ]
+    if name:
+        cmd += ["--name", name]
+
+    return cmd + [
+        "-v", f"{input_dir}:/input",
+        "-v", f"{output_dir}:/output",
+        "-v", f"{pfam_dir}:/pfam",
+        "-w", "/input",
+        BIGSCAPE_IMAGE,
+        "bigscape.py",
+        "-i", "/input",
+        "-o", "/output",
+        "--cutoffs", *[str(c) for c in cutoffs],
+        "--mix",
+        "--include_gbk_str", "region",
+        "--skip_ma",
+        "--pfam_dir", "/pfam"
+    ]
+
+
+def classify_bigscape_flags(
+    returncode: int,
+    nonfatal_hit: bool,
+    progressed: bool
+) -> str:
+    """
+    Classify the outcome of a BiG-SCAPE run from its exit code and its
+    output, already scanned line by line by ``run_bigscape``.
+
+    BiG-SCAPE regularly exits with a non-zero status after its clustering
+    succeeded, e.g. when generating the HTML report fails.
+
+    Parameters
+    ----
+    returncode : int
+        Exit code of the container.
+    nonfatal_hit : bool
+        Whether stderr matched one of ``KNOWN_NONFATAL``.
+    progressed : bool
+        Whether the output matched one of ``PROGRESS_MARKERS``.
+
+    Returns
+    ----
+    str
+        ``"finished"`` for a clean exit, ``"stats_only"`` when a known
+        non-fatal error happened after domain prediction, ``"no_bgcs"`` when
+        a known non-fatal error happened before any progress (no comparable
+        BGCs), otherwise ``"failed"``.
+    """
+    if returncode == 0:
+        return "finished"
+    if nonfatal_hit and progressed:
+        return "stats_only"
+    if nonfatal_hit:
+        return "no_bgcs"
+    return "failed"
+
+
+def run_bigscape(
+    cmd: list,
+    log_path: Path,
+    update_status=print,
+    tail_lines: int = TAIL_LINES,
+    popen=subprocess.Popen
+) -> BigscapeRun:
+    """
+    Run BiG-SCAPE and stream its output line by line.
+
+    The full stdout and stderr are written to ``log_path`` as they arrive.
+    The first line matching each progress marker is passed to
+    ``update_status``, and only the last ``tail_lines`` lines of each stream
+    are kept in memory. Progress markers and known non-fatal errors are
+    tracked over the whole output, so the outcome does not depend on what
+    is left in the tail.
+
+    Parameters
+    ----
+    cmd : list
+        The BiG-SCAPE command, see ``bigscape_command``.
+    log_path : Path
+        File receiving the complete output.
+    update_status : callable
+        Receives progress messages. Always called from the calling thread.
+    tail_lines : int
+        Lines of each stream kept for error reporting.
+    popen : callable
+        Replacement for ``subprocess.Popen``.
+
+    Returns
+    ----
+    BigscapeRun
+        Exit status, output tails and classification flags.
+    """
+    lines = queue.Queue()
+    tails = {
+        "stdout": deque(maxlen=tail_lines),
+        "stderr": deque(maxlen=tail_lines),
+    }
+    seen_markers = set()
+    nonfatal_hit = False
+
+    process = popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        bufsize=1
+    )
+
+    def pump(name: str, pipe) -> None:
+        with pipe:
+            for line in pipe:
+                lines.put((name, line))
+        lines.put((name, None))
+
+    readers = [
+        threading.Thread(target=pump, args=(name, pipe), daemon=True)
+        for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr))
+    ]
+    for reader in readers:
+        reader.start()
+
+    open_streams = len(readers)
+    with open(log_path, "w", buffering=1) as log:
+        while open_streams:
+            name, line = lines.get()
+            if line is None:
+                open_streams -= 1
+                continue
+
+            log.write(line if name == "stdout" else f"[stderr] {line}")
+            tails[name].append(line)
+
+            lowered = line.lower()
+            if name == "stderr" and not nonfatal_hit:
+                nonfatal_hit = any(pat in lowered for pat in KNOWN_NONFATAL)
+
+            for marker in PROGRESS_MARKERS:
+                if marker in lowered and marker not in seen_markers:
+                    seen_markers.add(marker)
+                    update_status(f"BiG-SCAPE: {line.strip()}")
+
+    for reader in readers:
+        reader.join()
+
+    return BigscapeRun(
+        returncode=process.wait(),
+        stdout_tail="".join(tails["stdout"]),
+        stderr_tail="".join(tails["stderr"]),
+        progressed=bool(seen_markers),
+        nonfatal_hit=nonfatal_hit,
+        log_path=log_path
+    )
+
+
+def latest_run_dir(shared_dir: Path) -> Path:
+    """
+    Return the newest timestamped run folder in ``network_files``, or None.
+    """
+    network_dir = shared_dir / "network_files"
+    if not network_dir.is_dir():
+        return None
+
+    runs = [d for d in network_dir.iterdir() if d.is_dir()]
+    if not runs:
+        return None
+
+    return max(runs, key=lambda d: d.stat().st_mtime)
+
+
+def split_cutoff_results(
+    shared_dir: Path,
+    bigscape_dir: Path,
+    cutoffs: list
+) -> dict:
+    """
+    Split the results of a multi-cutoff BiG-SCAPE run into one directory
+    per cutoff.
+
+    Files carrying a ``_c<cutoff>`` suffix (network and clustering files)
+    go to the matching ``bigscape/cutoff_X/network_files`` folder, files
+    without a suffix (annotation tables) and the run log go to every
+    cutoff. Files are hardlinked where possible.
+
+    Returns
+    ----
+    dict
+        Maps each cutoff to the number of files placed in its directory.
+    """
+    run_dir = latest_run_dir(shared_dir)
+    counts = {cutoff: 0 for cutoff in cutoffs}
+
+    log_path = shared_dir / LOG_FILE
+    if log_path.exists():
+        for cutoff in cutoffs:
+            cutoff_log = bigscape_dir / cutoff_dir_name(cutoff) / LOG_FILE
+            cutoff_log.unlink(missing_ok=True)
+            link_or_copy(log_path, cutoff_log)
+
+    for cutoff in cutoffs:
+        target = bigscape_dir / cutoff_dir_name(cutoff) / "network_files"
+        if target.exists():
+            shutil.rmtree(target)
+
+    if run_dir is None:
+        return counts
+
+    for src in sorted(run_dir.rglob("*")):
+        if not src.is_file():
+            continue
+
+        rel = src.relative_to(shared_dir)
+        match = CUTOFF_SUFFIX.search(src.name)
+
+        for cutoff in cutoffs:
+            if match and round(float(match.group(1)), 2) != round(cutoff, 2):
+                continue
+
+            link_or_copy(src, bigscape_dir / cutoff_dir_name(cutoff) / rel)
+            counts[cutoff] += 1
+
+    return counts
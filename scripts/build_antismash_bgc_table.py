@@ -1,62 +1,138 @@
 from pathlib import Path
 import csv
 import argparse
-from Bio import SeqIO
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
 
-### arguments ###
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-parser = argparse.ArgumentParser(
-    description="Build master BGC table from antiSMASH outputs"
+from scripts.genbank_regions import read_region_header
+from scripts.antismash_cache import file_sha256
+from scripts.antismash_archive import archived_region_files, is_archived
+from scripts.bgc_stats import (
+    MASTER_HEADER,
+    MASTER_CSV,
+    MASTER_PARQUET,
+    write_columnar
 )
-parser.add_argument("--batch", required=True)
-args = parser.parse_args()
 
-### paths ###
+CACHE_FILE = "master_bgc_cache.json"
+CACHE_VERSION = 2
 
-PIPELINE_ROOT = Path(__file__).resolve().parents[1]
-BATCH_DIR = PIPELINE_ROOT / "batches" / args.batch
-ANTISMASH_DIR = BATCH_DIR / "antismash"
-OUTPUT_CSV = BATCH_DIR / "master_bgc_antismash.csv"
+### per-genome fingerprints ###
 
-### collect rows ###
+def region_sort_key(gbk_file: Path) -> tuple:
+    region_number = gbk_file.stem.split(".region")[-1]
+    return (
+        gbk_file.name.split(".region")[0],
+        int(region_number) if region_number.isdigit() else 0,
+        gbk_file.name
+    )
+
+
+def region_files(genome_dir: Path) -> list:
+    """
+    Region GenBank files of a genome directory in a stable order. Regions
+    of a compacted directory are extracted from its archive on demand (see
+    ``scripts/antismash_archive.py``).
+    """
+    files = sorted(genome_dir.glob("*.region*.gbk"), key=region_sort_key)
+    if not files and is_archived(genome_dir):
+        files = sorted(archived_region_files(genome_dir), key=region_sort_key)
+    return files
+
+
+def genome_fingerprint(genome_dir: Path, cached_files: dict) -> dict:
+    """
+    Fingerprint the region files of a genome directory.
+
+    A file whose size and mtime match its cached entry keeps its cached
+    hash; every other file is hashed again.
+
+    Returns
+    ----
+    dict
+        Maps each region file name to ``[size, mtime_ns, sha256]``.
+    """
+    files = {}
+
+    for gbk_file in region_files(genome_dir):
+        stat = gbk_file.stat()
+        cached = cached_files.get(gbk_file.name)
+
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            sha = cached[2]
+        else:
+            sha = file_sha256(gbk_file)
+
+        files[gbk_file.name] = [stat.st_size, stat.st_mtime_ns, sha]
+
+    return files
+
+
+def load_cache(cache_path: Path) -> dict:
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-rows = []
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("genomes", {})
 
-for genome_dir in ANTISMASH_DIR.iterdir():
-    if not genome_dir.is_dir():
-        continue
 
+def save_cache(cache_path: Path, genomes: dict) -> None:
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": CACHE_VERSION, "genomes": genomes}, f)
+    os.replace(tmp_path, cache_path)
+
+### collect rows ###
+
+def collect_genome_rows(batch_name: str, genome_dir: Path) -> tuple:
+    """
+    Collect one row per antiSMASH region of a single genome directory.
+
+    Returns
+    ----
+    tuple
+        ``(rows, failures)`` where ``failures`` lists
+        ``[file name, error message]`` for every file that could not be
+        parsed.
+    """
+    rows = []
+    failures = []
     genome_id = genome_dir.name
 
-    for gbk_file in genome_dir.glob("*.region*.gbk"):
+    for gbk_file in region_files(genome_dir):
         try:
-            record = SeqIO.read(gbk_file, "genbank")
-        except Exception:
+            region = read_region_header(gbk_file)
+        except Exception as e:
+            failures.append([gbk_file.name, f"{type(e).__name__}: {e}"])
             continue
 
-        region_number = gbk_file.stem.split(".region")[-1]
-
-        region_feature = next(
-            (f for f in record.features if f.type == "region"),
-            None
-        )
-        if region_feature is None:
+        if region is None:
             continue
 
-        start = int(region_feature.location.start)
-        end = int(region_feature.location.end)
+        region_number = gbk_file.stem.split(".region")[-1]
+
+        start = region.start
+        end = region.end
         length = end - start
 
-        bgc_type = ";".join(
-            region_feature.qualifiers.get("product", ["unknown"])
-        )
+        bgc_type = ";".join(region.products)
 
         bgc_id = f"{genome_id}|region{region_number}"
 
         rows.append([
-            args.batch,
+            batch_name,
             genome_id,
-            record.id,
+            region.contig_id,
             bgc_id,
             region_number,
             bgc_type,
@@ -66,24 +142,176 @@ for genome_dir in ANTISMASH_DIR.iterdir():
             "antiSMASH"
         ])
 
+    return rows, failures
+
+
+def collect_bgc_rows(
+    batch_name: str,
+    antismash_dir: Path,
+    cache: dict = None,
+    workers: int = 1
+) -> tuple:
+    """
+    Collect one row per antiSMASH region from every genome directory.
+
+    Genome directories whose fingerprint matches ``cache`` reuse the cached
+    rows; only new or changed directories are parsed, spread over
+    ``workers`` processes. Rows are always ordered by genome directory
+    name and region number, whatever order the workers finish in.
+
+    Parameters
+    ----
+    batch_name : str
+        Batch name written to the ``batch_id`` column.
+    antismash_dir : Path
+        Batch antiSMASH directory.
+    cache : dict, optional
+        Per-genome cache as returned by ``load_cache``.
+    workers : int
+        Number of parser processes. 1 parses in the calling process.
+
+    Returns
+    ----
+    tuple
+        ``(rows, new_cache, n_parsed, failures)`` where ``new_cache`` covers
+        exactly the genome directories present now and ``failures`` lists
+        ``[genome_id, file name, error message]`` per unparseable file.
+    """
+    cache = cache or {}
+    genome_dirs = sorted(
+        (
+            d for d in antismash_dir.iterdir()
+            if d.is_dir() and not d.name.startswith(".")
+        ),
+        key=lambda d: d.name
+    )
+
+    new_cache = {}
+    to_parse = []
+
+    for genome_dir in genome_dirs:
+        genome_id = genome_dir.name
+        cached = cache.get(genome_id, {})
+        files = genome_fingerprint(genome_dir, cached.get("files", {}))
+
+        if cached and cached["files"] == files:
+            new_cache[genome_id] = {
+                "files": files,
+                "rows": [[batch_name] + row[1:] for row in cached["rows"]],
+                "failures": cached["failures"]
+            }
+        else:
+            new_cache[genome_id] = {"files": files}
+            to_parse.append(genome_dir)
+
+    if workers > 1 and len(to_parse) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                collect_genome_rows,
+                [batch_name] * len(to_parse),
+                to_parse,
+                chunksize=max(1, len(to_parse) // (workers * 4))
+            )
+            results = list(results)
+    else:
+        results = [collect_genome_rows(batch_name, d) for d in to_parse]
+
+    for genome_dir, (genome_rows, genome_failures) in zip(to_parse, results):
+        new_cache[genome_dir.name]["rows"] = genome_rows
+        new_cache[genome_dir.name]["failures"] = genome_failures
+
+    rows = []
+    failures = []
+
+    for genome_dir in genome_dirs:
+        entry = new_cache[genome_dir.name]
+        rows.extend(entry["rows"])
+        failures.extend([genome_dir.name] + f for f in entry["failures"])
+
+    return rows, new_cache, len(to_parse), failures
+
 ### write output ###
 
-with open(OUTPUT_CSV, "w", newline="") as f:
-    writer = csv.writer(f)
-
-    writer.writerow([
-        "batch_id",
-        "genome_id",
-        "contig_id",
-        "bgc_id",
-        "region_number",
-        "bgc_type",
-        "bgc_start",
-        "bgc_end",
-        "bgc_length_bp",
-        "source_tool"
-    ])
-
-    writer.writerows(rows)
-
-print(f"{len(rows)} BGCs written to {OUTPUT_CSV}")
\ No newline at end of file
+class TableBuild(NamedTuple):
+    n_rows: int
+    n_genomes: int
+    n_parsed: int
+    failures: list
+
+
+def build_master_table(
+    batch_dir: Path,
+    batch_name: str,
+    incremental: bool = True,
+    workers: int = 1
+) -> TableBuild:
+    """
+    Build ``master_bgc_antismash.csv`` for a batch.
+
+    With ``incremental``, parsed rows are cached per genome in
+    ``master_bgc_cache.json`` together with the size, mtime and hash of each
+    region file, and only new or changed genome directories are re-parsed.
+    Parsing is spread over ``workers`` processes. A typed Parquet copy of
+    the table is written as well when pyarrow is installed.
+
+    Returns
+    ----
+    TableBuild
+        Number of BGCs written, genome directories seen and re-parsed, and
+        ``[genome_id, file name, error message]`` per unparseable file.
+    """
+    cache_path = batch_dir / CACHE_FILE
+    cache = load_cache(cache_path) if incremental else {}
+
+    rows, new_cache, n_parsed, failures = collect_bgc_rows(
+        batch_name,
+        batch_dir / "antismash",
+        cache=cache,
+        workers=workers
+    )
+
+    with open(batch_dir / MASTER_CSV, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(MASTER_HEADER)
+        writer.writerows(rows)
+
+    write_columnar(batch_dir / MASTER_PARQUET, MASTER_HEADER, rows)
+
+    save_cache(cache_path, new_cache)
+
+    return TableBuild(len(rows), len(new_cache), n_parsed, failures)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build master BGC table from antiSMASH outputs"
+    )
+    parser.add_argument("--batch", required=True)
+    parser.add_argument(
+        "--full", action="store_true",
+        help="ignore the per-genome cache and re-parse every genome"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of processes parsing genome directories"
+    )
+    args = parser.parse_args()
+
+    PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+    BATCH_DIR = PIPELINE_ROOT / "batches" / args.batch
+    OUTPUT_CSV = BATCH_DIR / "master_bgc_antismash.csv"
+
+    result = build_master_table(
+        BATCH_DIR,
+        args.batch,
+        incremental=not args.full,
+        workers=args.workers
+    )
+
+    print(f"Parsed {result.n_parsed} of {result.n_genomes} genome directories")
+    for genome_id, file_name, error in result.failures:
+        print(f"Could not parse {genome_id}/{file_name}: {error}")
+    if result.failures:
+        print(f"{len(result.failures)} region files could not be parsed")
+
+    print(f"{result.n_rows} BGCs written to {OUTPUT_CSV}")
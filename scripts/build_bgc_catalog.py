@@ -1,50 +1,54 @@
 from pathlib import Path
-import csv
 import argparse
+import csv
+import sys
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.bgc_stats import (
+    build_table,
+    write_columnar,
+    columnar_available,
+    CATALOG_CSV,
+    CATALOG_PARQUET
+)
+from scripts.bgc_index import index_catalog
 
 parser = argparse.ArgumentParser(
     description="Build per-BGC catalog with genome, region, and type"
 )
 parser.add_argument("--batch", required=True)
+parser.add_argument(
+    "--parquet", action="store_true",
+    help="also write bgc_catalog.parquet (requires pyarrow)"
+)
+parser.add_argument(
+    "--no-index", action="store_true",
+    help="do not update the cross-batch BGC index"
+)
 args = parser.parse_args()
 
 PIPELINE_ROOT = Path(__file__).resolve().parents[1]
 BATCH_DIR = PIPELINE_ROOT / "batches" / args.batch
 
-INPUT_CSV = BATCH_DIR / "master_bgc_antismash.csv"
-OUTPUT_CSV = BATCH_DIR / "bgc_catalog.csv"
-
-rows = []
-
-with open(INPUT_CSV, newline="") as f:
-    reader = csv.DictReader(f)
-
-    for row in reader:
-        rows.append([
-            row["batch_id"],
-            row["genome_id"],
-            row["contig_id"],
-            row["bgc_id"],
-            row["region_number"],
-            row["bgc_type"],
-            row["bgc_length_bp"],
-            row["bgc_start"],
-            row["bgc_end"],
-        ])
-
-with open(OUTPUT_CSV, "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow([
-        "batch_id",
-        "genome_id",
-        "contig_id",
-        "bgc_id",
-        "region_number",
-        "bgc_type",
-        "bgc_length_bp",
-        "bgc_start",
-        "bgc_end",
-    ])
-    writer.writerows(rows)
-
-print(f"{len(rows)} BGCs written to {OUTPUT_CSV}")
+OUTPUT_CSV = BATCH_DIR / CATALOG_CSV
+
+n_rows = build_table(BATCH_DIR, args.batch, CATALOG_CSV)
+
+print(f"{n_rows} BGCs written to {OUTPUT_CSV}")
+
+if args.parquet:
+    if not columnar_available():
+        sys.exit("ERROR: --parquet requires pyarrow")
+
+    with open(OUTPUT_CSV, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        write_columnar(BATCH_DIR / CATALOG_PARQUET, header, list(reader))
+
+    print(f"Catalog also written to {BATCH_DIR / CATALOG_PARQUET}")
+
+if not args.no_index:
+    n_indexed = index_catalog(args.batch, OUTPUT_CSV)
+    print(f"{n_indexed} BGCs added to the cross-batch index")
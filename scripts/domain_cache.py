@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from scripts.antismash_cache import file_sha256
+
+PFAM_HMM = "Pfam-A.hmm"
+PFAM_VERSION_FILE = "Pfam.version"
+KEYS_FILE = "domain_cache_keys.json"
+
+# BiG-SCAPE skips hmmscan for every region that already has a domtable in
+# its cache folder; pfs/pfd files and domain sequences are rebuilt from it
+DOMTABLE_DIR = "domtable"
+DOMTABLE_SUFFIX = ".domtable"
+DERIVED_DIRS = {"pfs": ".pfs", "pfd": ".pfd"}
+
+# last line hmmscan writes to a complete --domtblout file
+DOMTABLE_COMPLETE = b"# [ok]"
+
+
+def pfam_version(pfam_dir: Path) -> str:
+    """
+    Identify the Pfam database release: the contents of ``Pfam.version``
+    when present, otherwise the SHA-256 of ``Pfam-A.hmm``.
+    """
+    version_file = pfam_dir / PFAM_VERSION_FILE
+    if version_file.exists():
+        return "version:" + hashlib.sha256(version_file.read_bytes()).hexdigest()
+    return "hmm:" + file_sha256(pfam_dir / PFAM_HMM)
+
+
+def region_key(gbk_file: Path, pfam: str) -> str:
+    """
+    Cache key of a region's domain predictions: the region's name (which
+    BiG-SCAPE writes into its output), its GenBank content and the Pfam
+    release.
+    """
+    h = hashlib.sha256()
+    h.update(gbk_file.stem.encode() + b"\0")
+    h.update(file_sha256(gbk_file).encode() + b"\0")
+    h.update(pfam.encode())
+    return h.hexdigest()
+
+
+def domtable_complete(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 256))
+            return f.read().rstrip().endswith(DOMTABLE_COMPLETE)
+    except OSError:
+        return False
+
+
+def bigscape_regions(input_dir: Path) -> dict:
+    """
+    Map each region name BiG-SCAPE will see to its GenBank file. Names that
+    occur more than once are left out, since BiG-SCAPE itself only keeps
+    one of them.
+    """
+    regions = {}
+    duplicates = set()
+
+    for gbk_file in sorted(input_dir.rglob("*region*.gbk")):
+        if gbk_file.stem in regions:
+            duplicates.add(gbk_file.stem)
+        regions[gbk_file.stem] = gbk_file
+
+    for name in duplicates:
+        del regions[name]
+    return regions
+
+
+class DomainCache:
+    """
+    Cross-batch store of BiG-SCAPE's per-region hmmscan results.
+
+    Before a run, cached domtables are copied into BiG-SCAPE's cache folder
+    so only new regions are scanned against Pfam; after the run, fresh
+    domtables are added to the store. Entries are keyed by ``region_key``.
+    Domtables are small, and copying rather than hardlinking keeps a store
+    entry intact if hmmscan ever rewrites the file in place.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def entry_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{DOMTABLE_SUFFIX}"
+
+    def _region_keys(self, regions: dict, pfam: str) -> dict:
+        return {name: region_key(gbk, pfam) for name, gbk in regions.items()}
+
+    @staticmethod
+    def _read_keys(bigscape_cache: Path) -> dict:
+        try:
+            with open(bigscape_cache / KEYS_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write_keys(bigscape_cache: Path, keys: dict) -> None:
+        tmp_path = bigscape_cache / f".{KEYS_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(keys, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, bigscape_cache / KEYS_FILE)
+
+    def seed(self, input_dir: Path, bigscape_cache: Path, pfam_dir: Path) -> tuple:
+        """
+        Prepare BiG-SCAPE's cache folder before a run.
+
+        Annotations left by an earlier run for a region whose content or
+        Pfam release has changed since are removed, so BiG-SCAPE scans it
+        again. Regions without annotations get the cached domtable, if any.
+
+        Parameters
+        ----
+        input_dir : Path
+            BiG-SCAPE input directory (the batch antiSMASH directory).
+        bigscape_cache : Path
+            BiG-SCAPE's ``cache`` folder inside its output directory.
+        pfam_dir : Path
+            Pfam database directory.
+
+        Returns
+        ----
+        tuple
+            ``(n_reused, n_regions)``.
+        """
+        pfam = pfam_version(pfam_dir)
+        regions = bigscape_regions(input_dir)
+        keys = self._region_keys(regions, pfam)
+        previous = self._read_keys(bigscape_cache)
+
+        domtable_dir = bigscape_cache / DOMTABLE_DIR
+        domtable_dir.mkdir(parents=True, exist_ok=True)
+        n_reused = 0
+
+        for name, key in keys.items():
+            domtable = domtable_dir / f"{name}{DOMTABLE_SUFFIX}"
+
+            if domtable.exists() and previous.get(name) != key:
+                domtable.unlink()
+                for folder, suffix in DERIVED_DIRS.items():
+                    (bigscape_cache / folder / f"{name}{suffix}").unlink(missing_ok=True)
+
+            if domtable.exists():
+                continue
+
+            entry = self.entry_path(key)
+            if entry.exists():
+                shutil.copyfile(entry, domtable)
+                os.utime(entry)
+                n_reused += 1
+
+        self._write_keys(bigscape_cache, keys)
+        return n_reused, len(keys)
+
+    def harvest(self, bigscape_cache: Path) -> int:
+        """
+        Add the complete domtables of a finished run to the store, using
+        the region keys recorded by ``seed``.
+
+        Returns
+        ----
+        int
+            Number of new entries.
+        """
+        keys = self._read_keys(bigscape_cache)
+        domtable_dir = bigscape_cache / DOMTABLE_DIR
+        n_added = 0
+
+        for name, key in keys.items():
+            domtable = domtable_dir / f"{name}{DOMTABLE_SUFFIX}"
+            entry = self.entry_path(key)
+            if entry.exists() or not domtable_complete(domtable):
+                continue
+
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            tmp_entry = entry.with_name(f"{entry.name}.tmp-{os.getpid()}-{time.time_ns()}")
+            shutil.copyfile(domtable, tmp_entry)
+            os.replace(tmp_entry, entry)
+            n_added += 1
+
+        return n_added
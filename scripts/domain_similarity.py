@@ -0,0 +1,393 @@
+from pathlib import Path
+import argparse
+import csv
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # falls back to the pure Python inverted index
+    np = None
+    sparse = None
+
+from scripts.genbank_regions import read_region_domains
+from scripts.build_antismash_bgc_table import region_files
+from scripts.union_find import UnionFind
+
+OUTPUT_DIR = "domain_similarity"
+NETWORK_TSV = "domain_network.tsv"
+NETWORK_HEADER = [
+    "bgc_id_a",
+    "bgc_id_b",
+    "jaccard",
+    "adjacency_index",
+    "similarity",
+    "distance",
+]
+FAMILY_HEADER = [
+    "bgc_id",
+    "genome_id",
+    "family_id",
+    "family_size",
+]
+
+# BiG-SCAPE's "mix" weights for the Jaccard and adjacency indices; its
+# domain sequence similarity needs alignments and is left out here
+JACCARD_WEIGHT = 0.2
+ADJACENCY_WEIGHT = 0.05
+
+# rows of the similarity matrix computed at once; bounds peak memory
+BLOCK_ROWS = 2048
+
+
+def family_tsv(cutoff: float) -> str:
+    return f"domain_families_c{cutoff:.2f}.tsv"
+
+### domain content ###
+
+class Region(NamedTuple):
+    bgc_id: str
+    genome_id: str
+    domains: list
+
+
+def collect_genome_regions(genome_dir: Path) -> tuple:
+    """
+    Read the domain content of every region file of a genome directory.
+    Regions are identified as ``<genome>|<region file stem>``, e.g.
+    ``genome_1|NZ_CP012345.1.region001``.
+
+    Returns
+    ----
+    tuple
+        ``(regions, failures)`` with ``[file name, error message]`` per
+        unreadable file.
+    """
+    regions = []
+    failures = []
+    genome_id = genome_dir.name
+
+    for gbk_file in region_files(genome_dir):
+        try:
+            domains = read_region_domains(gbk_file)
+        except Exception as e:
+            failures.append([gbk_file.name, f"{type(e).__name__}: {e}"])
+            continue
+
+        # antiSMASH numbers regions per record, so only the file name is
+        # unique within a multi-contig genome
+        regions.append(Region(f"{genome_id}|{gbk_file.stem}", genome_id, domains))
+
+    return regions, failures
+
+
+def collect_regions(antismash_dir: Path, workers: int = 1) -> tuple:
+    """
+    Read the domain content of every region of a batch, spread over
+    ``workers`` processes.
+
+    Returns
+    ----
+    tuple
+        ``(regions, failures)``, regions ordered by genome and region.
+    """
+    genome_dirs = sorted(
+        d for d in antismash_dir.iterdir()
+        if d.is_dir() and not d.name.startswith(".")
+    )
+
+    if workers > 1 and len(genome_dirs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                collect_genome_regions,
+                genome_dirs,
+                chunksize=max(1, len(genome_dirs) // (workers * 4))
+            ))
+    else:
+        results = [collect_genome_regions(d) for d in genome_dirs]
+
+    regions = []
+    failures = []
+    for genome_dir, (genome_regions, genome_failures) in zip(genome_dirs, results):
+        regions.extend(genome_regions)
+        failures.extend([genome_dir.name] + f for f in genome_failures)
+
+    return regions, failures
+
+
+def adjacent_pairs(domains: list) -> set:
+    """
+    Unordered pairs of neighbouring domains, as used by BiG-SCAPE's
+    adjacency index.
+    """
+    return {
+        tuple(sorted(pair))
+        for pair in zip(domains, domains[1:])
+        if pair[0] != pair[1]
+    }
+
+### similarity ###
+
+def _combine(jaccard, adjacency):
+    return (
+        (JACCARD_WEIGHT * jaccard + ADJACENCY_WEIGHT * adjacency)
+        / (JACCARD_WEIGHT + ADJACENCY_WEIGHT)
+    )
+
+
+def _incidence(feature_sets: list):
+    """
+    Binary regions x features CSR matrix and the feature count per region.
+    """
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+
+    for features in feature_sets:
+        indices.extend(vocabulary.setdefault(f, len(vocabulary)) for f in features)
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr),
+        shape=(len(feature_sets), max(1, len(vocabulary)))
+    )
+    return matrix, np.diff(indptr)
+
+
+def _index_block(matrix, sizes, start: int, stop: int):
+    """
+    Jaccard index between rows ``start:stop`` and all later rows, as a
+    sparse matrix over the block.
+    """
+    shared = (matrix[start:stop] @ matrix.T).tocoo()
+    rows = shared.row + start
+    keep = shared.col > rows
+    rows, cols, counts = rows[keep], shared.col[keep], shared.data[keep]
+
+    index = counts / (sizes[rows] + sizes[cols] - counts)
+    return sparse.csr_matrix(
+        (index, (rows - start, cols)),
+        shape=(stop - start, matrix.shape[0])
+    )
+
+
+def _edges_sparse(regions: list, min_similarity: float) -> list:
+    domains, domain_sizes = _incidence([set(r.domains) for r in regions])
+    pairs, pair_sizes = _incidence([adjacent_pairs(r.domains) for r in regions])
+    edges = []
+
+    for start in range(0, len(regions), BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, len(regions))
+        jaccard = _index_block(domains, domain_sizes, start, stop)
+        adjacency = _index_block(pairs, pair_sizes, start, stop)
+
+        # adjacent pairs in common imply domains in common, so the
+        # combined matrix has the Jaccard matrix's pattern
+        similarity = _combine(jaccard, adjacency).tocoo()
+        keep = similarity.data >= min_similarity
+        rows, cols = similarity.row[keep], similarity.col[keep]
+
+        jaccard_values = np.asarray(jaccard[rows, cols]).ravel()
+        adjacency_values = np.asarray(adjacency[rows, cols]).ravel()
+
+        edges.extend(zip(
+            (rows + start).tolist(),
+            cols.tolist(),
+            jaccard_values.tolist(),
+            adjacency_values.tolist(),
+            similarity.data[keep].tolist()
+        ))
+
+    return sorted(edges)
+
+
+def _edges_python(regions: list, min_similarity: float) -> list:
+    domain_sets = [set(r.domains) for r in regions]
+    pair_sets = [adjacent_pairs(r.domains) for r in regions]
+
+    def postings(feature_sets):
+        index = {}
+        for i, features in enumerate(feature_sets):
+            for feature in features:
+                index.setdefault(feature, []).append(i)
+        return index
+
+    domain_index = postings(domain_sets)
+    pair_index = postings(pair_sets)
+    edges = []
+
+    for i in range(len(regions)):
+        shared_domains = Counter(
+            j for d in domain_sets[i] for j in domain_index[d] if j > i
+        )
+        shared_pairs = Counter(
+            j for p in pair_sets[i] for j in pair_index[p] if j > i
+        )
+
+        for j, n_shared in shared_domains.items():
+            jaccard = n_shared / (len(domain_sets[i]) + len(domain_sets[j]) - n_shared)
+            n_pairs = shared_pairs.get(j, 0)
+            adjacency = (
+                n_pairs / (len(pair_sets[i]) + len(pair_sets[j]) - n_pairs)
+                if n_pairs else 0.0
+            )
+            similarity = _combine(jaccard, adjacency)
+            if similarity >= min_similarity:
+                edges.append((i, j, jaccard, adjacency, similarity))
+
+    return sorted(edges)
+
+
+def similarity_edges(regions: list, max_distance: float) -> list:
+    """
+    All pairs of regions closer than ``max_distance``.
+
+    Similarity is BiG-SCAPE's weighted mix of the Jaccard index of the
+    domain sets and the adjacency index of the neighbouring-domain pairs,
+    renormalised without the sequence similarity term; distance is
+    ``1 - similarity``. Uses sparse matrix products in row blocks when
+    NumPy and SciPy are installed.
+
+    Returns
+    ----
+    list
+        ``(i, j, jaccard, adjacency_index, similarity)`` with ``i < j``
+        indexing ``regions``.
+    """
+    # pairs must be strictly closer than the cutoff; the margin absorbs
+    # float rounding of similarities exactly at it
+    min_similarity = 1 - max_distance + 1e-9
+    if sparse is not None:
+        return _edges_sparse(regions, min_similarity)
+    return _edges_python(regions, min_similarity)
+
+### families ###
+
+def families(n_regions: int, edges: list, cutoff: float) -> list:
+    """
+    Connected components of the network of pairs closer than ``cutoff``.
+
+    Returns
+    ----
+    list
+        Family number of every region; families are numbered from 1 by
+        decreasing size, then by their first region.
+    """
+    sets = UnionFind(n_regions)
+    for i, j, _, _, similarity in edges:
+        if 1 - similarity < cutoff:
+            sets.union(i, j)
+
+    roots = [sets.find(i) for i in range(n_regions)]
+    sizes = Counter(roots)
+    first = {}
+    for i, root in enumerate(roots):
+        first.setdefault(root, i)
+
+    order = sorted(sizes, key=lambda r: (-sizes[r], first[r]))
+    numbers = {root: n for n, root in enumerate(order, start=1)}
+    return [numbers[root] for root in roots]
+
+### output ###
+
+def run_prescreen(
+    batch_dir: Path,
+    cutoffs: list,
+    workers: int = 1
+) -> dict:
+    """
+    Group the regions of a batch into domain-content families without
+    BiG-SCAPE.
+
+    Writes ``domain_similarity/domain_network.tsv`` with every pair closer
+    than the largest cutoff and one ``domain_families_cX.XX.tsv`` per
+    cutoff. Families are connected components, a quick approximation of
+    BiG-SCAPE's gene cluster families.
+
+    Parameters
+    ----
+    batch_dir : Path
+        Batch directory containing ``antismash/``.
+    cutoffs : list
+        Distance cutoffs, as for BiG-SCAPE.
+    workers : int
+        Processes reading region files.
+
+    Returns
+    ----
+    dict
+        ``{"regions", "edges", "failures", "families": {cutoff: n}}``.
+    """
+    regions, failures = collect_regions(batch_dir / "antismash", workers=workers)
+    edges = similarity_edges(regions, max(cutoffs)) if regions else []
+
+    output_dir = batch_dir / OUTPUT_DIR
+    output_dir.mkdir(exist_ok=True)
+
+    with open(output_dir / NETWORK_TSV, "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(NETWORK_HEADER)
+        for i, j, jaccard, adjacency, similarity in edges:
+            writer.writerow([
+                regions[i].bgc_id,
+                regions[j].bgc_id,
+                f"{jaccard:.4f}",
+                f"{adjacency:.4f}",
+                f"{similarity:.4f}",
+                f"{1 - similarity:.4f}",
+            ])
+
+    n_families = {}
+    for cutoff in cutoffs:
+        numbers = families(len(regions), edges, cutoff)
+        sizes = Counter(numbers)
+        n_families[cutoff] = len(sizes)
+
+        with open(output_dir / family_tsv(cutoff), "w", newline="") as f:
+            writer = csv.writer(f, delimiter="\t")
+            writer.writerow(FAMILY_HEADER)
+            for region, number in zip(regions, numbers):
+                writer.writerow([
+                    region.bgc_id,
+                    region.genome_id,
+                    f"DF{number:05d}",
+                    sizes[number],
+                ])
+
+    return {
+        "regions": len(regions),
+        "edges": len(edges),
+        "failures": failures,
+        "families": n_families,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Quick domain-content families of a batch without BiG-SCAPE"
+    )
+    parser.add_argument("--batch", required=True)
+    parser.add_argument("--cutoffs", type=float, nargs="+", default=[0.3])
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of processes reading region files"
+    )
+    args = parser.parse_args()
+
+    PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+    BATCH_DIR = PIPELINE_ROOT / "batches" / args.batch
+
+    result = run_prescreen(BATCH_DIR, args.cutoffs, workers=args.workers)
+
+    for genome_id, file_name, error in result["failures"]:
+        print(f"Could not read {genome_id}/{file_name}: {error}")
+    print(f"{result['regions']} regions, {result['edges']} similar pairs")
+    for cutoff, n in result["families"].items():
+        print(f"Cutoff {cutoff}: {n} families written to "
+              f"{BATCH_DIR / OUTPUT_DIR / family_tsv(cutoff)}")
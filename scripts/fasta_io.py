@@ -0,0 +1,156 @@
+from pathlib import Path
+import gzip
+import shutil
+import zlib
+
+FASTA_SUFFIXES = (".fna", ".fasta", ".txt")
+GENBANK_SUFFIXES = (".gbk",)
+GZIP_SUFFIX = ".gz"
+
+CHUNK_SIZE = 1 << 20
+
+# IUPAC nucleotide codes plus gap characters, both cases
+ALLOWED_SEQUENCE = b"ACGTURYSWKMBDHVNacgturyswkmbdhvn-.*"
+WHITESPACE = b" \t\r\n"
+
+
+def target_name(file_name: str) -> str:
+    """
+    Name an uploaded file is stored under in the batch input directory,
+    i.e. without a trailing ``.gz``.
+    """
+    if file_name.lower().endswith(GZIP_SUFFIX):
+        return file_name[:-len(GZIP_SUFFIX)]
+    return file_name
+
+
+def is_fasta_name(file_name: str) -> bool:
+    return target_name(file_name).lower().endswith(FASTA_SUFFIXES)
+
+
+def is_supported_name(file_name: str) -> bool:
+    """
+    Whether an upload can be stored: FASTA or GenBank, with gzip only
+    allowed around FASTA files.
+    """
+    name = file_name.lower()
+    if name.endswith(GZIP_SUFFIX):
+        return is_fasta_name(name)
+    return name.endswith(FASTA_SUFFIXES + GENBANK_SUFFIXES)
+
+
+def open_upload(fileobj, file_name: str):
+    """
+    Return a binary stream over the upload's contents from the start,
+    decompressing gzip uploads on the fly.
+    """
+    fileobj.seek(0)
+    if file_name.lower().endswith(GZIP_SUFFIX):
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    return fileobj
+
+
+def validate_fasta_stream(stream) -> str:
+    """
+    Validate every record of a FASTA stream in constant memory.
+
+    Lines are read in bounded chunks, so very long sequence lines are
+    checked piece by piece. Each record must have a non-empty header and
+    at least one sequence character, and sequence lines may only contain
+    IUPAC nucleotide codes and gap characters.
+
+    Parameters
+    ----
+    stream : binary file object
+        FASTA contents, e.g. from ``open_upload``.
+
+    Returns
+    ----
+    str or None
+        A description of the first problem found, or None if the stream
+        is valid FASTA.
+    """
+    line_no = 0
+    at_line_start = True
+    in_header = False
+    header = b""
+    n_records = 0
+    seq_len = 0
+
+    def record_label() -> str:
+        return f"record {n_records} ({header.decode(errors='replace')[:40]})"
+
+    try:
+        while True:
+            chunk = stream.readline(CHUNK_SIZE)
+            if not chunk:
+                break
+
+            if at_line_start:
+                line_no += 1
+            ends_line = chunk.endswith(b"\n")
+
+            if at_line_start and chunk.startswith(b">"):
+                if n_records and seq_len == 0:
+                    return f"{record_label()} has no sequence"
+                n_records += 1
+                seq_len = 0
+                in_header = True
+                header = chunk[1:]
+            elif in_header:
+                header += chunk[:CHUNK_SIZE - len(header)]
+            else:
+                residues = chunk.translate(None, WHITESPACE)
+                if residues and n_records == 0:
+                    return f"line {line_no} comes before the first '>' header"
+
+                invalid = residues.translate(None, ALLOWED_SEQUENCE)
+                if invalid:
+                    char = invalid[:1].decode(errors="replace")
+                    return (
+                        f"invalid sequence character {char!r} on line "
+                        f"{line_no} in {record_label()}"
+                    )
+                seq_len += len(residues)
+
+            if ends_line and in_header:
+                header = header.strip()
+                if not header:
+                    return f"record {n_records} on line {line_no} has an empty header"
+                in_header = False
+
+            at_line_start = ends_line
+
+    except (OSError, EOFError, zlib.error) as e:
+        return f"could not be read ({e})"
+
+    if in_header:
+        header = header.strip()
+        if not header:
+            return f"record {n_records} on line {line_no} has an empty header"
+
+    if n_records == 0:
+        return "contains no FASTA records"
+    if seq_len == 0:
+        return f"{record_label()} has no sequence"
+
+    return None
+
+
+def save_upload(fileobj, file_name: str, input_dir: Path) -> Path:
+    """
+    Stream an upload to the batch input directory in fixed-size chunks,
+    decompressing gzip uploads on the way.
+
+    Returns
+    ----
+    Path
+        The written file.
+    """
+    dest = input_dir / target_name(file_name)
+    stream = open_upload(fileobj, file_name)
+
+    with open(dest, "wb") as f:
+        shutil.copyfileobj(stream, f, CHUNK_SIZE)
+
+    return dest
@@ -0,0 +1,317 @@
+from pathlib import Path
+import re
+from typing import NamedTuple
+
+try:
+    from Bio import SeqIO
+except ImportError:  # Biopython is only needed for the fallback
+    SeqIO = None
+
+FEATURE_INDENT = 21
+LOCATION_NUMBER = re.compile(r"\d+")
+PFAM_ACCESSION = re.compile(r"(PF\d+)")
+
+# features carrying domain annotations in antiSMASH region files
+PFAM_FEATURE = "PFAM_domain"
+ANTISMASH_DOMAIN_FEATURE = "aSDomain"
+
+
+class RegionHeader(NamedTuple):
+    contig_id: str
+    start: int
+    end: int
+    products: list
+
+
+def _record_id(name: str, accessions: list, version: str) -> str:
+    """
+    Reproduce Biopython's choice of ``record.id`` from LOCUS, ACCESSION and
+    VERSION.
+    """
+    record_id = accessions[0] if accessions else None
+    version_suffix = None
+
+    if version:
+        prefix, _, suffix = version.partition(".")
+        if version.count(".") == 1 and suffix.isdigit():
+            if not record_id:
+                record_id = prefix
+            version_suffix = suffix
+        else:
+            record_id = version
+
+    if not record_id:
+        return name
+    if "." not in record_id and version_suffix is not None:
+        return f"{record_id}.{version_suffix}"
+    return record_id
+
+
+def _parse_location(location: str) -> tuple:
+    numbers = [int(n) for n in LOCATION_NUMBER.findall(location)]
+    if not numbers:
+        raise ValueError(f"Unparseable feature location: {location!r}")
+    return min(numbers) - 1, max(numbers)
+
+
+def _parse_qualifiers(lines: list) -> dict:
+    """
+    Turn the qualifier lines of a feature into ``{key: [values]}``.
+    """
+    qualifiers = {}
+    key = None
+    value = None
+
+    def flush():
+        if key is None:
+            return
+        text = value
+        if text is not None and text.startswith('"'):
+            text = text[1:-1] if text.endswith('"') else text[1:]
+            text = text.replace('""', '"')
+        qualifiers.setdefault(key, []).append(text)
+
+    for line in lines:
+        text = line.strip()
+        open_quote = value is not None and value.startswith('"') and (
+            value.count('"') % 2 == 1
+        )
+
+        if open_quote:
+            value = f"{value} {text}"
+            continue
+
+        if text.startswith("/"):
+            flush()
+            key, sep, value = text[1:].partition("=")
+            if not sep:
+                value = None
+        elif key is not None and value is not None:
+            value = f"{value} {text}"
+
+    flush()
+    return qualifiers
+
+
+def parse_region_header(lines) -> RegionHeader:
+    """
+    Parse the region fields from an iterable of GenBank text lines.
+
+    Parsing stops at the end of the first ``region`` feature, or at
+    ``ORIGIN`` / ``//`` when the record has no region feature.
+
+    Returns
+    ----
+    RegionHeader or None
+        None when the record contains no ``region`` feature.
+
+    Raises
+    ----
+    ValueError
+        if the record is not a GenBank record or the region location
+        cannot be parsed.
+    """
+    name = None
+    accessions = []
+    version = None
+    section = None
+
+    in_features = False
+    region_location = None
+    region_lines = None
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if not in_features:
+            if line.startswith("LOCUS"):
+                fields = line.split()
+                name = fields[1] if len(fields) > 1 else ""
+                section = "LOCUS"
+            elif line.startswith("ACCESSION"):
+                accessions += line[9:].replace(";", " ").split()
+                section = "ACCESSION"
+            elif line.startswith("VERSION"):
+                fields = line[7:].split()
+                version = fields[0] if fields else None
+                section = "VERSION"
+            elif line.startswith("FEATURES"):
+                in_features = True
+            elif line.startswith(("ORIGIN", "//")):
+                break
+            elif line.startswith(" ") and section == "ACCESSION":
+                accessions += line.replace(";", " ").split()
+            elif line[:1].strip():
+                section = None
+            continue
+
+        is_feature_key = (
+            line.startswith("     ")
+            and len(line) > 5
+            and line[5] != " "
+        )
+        leaves_features = bool(line[:1].strip())
+
+        if region_lines is not None:
+            if is_feature_key or leaves_features:
+                break
+            if region_lines or line[FEATURE_INDENT:].startswith("/"):
+                region_lines.append(line)
+            else:
+                region_location += line.strip()
+            continue
+
+        if leaves_features:
+            break
+
+        if is_feature_key and line[5:FEATURE_INDENT].strip() == "region":
+            region_location = line[FEATURE_INDENT:].strip()
+            region_lines = []
+
+    if name is None:
+        raise ValueError("Not a GenBank record: missing LOCUS line")
+
+    if region_lines is None:
+        return None
+
+    start, end = _parse_location(region_location)
+    qualifiers = _parse_qualifiers(region_lines)
+
+    return RegionHeader(
+        contig_id=_record_id(name, accessions, version),
+        start=start,
+        end=end,
+        products=qualifiers.get("product", ["unknown"])
+    )
+
+
+def _read_with_biopython(gbk_file: Path) -> RegionHeader:
+    record = SeqIO.read(gbk_file, "genbank")
+
+    region_feature = next(
+        (f for f in record.features if f.type == "region"),
+        None
+    )
+    if region_feature is None:
+        return None
+
+    return RegionHeader(
+        contig_id=record.id,
+        start=int(region_feature.location.start),
+        end=int(region_feature.location.end),
+        products=list(region_feature.qualifiers.get("product", ["unknown"]))
+    )
+
+
+def read_region_header(gbk_file: Path) -> RegionHeader:
+    """
+    Read the region location and products of an antiSMASH region GenBank
+    file without loading its sequence.
+
+    Falls back to Biopython, when installed, for files the lightweight
+    parser rejects.
+
+    Returns
+    ----
+    RegionHeader or None
+        None when the file contains no ``region`` feature.
+    """
+    try:
+        with open(gbk_file, encoding="utf-8", errors="replace") as f:
+            return parse_region_header(f)
+    except ValueError:
+        if SeqIO is None:
+            raise
+
+    return _read_with_biopython(gbk_file)
+
+
+def iter_features(lines):
+    """
+    Yield ``(key, location, qualifier lines)`` for every feature of a
+    GenBank record, stopping at ``ORIGIN`` / ``//``.
+    """
+    in_features = False
+    key = None
+    location = None
+    qualifier_lines = None
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if not in_features:
+            if line.startswith("FEATURES"):
+                in_features = True
+            elif line.startswith(("ORIGIN", "//")):
+                return
+            continue
+
+        if line[:1].strip():
+            break
+
+        if len(line) > 5 and line.startswith("     ") and line[5] != " ":
+            if key is not None:
+                yield key, location, qualifier_lines
+            key = line[5:FEATURE_INDENT].strip()
+            location = line[FEATURE_INDENT:].strip()
+            qualifier_lines = []
+        elif key is not None:
+            if qualifier_lines or line[FEATURE_INDENT:].startswith("/"):
+                qualifier_lines.append(line)
+            else:
+                location += line.strip()
+
+    if key is not None:
+        yield key, location, qualifier_lines
+
+
+def parse_region_domains(lines) -> list:
+    """
+    Ordered domain content of an antiSMASH region record.
+
+    Pfam accessions from ``PFAM_domain`` features are used when the record
+    has any (antiSMASH run with Pfam annotation); otherwise the antiSMASH
+    domains from ``aSDomain`` features and the CDS ``sec_met_domain``
+    qualifiers. Domains are ordered by their start coordinate.
+
+    Returns
+    ----
+    list
+        Domain names, e.g. ``["PF00109", "PF02801", ...]``.
+    """
+    pfam = []
+    antismash = []
+
+    for key, location, qualifier_lines in iter_features(lines):
+        if key == PFAM_FEATURE:
+            qualifiers = _parse_qualifiers(qualifier_lines)
+            for xref in qualifiers.get("db_xref", []):
+                match = PFAM_ACCESSION.search(xref or "")
+                if match:
+                    pfam.append((_parse_location(location)[0], match.group(1)))
+                    break
+
+        elif key == ANTISMASH_DOMAIN_FEATURE:
+            qualifiers = _parse_qualifiers(qualifier_lines)
+            for name in qualifiers.get("aSDomain", []):
+                if name:
+                    antismash.append((_parse_location(location)[0], name))
+
+        elif key == "CDS":
+            qualifiers = _parse_qualifiers(qualifier_lines)
+            for value in qualifiers.get("sec_met_domain", []):
+                if value:
+                    name = value.split(" (")[0].strip()
+                    antismash.append((_parse_location(location)[0], name))
+
+    domains = pfam or antismash
+    return [name for _, name in sorted(domains, key=lambda d: d[0])]
+
+
+def read_region_domains(gbk_file: Path) -> list:
+    """
+    Read the ordered domain content of an antiSMASH region GenBank file,
+    see ``parse_region_domains``.
+    """
+    with open(gbk_file, encoding="utf-8", errors="replace") as f:
+        return parse_region_domains(f)
@@ -0,0 +1,338 @@
+from pathlib import Path
+import argparse
+import csv
+import heapq
+import json
+import mmap
+import statistics
+import sys
+from typing import NamedTuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.genome_scheduler import GenomeSize, GENBANK_SUFFIXES
+from scripts.run_manifest import MANIFEST_JSON
+
+INPUT_STATS_CSV = "genome_input_stats.csv"
+
+INPUT_STATS_HEADER = [
+    "batch_id",
+    "genome_file",
+    "total_length",
+    "n_contigs",
+    "n50",
+    "largest_contig",
+    "gc_content",
+    "ambiguous_fraction",
+    "flags",
+]
+
+# bytes of a memory-mapped file counted at once
+WINDOW_SIZE = 1 << 24
+
+# upper-cases bases while whitespace (and GenBank's position numbers) is
+# deleted in the same C-level pass
+UPPER = bytes.maketrans(b"acgtn", b"ACGTN")
+FASTA_DELETE = b" \t\r\n"
+GENBANK_DELETE = b" \t\r\n0123456789"
+
+# thresholds of the input flags
+FRAGMENTED_N50 = 10_000
+FRAGMENTED_CONTIGS = 1_000
+MIN_GENOME_BASES = 100_000
+MAX_AMBIGUOUS_FRACTION = 0.05
+
+# antiSMASH wall time per Mb of input until a finished run has been measured
+DEFAULT_SECONDS_PER_MB = 240.0
+
+
+class GenomeStats(NamedTuple):
+    genome_file: str
+    total_length: int
+    n_contigs: int
+    n50: int
+    largest_contig: int
+    gc_content: float
+    ambiguous_fraction: float
+    flags: list
+
+    @property
+    def size(self) -> GenomeSize:
+        return GenomeSize(self.total_length, self.n_contigs)
+
+### scanning ###
+
+def fasta_spans(mm, size: int):
+    """
+    Yield ``(start, end, complete)`` for the sequence lines of every FASTA
+    record.
+    """
+    if mm[:1] == b">":
+        header = 0
+    else:
+        header = mm.find(b"\n>")
+        header = header + 1 if header >= 0 else -1
+
+    while header >= 0:
+        line_end = mm.find(b"\n", header)
+        seq_start = size if line_end < 0 else line_end + 1
+
+        next_header = mm.find(b"\n>", max(header, seq_start - 1))
+        yield seq_start, size if next_header < 0 else next_header + 1, True
+
+        header = next_header + 1 if next_header >= 0 else -1
+
+
+def genbank_spans(mm, size: int):
+    """
+    Yield ``(start, end, complete)`` for the ORIGIN block of every GenBank
+    record; records without ORIGIN or without a closing ``//`` are not
+    complete.
+    """
+    locus = 0 if mm[:5] == b"LOCUS" else mm.find(b"\nLOCUS")
+
+    while locus >= 0:
+        next_locus = mm.find(b"\nLOCUS", locus + 1)
+        record_end = size if next_locus < 0 else next_locus
+
+        origin = mm.find(b"\nORIGIN", locus, record_end)
+        terminator = mm.find(b"\n//", locus, record_end)
+
+        if origin < 0:
+            yield record_end, record_end, False
+        else:
+            line_end = mm.find(b"\n", origin + 1, record_end)
+            seq_start = record_end if line_end < 0 else line_end + 1
+            if terminator > origin:
+                yield seq_start, terminator + 1, True
+            else:
+                yield seq_start, record_end, False
+
+        locus = next_locus
+
+
+def count_span(mm, start: int, end: int, delete: bytes) -> tuple:
+    """
+    Bases, G+C and A+C+G+T counts of a byte span, one window at a time.
+    """
+    n_bases = gc = acgt = 0
+
+    for window in range(start, end, WINDOW_SIZE):
+        seq = mm[window:min(end, window + WINDOW_SIZE)].translate(UPPER, delete)
+        n_gc = seq.count(b"G") + seq.count(b"C")
+        n_bases += len(seq)
+        gc += n_gc
+        acgt += n_gc + seq.count(b"A") + seq.count(b"T")
+
+    return n_bases, gc, acgt
+
+
+def n50(lengths: list) -> int:
+    """
+    Length of the contig at which the longest contigs reach half of the
+    total length.
+    """
+    half = sum(lengths) / 2
+    covered = 0
+    for length in sorted(lengths, reverse=True):
+        covered += length
+        if covered >= half:
+            return length
+    return 0
+
+
+def input_flags(total_length: int, n_contigs: int, contig_n50: int,
+                ambiguous_fraction: float, truncated: bool) -> list:
+    """
+    Warnings for inputs antiSMASH will likely handle badly.
+    """
+    flags = []
+    if truncated:
+        flags.append("truncated")
+    if total_length < MIN_GENOME_BASES:
+        flags.append("small")
+    if n_contigs > FRAGMENTED_CONTIGS or (n_contigs > 1 and contig_n50 < FRAGMENTED_N50):
+        flags.append("fragmented")
+    if ambiguous_fraction > MAX_AMBIGUOUS_FRACTION:
+        flags.append("ambiguous")
+    return flags
+
+
+def scan_genome(path: Path) -> GenomeStats:
+    """
+    Compute the input statistics of a FASTA or GenBank genome file.
+
+    The file is memory-mapped and its sequence counted in large windows
+    with C-level ``bytes`` operations, so multi-GB assemblies are scanned
+    without reading them into Python strings. Only one integer per contig
+    is kept.
+
+    A record without sequence, or a GenBank record without ``//``, marks
+    the file as truncated.
+    """
+    is_genbank = path.suffix.lower() in GENBANK_SUFFIXES
+    lengths = []
+    gc = acgt = 0
+    truncated = False
+
+    size = path.stat().st_size
+    if size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if is_genbank:
+                spans = genbank_spans(mm, size)
+                delete = GENBANK_DELETE
+            else:
+                spans = fasta_spans(mm, size)
+                delete = FASTA_DELETE
+
+            for start, end, complete in spans:
+                n_bases, n_gc, n_acgt = count_span(mm, start, end, delete)
+                truncated = truncated or not complete or n_bases == 0
+                lengths.append(n_bases)
+                gc += n_gc
+                acgt += n_acgt
+
+    total_length = sum(lengths)
+    contig_n50 = n50(lengths)
+    ambiguous = round((total_length - acgt) / total_length, 4) if total_length else 0
+    truncated = truncated or not lengths
+
+    return GenomeStats(
+        path.name,
+        total_length,
+        len(lengths),
+        contig_n50,
+        max(lengths, default=0),
+        round(gc / acgt, 4) if acgt else 0,
+        ambiguous,
+        input_flags(total_length, len(lengths), contig_n50, ambiguous, truncated)
+    )
+
+### batch table ###
+
+def write_input_stats(path: Path, batch_name: str, stats: list) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(INPUT_STATS_HEADER)
+        for s in stats:
+            writer.writerow([batch_name] + list(s[:-1]) + [";".join(s.flags)])
+
+
+def read_input_stats(path: Path) -> list:
+    """
+    Read a ``genome_input_stats.csv`` back into ``GenomeStats``.
+    """
+    stats = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            stats.append(GenomeStats(
+                row["genome_file"],
+                int(row["total_length"]),
+                int(row["n_contigs"]),
+                int(row["n50"]),
+                int(row["largest_contig"]),
+                float(row["gc_content"]),
+                float(row["ambiguous_fraction"]),
+                [flag for flag in row["flags"].split(";") if flag]
+            ))
+    return stats
+
+
+def preflight_batch(batch_dir: Path, batch_name: str, genomes: list = None) -> list:
+    """
+    Scan every genome of a batch and write ``genome_input_stats.csv`` to
+    the batch directory.
+
+    Parameters
+    ----
+    batch_dir : Path
+        Batch directory containing ``input/``.
+    batch_name : str
+        Batch name written to the ``batch_id`` column.
+    genomes : list, optional
+        Genome files to scan; defaults to every file in ``input/``.
+
+    Returns
+    ----
+    list
+        ``GenomeStats`` per genome, in the order scanned.
+    """
+    if genomes is None:
+        genomes = sorted(p for p in (batch_dir / "input").iterdir() if p.is_file())
+
+    stats = [scan_genome(genome) for genome in genomes]
+    write_input_stats(batch_dir / INPUT_STATS_CSV, batch_name, stats)
+    return stats
+
+### runtime estimates ###
+
+def observed_seconds_per_mb(batches_dir: Path) -> float:
+    """
+    antiSMASH wall time per Mb of input measured in earlier runs, from the
+    run manifests and input statistics of every batch; None when no
+    finished, uncached antiSMASH run has been recorded.
+    """
+    rates = []
+
+    for manifest_path in batches_dir.glob(f"*/{MANIFEST_JSON}"):
+        stats_path = manifest_path.with_name(INPUT_STATS_CSV)
+        if not stats_path.exists():
+            continue
+
+        try:
+            with open(manifest_path) as f:
+                stages = json.load(f).get("stages", [])
+            sizes = {s.genome_file: s.total_length for s in read_input_stats(stats_path)}
+        except (OSError, ValueError, KeyError):
+            continue
+
+        for stage in stages:
+            length = sizes.get(stage.get("name"))
+            if (
+                stage.get("stage") == "antismash"
+                and stage.get("status") == "ok"
+                and stage.get("exit_code") == 0
+                and length
+            ):
+                rates.append(stage["wall_seconds"] / (length / 1e6))
+
+    return statistics.median(rates) if rates else None
+
+
+def estimate_antismash_seconds(
+    stats: list,
+    workers: int = 1,
+    seconds_per_mb: float = None
+) -> float:
+    """
+    Expected antiSMASH wall time of a batch, with genomes started
+    longest-first on ``workers`` containers.
+    """
+    rate = seconds_per_mb or DEFAULT_SECONDS_PER_MB
+    finish_times = [0.0] * max(1, workers)
+
+    for s in sorted(stats, key=lambda s: s.total_length, reverse=True):
+        start = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, start + rate * s.total_length / 1e6)
+
+    return max(finish_times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute input statistics of the genomes of a batch"
+    )
+    parser.add_argument("--batch", required=True)
+    args = parser.parse_args()
+
+    PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+    BATCH_DIR = PIPELINE_ROOT / "batches" / args.batch
+
+    for s in preflight_batch(BATCH_DIR, args.batch):
+        flags = f" [{', '.join(s.flags)}]" if s.flags else ""
+        print(
+            f"{s.genome_file}: {s.total_length} bp in {s.n_contigs} contig(s), "
+            f"N50 {s.n50}, GC {s.gc_content:.1%}{flags}"
+        )
+    print(f"Input statistics written to {BATCH_DIR / INPUT_STATS_CSV}")
@@ -0,0 +1,117 @@
+import threading
+from typing import NamedTuple
+
+GENBANK_SUFFIXES = (".gbk", ".gb", ".gbff")
+
+
+class GenomeSize(NamedTuple):
+    n_bases: int
+    n_contigs: int
+
+
+def _proportional_split(weights: list, total: int) -> list:
+    """
+    Split ``total`` into integer parts proportional to ``weights``, at least
+    1 each, using largest-remainder rounding.
+    """
+    weight_sum = sum(weights)
+    if not weight_sum:
+        weights = [1] * len(weights)
+        weight_sum = len(weights)
+
+    shares = [total * w / weight_sum for w in weights]
+    parts = [max(1, int(share)) for share in shares]
+
+    by_remainder = sorted(
+        range(len(shares)),
+        key=lambda i: shares[i] - int(shares[i]),
+        reverse=True
+    )
+    for i in by_remainder[:max(0, total - sum(parts))]:
+        parts[i] += 1
+
+    return parts
+
+
+def plan_antismash_jobs(
+    sizes: dict,
+    core_budget: int,
+    workers: int
+) -> list:
+    """
+    Order genomes longest-first and give each a CPU count from a shared
+    core budget.
+
+    The first ``workers`` genomes start together and split the whole budget
+    in proportion to their size. Every later genome starts when a container
+    finishes and is planned against the ``workers - 1`` genomes after it,
+    so the small genomes at the end of the order get more cores each as
+    fewer genomes remain.
+
+    Parameters
+    ----
+    sizes : dict
+        Maps each genome file to its ``GenomeSize``.
+    core_budget : int
+        Total CPU cores available to antiSMASH.
+    workers : int
+        Maximum number of containers running at the same time.
+
+    Returns
+    ----
+    list
+        ``(genome, cpus)`` pairs in the order they should be started.
+    """
+    order = sorted(
+        sizes,
+        key=lambda g: (sizes[g].n_bases, sizes[g].n_contigs, g.name),
+        reverse=True
+    )
+    workers = max(1, workers)
+
+    head = order[:workers]
+    cpus = _proportional_split([sizes[g].n_bases for g in head], core_budget)
+
+    for i in range(len(head), len(order)):
+        window = order[i:i + workers]
+        cpus.append(_proportional_split(
+            [sizes[g].n_bases for g in window], core_budget
+        )[0])
+
+    return list(zip(order, cpus))
+
+
+class CoreBudget:
+    """
+    Counting semaphore over CPU cores, so containers started from a worker
+    pool never use more than the total budget at once.
+
+    A container asking for more cores than are free starts as soon as at
+    least one core is free, with the cores that are available, instead of
+    leaving its worker idle.
+    """
+
+    def __init__(self, cores: int):
+        self.cores = cores
+        self.free = cores
+        self._condition = threading.Condition()
+
+    def acquire(self, n: int) -> int:
+        """
+        Block until a core is free and take up to ``n`` cores.
+
+        Returns
+        ----
+        int
+            The number of cores taken.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.free >= 1)
+            n = max(1, min(n, self.free))
+            self.free -= n
+        return n
+
+    def release(self, n: int) -> None:
+        with self._condition:
+            self.free += n
+            self._condition.notify_all()
@@ -0,0 +1,364 @@
+from pathlib import Path
+import argparse
+import csv
+import mmap
+import os
+import re
+import sys
+from itertools import combinations
+from typing import NamedTuple
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+try:
+    import numpy as np
+except ImportError:  # falls back to the pure Python rolling hash
+    np = None
+
+from scripts.antismash_cache import link_or_copy
+from scripts.genome_preflight import (
+    fasta_spans,
+    genbank_spans,
+    FASTA_DELETE,
+    GENBANK_DELETE,
+    UPPER
+)
+from scripts.genome_scheduler import GENBANK_SUFFIXES
+from scripts.union_find import UnionFind
+
+SIMILARITY_CSV = "genome_similarity.csv"
+GROUPS_CSV = "genome_groups.csv"
+
+# written into a genome's antiSMASH directory holding its representative's results
+PROPAGATED_MARKER = ".propagated_from"
+
+SIMILARITY_HEADER = [
+    "batch_id",
+    "genome_a",
+    "genome_b",
+    "shared_hashes",
+    "jaccard",
+    "containment_a",
+    "containment_b",
+    "ani",
+]
+
+GROUPS_HEADER = [
+    "batch_id",
+    "genome_file",
+    "group_id",
+    "group_size",
+    "representative",
+    "sketch_hashes",
+]
+
+KMER_SIZE = 21
+
+# one k-mer in SCALED is kept: ~5,000 hashes for a 5 Mb genome
+SCALED = 1000
+MAX_HASH = (1 << 64) // SCALED
+
+# pairs with a smaller sketch are too imprecise to be grouped
+MIN_SKETCH_HASHES = 50
+
+DEFAULT_IDENTITY = 0.999
+
+# bases hashed at once; bounds the memory of the numpy arrays
+SKETCH_WINDOW = 1 << 20
+
+MASK64 = (1 << 64) - 1
+BASE_CODES = {ord(b): i for i, b in enumerate("ACGT")}
+ACGT_RUN = re.compile(rb"[ACGT]+")
+
+
+class GenomeSketch(NamedTuple):
+    genome_file: str
+    hashes: frozenset
+
+
+class GenomePair(NamedTuple):
+    genome_a: str
+    genome_b: str
+    shared_hashes: int
+    jaccard: float
+    containment_a: float
+    containment_b: float
+    ani: float
+
+### hashing ###
+
+def _mix(x: int) -> int:
+    """
+    splitmix64 finalizer of a 2-bit encoded k-mer.
+    """
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def _python_hashes(seq: bytes, k: int, hashes: set) -> None:
+    shift = 2 * (k - 1)
+    mask = (1 << 2 * k) - 1
+
+    for run in ACGT_RUN.finditer(seq):
+        if run.end() - run.start() < k:
+            continue
+        fwd = rev = 0
+        filled = 0
+        for base in run.group():
+            code = BASE_CODES[base]
+            fwd = ((fwd << 2) | code) & mask
+            rev = (rev >> 2) | ((3 - code) << shift)
+            filled += 1
+            if filled >= k:
+                h = _mix(min(fwd, rev))
+                if h < MAX_HASH:
+                    hashes.add(h)
+
+
+if np is not None:
+    _LOOKUP = np.full(256, 4, dtype=np.uint8)
+    for _base, _code in BASE_CODES.items():
+        _LOOKUP[_base] = _code
+
+    def _np_mix(x):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+    def _numpy_hashes(seq: bytes, k: int, hashes: set) -> None:
+        n = len(seq) - k + 1
+        if n <= 0:
+            return
+
+        codes = _LOOKUP[np.frombuffer(seq, dtype=np.uint8)]
+        invalid = np.concatenate(([0], np.cumsum(codes == 4)))
+        valid = invalid[k:] == invalid[:n]
+        if not valid.any():
+            return
+
+        codes = np.minimum(codes, 3).astype(np.uint64)
+        fwd = np.zeros(n, dtype=np.uint64)
+        rev = np.zeros(n, dtype=np.uint64)
+        for j in range(k):
+            fwd = (fwd << np.uint64(2)) | codes[j:j + n]
+            rev |= (np.uint64(3) - codes[j:j + n]) << np.uint64(2 * j)
+
+        h = _np_mix(np.minimum(fwd, rev)[valid])
+        hashes.update(int(x) for x in np.unique(h[h < np.uint64(MAX_HASH)]))
+
+
+def sketch_genome(path: Path, k: int = KMER_SIZE) -> GenomeSketch:
+    """
+    FracMinHash sketch of the canonical k-mers of a FASTA or GenBank genome.
+
+    Every k-mer whose hash falls below ``MAX_HASH`` is kept, so the sketch
+    holds about one in ``SCALED`` distinct k-mers and sketches of genomes
+    of different size stay comparable for containment. The file is
+    memory-mapped and hashed one ``SKETCH_WINDOW`` at a time with numpy
+    when available (pure Python otherwise, roughly 20 times slower); only
+    the sketch is kept in memory. k-mers spanning ambiguous bases are
+    skipped.
+    """
+    is_genbank = path.suffix.lower() in GENBANK_SUFFIXES
+    delete = GENBANK_DELETE if is_genbank else FASTA_DELETE
+    add_hashes = _python_hashes if np is None else _numpy_hashes
+    hashes = set()
+
+    size = path.stat().st_size
+    if size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            spans = genbank_spans(mm, size) if is_genbank else fasta_spans(mm, size)
+            for start, end, _ in spans:
+                carry = b""
+                for window in range(start, end, SKETCH_WINDOW):
+                    seq = carry + mm[window:min(end, window + SKETCH_WINDOW)].translate(
+                        UPPER, delete
+                    )
+                    add_hashes(seq, k, hashes)
+                    carry = seq[-(k - 1):]
+
+    return GenomeSketch(path.name, frozenset(hashes))
+
+### comparison ###
+
+def compare_sketches(a: GenomeSketch, b: GenomeSketch, k: int = KMER_SIZE) -> GenomePair:
+    """
+    Estimated Jaccard index, containment of each genome in the other and
+    ANI of two sketches.
+
+    ``ani`` is derived from the smaller of the two containments
+    (``containment ** (1 / k)``), so a genome that carries extra content,
+    e.g. a plasmid, is not reported as identical to one without it.
+    """
+    shared = len(a.hashes & b.hashes)
+    union = len(a.hashes) + len(b.hashes) - shared
+    containment_a = shared / len(a.hashes) if a.hashes else 0
+    containment_b = shared / len(b.hashes) if b.hashes else 0
+
+    return GenomePair(
+        a.genome_file,
+        b.genome_file,
+        shared,
+        round(shared / union, 4) if union else 0,
+        round(containment_a, 4),
+        round(containment_b, 4),
+        round(min(containment_a, containment_b) ** (1 / k), 5)
+    )
+
+
+def group_genomes(sketches: list, pairs: list, identity: float) -> list:
+    """
+    Group genomes joined by pairs at or above ``identity`` ANI (single
+    linkage). The genome with the largest sketch, i.e. the most distinct
+    k-mers, represents its group.
+
+    Returns
+    ----
+    list
+        Lists of genome file names, representative first, largest group
+        first.
+    """
+    index = {s.genome_file: i for i, s in enumerate(sketches)}
+    sets = UnionFind(len(sketches))
+    for pair in pairs:
+        if pair.ani >= identity:
+            sets.union(index[pair.genome_a], index[pair.genome_b])
+
+    groups = {}
+    for i, sketch in enumerate(sketches):
+        groups.setdefault(sets.find(i), []).append(sketch)
+
+    ordered = []
+    for members in groups.values():
+        members.sort(key=lambda s: (-len(s.hashes), s.genome_file))
+        ordered.append([s.genome_file for s in members])
+    return sorted(ordered, key=lambda g: (-len(g), g[0]))
+
+### batch ###
+
+def _write(path: Path, header: list, rows) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def sketch_batch(
+    batch_dir: Path,
+    batch_name: str,
+    genomes: list = None,
+    identity: float = DEFAULT_IDENTITY
+) -> list:
+    """
+    Sketch every genome of a batch, compare all pairs and group the
+    near-identical ones.
+
+    Writes ``genome_similarity.csv`` (every pair sharing at least one
+    hash) and ``genome_groups.csv`` (every genome with its group and the
+    group's representative) to the batch directory. Pairs where either
+    sketch has fewer than ``MIN_SKETCH_HASHES`` hashes are reported but
+    never grouped.
+
+    Returns
+    ----
+    list
+        Groups of genome file names, see ``group_genomes``.
+    """
+    if genomes is None:
+        genomes = sorted(p for p in (batch_dir / "input").iterdir() if p.is_file())
+
+    sketches = [sketch_genome(genome) for genome in genomes]
+    pairs = []
+    for a, b in combinations(sketches, 2):
+        pair = compare_sketches(a, b)
+        if pair.shared_hashes:
+            pairs.append(pair)
+
+    sketch_sizes = {s.genome_file: len(s.hashes) for s in sketches}
+    groupable = [
+        pair for pair in pairs
+        if min(sketch_sizes[pair.genome_a], sketch_sizes[pair.genome_b]) >= MIN_SKETCH_HASHES
+    ]
+    groups = group_genomes(sketches, groupable, identity)
+
+    _write(batch_dir / SIMILARITY_CSV, SIMILARITY_HEADER, (
+        [batch_name] + list(pair)
+        for pair in sorted(pairs, key=lambda p: -p.ani)
+    ))
+
+    _write(batch_dir / GROUPS_CSV, GROUPS_HEADER, (
+        [batch_name, genome_file, f"G{number:04d}", len(group), group[0],
+         sketch_sizes[genome_file]]
+        for number, group in enumerate(groups, start=1)
+        for genome_file in group
+    ))
+
+    return groups
+
+### propagation ###
+
+def propagate_results(rep_out: Path, member_out: Path, rep_stem: str, member_stem: str) -> None:
+    """
+    Give a group member its representative's antiSMASH results.
+
+    The representative's output directory is hardlinked (or copied) to
+    ``member_out``, with files named after the representative renamed to
+    the member, and marked with ``PROPAGATED_MARKER`` naming the
+    representative's directory. Region files keep their record names, so
+    gene cluster family tables can match them to the representative's
+    regions.
+    """
+    tmp_out = member_out.with_name(f".{member_out.name}.propagate-tmp")
+    old_prefix = rep_stem + "."
+
+    for path in sorted(rep_out.rglob("*")):
+        if not path.is_file() or path.name == PROPAGATED_MARKER:
+            continue
+        rel = path.relative_to(rep_out)
+        name = rel.name
+        if name.startswith(old_prefix):
+            name = f"{member_stem}.{name[len(old_prefix):]}"
+        link_or_copy(path, tmp_out / rel.parent / name)
+
+    tmp_out.mkdir(parents=True, exist_ok=True)
+    (tmp_out / PROPAGATED_MARKER).write_text(rep_out.name + "\n")
+    os.replace(tmp_out, member_out)
+
+
+def propagated_from(genome_dir: Path) -> str:
+    """
+    Name of the antiSMASH directory a genome's results were propagated
+    from, or None for results of its own run.
+    """
+    try:
+        return (genome_dir / PROPAGATED_MARKER).read_text().strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Find near-identical genomes of a batch with MinHash sketches"
+    )
+    parser.add_argument("--batch", required=True)
+    parser.add_argument(
+        "--identity", type=float, default=DEFAULT_IDENTITY,
+        help="ANI at or above which genomes are grouped"
+    )
+    args = parser.parse_args()
+
+    PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+    BATCH_DIR = PIPELINE_ROOT / "batches" / args.batch
+
+    groups = sketch_batch(BATCH_DIR, args.batch, identity=args.identity)
+    for group in groups:
+        if len(group) > 1:
+            print(f"{group[0]} represents {len(group) - 1} genome(s): {', '.join(group[1:])}")
+    print(
+        f"{len(groups)} group(s) at ANI >= {args.identity}; pairwise similarities "
+        f"written to {BATCH_DIR / SIMILARITY_CSV}"
+    )
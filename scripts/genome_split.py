@@ -0,0 +1,315 @@
+import heapq
+import html
+import json
+import mmap
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import NamedTuple
+
+from scripts.genome_preflight import fasta_spans, count_span, FASTA_DELETE
+from scripts.genome_scheduler import GENBANK_SUFFIXES
+
+SPLIT_DIR = ".split"
+CHUNKS_DIR = "chunks"
+
+# bytes copied at once when writing chunk files and merged records
+COPY_SIZE = 1 << 24
+
+# smallest average chunk worth its own antiSMASH container
+MIN_CHUNK_BASES = 1_000_000
+
+REGION_NUMBER_QUALIFIER = re.compile(rb'/region_number="(\d+)"')
+
+# top-level report of a merged genome, linking the chunks' HTML reports;
+# written last, like antiSMASH's own, so it also marks the merge complete
+REPORT_INDEX = "index.html"
+
+
+class Contig(NamedTuple):
+    contig_id: str
+    n_bases: int
+    start: int
+    end: int
+
+
+class Chunk(NamedTuple):
+    path: Path
+    contig_ids: list
+
+### splitting ###
+
+def index_fasta(genome: Path) -> list:
+    """
+    Identifier, base count and byte range (header included) of every
+    record of a FASTA file, read through a memory map.
+    """
+    contigs = []
+    size = genome.stat().st_size
+    if not size:
+        return contigs
+
+    with open(genome, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for seq_start, end, _ in fasta_spans(mm, size):
+            header_start = mm.rfind(b"\n>", 0, seq_start) + 1
+            header = mm[header_start + 1:seq_start].split(None, 1)
+            n_bases, _, _ = count_span(mm, seq_start, end, FASTA_DELETE)
+            contigs.append(Contig(
+                header[0].decode(errors="replace") if header else "",
+                n_bases,
+                header_start,
+                end
+            ))
+
+    return contigs
+
+
+def partition_contigs(contigs: list, n_chunks: int) -> list:
+    """
+    Split contigs into at most ``n_chunks`` groups of similar total length.
+
+    Contigs are assigned longest-first to the currently shortest group;
+    within a group they keep their order in the genome file.
+
+    Returns
+    ----
+    list
+        Lists of contig indices, one per non-empty group, longest first.
+    """
+    n_chunks = max(1, min(n_chunks, len(contigs)))
+    groups = [(0, i, []) for i in range(n_chunks)]
+
+    for index in sorted(range(len(contigs)), key=lambda i: -contigs[i].n_bases):
+        total, i, members = heapq.heappop(groups)
+        members.append(index)
+        heapq.heappush(groups, (total + contigs[index].n_bases, i, members))
+
+    groups = sorted(groups, key=lambda g: (-g[0], g[1]))
+    return [sorted(members) for _, _, members in groups if members]
+
+
+def _copy_range(src, dst, start: int, end: int) -> None:
+    src.seek(start)
+    remaining = end - start
+    while remaining:
+        data = src.read(min(COPY_SIZE, remaining))
+        if not data:
+            break
+        dst.write(data)
+        remaining -= len(data)
+
+
+def write_chunks(genome: Path, n_chunks: int, split_dir: Path) -> list:
+    """
+    Write a FASTA genome as up to ``n_chunks`` FASTA files of balanced
+    total length, named ``<genome stem>.partNNN<suffix>``. Records are
+    copied byte for byte, so contig identifiers stay unchanged.
+
+    Returns
+    ----
+    list
+        ``Chunk`` per written file.
+    """
+    contigs = index_fasta(genome)
+    split_dir.mkdir(parents=True, exist_ok=True)
+    chunks = []
+
+    with open(genome, "rb") as src:
+        for number, members in enumerate(partition_contigs(contigs, n_chunks), start=1):
+            path = split_dir / f"{genome.stem}.part{number:03d}{genome.suffix}"
+            with open(path, "wb") as dst:
+                for index in members:
+                    contig = contigs[index]
+                    _copy_range(src, dst, contig.start, contig.end)
+                    src.seek(contig.end - 1)
+                    if src.read(1) != b"\n":
+                        dst.write(b"\n")
+            chunks.append(Chunk(path, [contigs[i].contig_id for i in members]))
+
+    return chunks
+
+
+def chunk_count(genome: Path, n_bases: int, n_contigs: int, max_chunks: int) -> int:
+    """
+    Number of chunks to split a genome into: at most ``max_chunks``, one
+    per contig and one per ``MIN_CHUNK_BASES``. GenBank inputs are never
+    split.
+    """
+    if genome.suffix.lower() in GENBANK_SUFFIXES:
+        return 1
+    return max(1, min(max_chunks, n_contigs, n_bases // MIN_CHUNK_BASES))
+
+### merging ###
+
+def _chunk_record_ids(chunk_out: Path, chunk: Chunk) -> list:
+    """
+    Record identifiers antiSMASH used for a chunk, in input order, from its
+    JSON output; antiSMASH may rename over-long identifiers.
+    """
+    try:
+        with open(chunk_out / f"{chunk.path.stem}.json") as f:
+            ids = [record["id"] for record in json.load(f)["records"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return list(chunk.contig_ids)
+    return ids if len(ids) == len(chunk.contig_ids) else list(chunk.contig_ids)
+
+
+def _genbank_records(path: Path) -> list:
+    """
+    Byte ranges of the records of a multi-record GenBank file.
+    """
+    records = []
+    start = 0
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            offset += len(line)
+            if line.startswith(b"//"):
+                records.append((start, offset))
+                start = offset
+    return records
+
+
+def _renumber_region(path: Path, old: int, new: int) -> None:
+    text = path.read_bytes()
+    text = REGION_NUMBER_QUALIFIER.sub(
+        lambda m: f'/region_number="{new}"'.encode() if int(m.group(1)) == old else m.group(0),
+        text
+    )
+    path.write_bytes(text)
+
+
+def _write_report_index(output_dir: Path, genome: Path, chunks: list) -> None:
+    links = "\n".join(
+        f'<li><a href="{CHUNKS_DIR}/{html.escape(chunk.path.stem)}/{REPORT_INDEX}">'
+        f"{html.escape(chunk.path.stem)}</a> ({len(chunk.contig_ids)} contigs)</li>"
+        for chunk in chunks
+        if (output_dir / CHUNKS_DIR / chunk.path.stem / REPORT_INDEX).exists()
+    )
+    tmp = output_dir / f".{REPORT_INDEX}.tmp"
+    tmp.write_text(
+        f"<!DOCTYPE html>\n<html>\n<head><title>{html.escape(genome.name)}</title></head>\n"
+        f"<body>\n<h1>antiSMASH results for {html.escape(genome.name)}</h1>\n"
+        f"<p>This genome was run in {len(chunks)} chunks; each has its own report.</p>\n"
+        f"<ul>\n{links}\n</ul>\n</body>\n</html>\n"
+    )
+    os.replace(tmp, output_dir / REPORT_INDEX)
+
+
+def merge_chunk_outputs(
+    output_dir: Path,
+    genome: Path,
+    chunks: list,
+    contig_order: list
+) -> int:
+    """
+    Merge the antiSMASH outputs of a split genome, found in
+    ``output_dir/chunks/<chunk stem>/``, into one output directory shaped
+    like a single run's.
+
+    Region files are moved to ``output_dir``, ordered by the position of
+    their contig in the original genome. Region numbers are counted per
+    record, as antiSMASH does, so region files, ``region_number`` and
+    ``bgc_id`` match those of an unsplit run (and, like them, repeat
+    across the contigs of a genome). Only when two chunks produced the
+    same record name (e.g. from shortened identifiers) are the later
+    regions renumbered after it, in both file name and ``region_number``
+    qualifier, so their files do not overwrite each other. The chunks'
+    full GenBank and JSON results are combined into ``<genome stem>.gbk``
+    and ``.json`` in contig order; each chunk's HTML report stays under
+    ``chunks/``, linked from a top-level ``index.html`` written last, so
+    the genome's report link and completion marker work as for a single
+    run.
+
+    Returns
+    ----
+    int
+        Number of region files merged.
+    """
+    position = {contig_id: i for i, contig_id in enumerate(contig_order)}
+    regions = []
+    gbk_records = []
+    json_records = []
+    json_base = None
+
+    for chunk in chunks:
+        chunk_out = output_dir / CHUNKS_DIR / chunk.path.stem
+        record_ids = _chunk_record_ids(chunk_out, chunk)
+        record_position = {
+            record_id: position.get(contig_id, len(position))
+            for record_id, contig_id in zip(record_ids, chunk.contig_ids)
+        }
+
+        for path in chunk_out.glob("*.region*.gbk"):
+            prefix, _, number = path.stem.rpartition(".region")
+            if not number.isdigit():
+                continue
+            regions.append((
+                record_position.get(prefix, len(position)),
+                prefix,
+                int(number),
+                path
+            ))
+
+        gbk_path = chunk_out / f"{chunk.path.stem}.gbk"
+        if gbk_path.exists():
+            for j, byte_range in enumerate(_genbank_records(gbk_path)):
+                record_id = record_ids[j] if j < len(record_ids) else None
+                gbk_records.append((
+                    record_position.get(record_id, len(position)),
+                    gbk_path,
+                    byte_range
+                ))
+
+        json_path = chunk_out / f"{chunk.path.stem}.json"
+        if json_path.exists():
+            with open(json_path) as f:
+                result = json.load(f)
+            json_base = json_base or result
+            for record in result.get("records", []):
+                json_records.append((
+                    record_position.get(record.get("id"), len(position)),
+                    record
+                ))
+
+    counters = {}
+    for _, prefix, number, path in sorted(regions, key=lambda r: r[:3]):
+        counters[prefix] = max(counters.get(prefix, 0) + 1, number)
+        if counters[prefix] != number:
+            _renumber_region(path, number, counters[prefix])
+        os.replace(path, output_dir / f"{prefix}.region{counters[prefix]:03d}.gbk")
+
+    if gbk_records:
+        with open(output_dir / f"{genome.stem}.gbk", "wb") as dst:
+            for _, path, (start, end) in sorted(gbk_records, key=lambda r: r[0]):
+                with open(path, "rb") as src:
+                    _copy_range(src, dst, start, end)
+
+    if json_base is not None:
+        json_base["input_file"] = genome.name
+        json_base["records"] = [
+            record for _, record in sorted(json_records, key=lambda r: r[0])
+        ]
+        with open(output_dir / f"{genome.stem}.json", "w") as f:
+            json.dump(json_base, f)
+
+    for chunk in chunks:
+        chunk_out = output_dir / CHUNKS_DIR / chunk.path.stem
+        for suffix in (".gbk", ".json"):
+            (chunk_out / f"{chunk.path.stem}{suffix}").unlink(missing_ok=True)
+
+    _write_report_index(output_dir, genome, chunks)
+    return len(regions)
+
+
+def remove_split(split_dir: Path) -> None:
+    """
+    Delete a genome's chunk files, and the shared split directory once it
+    is empty.
+    """
+    shutil.rmtree(split_dir, ignore_errors=True)
+    try:
+        split_dir.parent.rmdir()
+    except OSError:
+        pass
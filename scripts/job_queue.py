@@ -0,0 +1,483 @@
+from pathlib import Path
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import traceback
+import uuid
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+JOBS_DIR = PIPELINE_ROOT / "jobs"
+
+JOB_FILE = "job.json"
+STATUS_FILE = "status.txt"
+LOG_FILE = "log.txt"
+CLAIM_FILE = "claim"
+WORKER_FILE = "worker.json"
+WORKER_LOCK = "worker.lock"
+SETTINGS_FILE = "settings.json"
+
+DEFAULT_MAX_JOBS = 2
+POLL_SECONDS = 2.0
+
+# time a starting worker has to take over the lock from its launcher
+HANDOVER_SECONDS = 10.0
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+
+### job files ###
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_job(job_dir: Path) -> dict:
+    return _read_json(job_dir / JOB_FILE)
+
+
+def update_job(job_dir: Path, **fields) -> dict:
+    job = read_job(job_dir)
+    job.update(fields)
+    _write_json(job_dir / JOB_FILE, job)
+    return job
+
+
+def submit_job(
+    batch_name: str,
+    bigscape_cutoffs: list,
+    options: dict = None,
+    jobs_dir: Path = JOBS_DIR
+) -> str:
+    """
+    Queue a pipeline run for a batch.
+
+    Parameters
+    ----
+    batch_name : str
+        Batch to run.
+    bigscape_cutoffs : list
+        BiG-SCAPE cutoffs passed to ``run_batch``.
+    options : dict, optional
+        Extra keyword arguments for ``run_batch``. Must be JSON serializable.
+
+    Returns
+    ----
+    str
+        The new job id.
+    """
+    job_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    job_dir = jobs_dir / job_id
+    job_dir.mkdir(parents=True)
+
+    _write_json(job_dir / JOB_FILE, {
+        "id": job_id,
+        "batch": batch_name,
+        "cutoffs": list(bigscape_cutoffs),
+        "options": options or {},
+        "status": QUEUED,
+        "created": time.time(),
+        "started": None,
+        "finished": None,
+        "error": None,
+        "pid": None,
+    })
+    return job_id
+
+
+def list_jobs(jobs_dir: Path = JOBS_DIR) -> list:
+    """
+    All jobs, newest first.
+    """
+    if not jobs_dir.exists():
+        return []
+
+    jobs = []
+    for job_dir in jobs_dir.iterdir():
+        job = read_job(job_dir) if job_dir.is_dir() else None
+        if job is not None:
+            jobs.append(job)
+
+    return sorted(jobs, key=lambda j: j["created"], reverse=True)
+
+
+def read_lines(job_id: str, name: str = STATUS_FILE, tail: int = 200,
+               jobs_dir: Path = JOBS_DIR) -> list:
+    """
+    Last ``tail`` lines of a job's status or log file.
+    """
+    try:
+        with open(jobs_dir / job_id / name, errors="replace") as f:
+            return f.read().splitlines()[-tail:]
+    except OSError:
+        return []
+
+### settings ###
+
+def read_max_jobs(jobs_dir: Path = JOBS_DIR) -> int:
+    settings = _read_json(jobs_dir / SETTINGS_FILE) or {}
+    return int(settings.get("max_jobs", DEFAULT_MAX_JOBS))
+
+
+def write_max_jobs(max_jobs: int, jobs_dir: Path = JOBS_DIR) -> None:
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    _write_json(jobs_dir / SETTINGS_FILE, {"max_jobs": int(max_jobs)})
+
+### execution ###
+
+def _pid_alive(pid: int) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def claim_next_job(jobs_dir: Path = JOBS_DIR) -> Path:
+    """
+    Atomically claim the oldest queued job whose batch is not already
+    running. The claim is an exclusively created file, so two workers can
+    never claim the same job.
+
+    Returns
+    ----
+    Path or None
+        The claimed job directory.
+    """
+    jobs = list_jobs(jobs_dir)
+    busy = {j["batch"] for j in jobs if j["status"] == RUNNING}
+
+    for job in sorted(jobs, key=lambda j: j["created"]):
+        if job["status"] != QUEUED or job["batch"] in busy:
+            continue
+
+        job_dir = jobs_dir / job["id"]
+        try:
+            fd = os.open(job_dir / CLAIM_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            continue
+        os.close(fd)
+
+        update_job(job_dir, status=RUNNING, started=time.time())
+        return job_dir
+
+    return None
+
+
+def execute_job(job_dir: Path) -> None:
+    """
+    Run a claimed job in the current process.
+
+    Status messages go to ``status.txt``; everything written to stdout and
+    stderr, including container output, goes to ``log.txt``.
+    """
+    from scripts.run_batch import run_batch
+
+    job = update_job(job_dir, pid=os.getpid())
+
+    log = open(job_dir / LOG_FILE, "ab", buffering=0)
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+    sys.stdout = open(1, "w", buffering=1, closefd=False)
+    sys.stderr = open(2, "w", buffering=1, closefd=False)
+
+    status = open(job_dir / STATUS_FILE, "a", buffering=1)
+
+    def record_status(msg: str) -> None:
+        status.write(msg + "\n")
+
+    try:
+        run_batch(
+            job["batch"],
+            job["cutoffs"],
+            status_callback=record_status,
+            **job["options"]
+        )
+    except BaseException as e:
+        traceback.print_exc()
+        message = str(e) or type(e).__name__
+        record_status(f"Pipeline failed: {message}")
+        update_job(job_dir, status=FAILED, finished=time.time(), error=message)
+        raise SystemExit(1)
+
+    update_job(job_dir, status=FINISHED, finished=time.time())
+
+
+def recover_orphaned_jobs(jobs_dir: Path = JOBS_DIR) -> None:
+    """
+    Mark running jobs whose process is gone as failed, e.g. after the
+    worker or the machine was restarted.
+    """
+    for job in list_jobs(jobs_dir):
+        if job["status"] == RUNNING and not _pid_alive(job["pid"]):
+            update_job(
+                jobs_dir / job["id"],
+                status=FAILED,
+                finished=time.time(),
+                error="worker stopped while the job was running"
+            )
+
+
+### worker lock ###
+
+def _lock_owner(jobs_dir: Path) -> dict:
+    return _read_json(jobs_dir / WORKER_LOCK)
+
+
+def _lock_stale(jobs_dir: Path, owner: dict) -> bool:
+    path = jobs_dir / WORKER_LOCK
+    if owner is None:
+        # created but never written by a process that died
+        try:
+            return time.time() - path.stat().st_mtime > HANDOVER_SECONDS
+        except FileNotFoundError:
+            return False
+    if owner.get("starting") and time.time() - owner["starting"] > HANDOVER_SECONDS:
+        return True
+    return not _pid_alive(owner["pid"])
+
+
+def _remove_stale_lock(jobs_dir: Path, owner: dict) -> None:
+    """
+    Remove the worker lock of a dead process. Removals are serialized by
+    an exclusively created ``.takeover`` file, under which the lock is
+    read again, so a lock another process has just created is never
+    removed.
+    """
+    path = jobs_dir / WORKER_LOCK
+    takeover = jobs_dir / f".{WORKER_LOCK}.takeover"
+    try:
+        fd = os.open(takeover, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # another process is taking over, or died doing so
+        try:
+            if time.time() - takeover.stat().st_mtime > HANDOVER_SECONDS:
+                takeover.unlink()
+        except FileNotFoundError:
+            pass
+        return
+    os.close(fd)
+
+    try:
+        if _read_json(path) == owner:
+            path.unlink(missing_ok=True)
+    finally:
+        takeover.unlink(missing_ok=True)
+
+
+def _create_lock(jobs_dir: Path, record: dict) -> bool:
+    path = jobs_dir / WORKER_LOCK
+    owner = _lock_owner(jobs_dir)
+    if path.exists() and _lock_stale(jobs_dir, owner):
+        _remove_stale_lock(jobs_dir, owner)
+
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        json.dump(record, f)
+    return True
+
+
+def acquire_worker_lock(jobs_dir: Path = JOBS_DIR) -> bool:
+    """
+    Take the exclusive worker lock of a jobs directory, so only one worker
+    claims jobs and ``max_jobs`` holds across all of them.
+
+    A worker started by ``ensure_worker`` is handed the lock by its
+    launcher; one started by hand creates it. The lock of a dead process
+    is taken over. Waits up to ``HANDOVER_SECONDS`` for a lock held by
+    a live process.
+
+    Returns
+    ----
+    bool
+        False if another worker holds the lock.
+    """
+    deadline = time.time() + HANDOVER_SECONDS
+    while True:
+        owner = _lock_owner(jobs_dir)
+        if owner is not None and owner["pid"] == os.getpid():
+            if owner.get("starting"):
+                _write_json(jobs_dir / WORKER_LOCK, {"pid": os.getpid()})
+            return True
+        if _create_lock(jobs_dir, {"pid": os.getpid()}):
+            return True
+        if time.time() > deadline:
+            return False
+        time.sleep(0.1)
+
+
+def holds_worker_lock(jobs_dir: Path = JOBS_DIR) -> bool:
+    owner = _lock_owner(jobs_dir)
+    return owner is not None and owner["pid"] == os.getpid()
+
+### worker ###
+
+def run_worker(jobs_dir: Path = JOBS_DIR, poll: float = POLL_SECONDS) -> None:
+    """
+    Execute queued jobs forever, each in its own process, with at most
+    ``max_jobs`` (from ``settings.json``) running at the same time.
+
+    Exits if another worker holds the worker lock, and stops claiming
+    jobs if it loses the lock.
+    """
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    if not acquire_worker_lock(jobs_dir):
+        print(f"Another worker is running for {jobs_dir}; exiting", flush=True)
+        return
+
+    recover_orphaned_jobs(jobs_dir)
+    running = {}
+
+    while True:
+        if not holds_worker_lock(jobs_dir):
+            print("Lost the worker lock to another worker; exiting", flush=True)
+            return
+
+        _write_json(jobs_dir / WORKER_FILE, {
+            "pid": os.getpid(),
+            "heartbeat": time.time(),
+        })
+
+        for job_dir, process in list(running.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del running[job_dir]
+
+            job = read_job(job_dir)
+            if job["status"] == RUNNING:
+                update_job(
+                    job_dir,
+                    status=FAILED,
+                    finished=time.time(),
+                    error=f"job process exited with code {process.exitcode}"
+                )
+
+        while len(running) < read_max_jobs(jobs_dir):
+            job_dir = claim_next_job(jobs_dir)
+            if job_dir is None:
+                break
+            process = multiprocessing.Process(target=execute_job, args=(job_dir,))
+            process.start()
+            running[job_dir] = process
+
+        time.sleep(poll)
+
+
+def worker_alive(jobs_dir: Path = JOBS_DIR, poll: float = POLL_SECONDS) -> bool:
+    worker = _read_json(jobs_dir / WORKER_FILE)
+    return bool(
+        worker
+        and time.time() - worker["heartbeat"] < 5 * poll
+        and _pid_alive(worker["pid"])
+    )
+
+
+def ensure_worker(jobs_dir: Path = JOBS_DIR) -> bool:
+    """
+    Start a detached worker process unless one is already running.
+
+    The worker lock is taken before the process starts and handed to it,
+    so sessions calling this at the same time start a single worker.
+
+    Returns
+    ----
+    bool
+        True if a new worker was started.
+    """
+    if worker_alive(jobs_dir):
+        return False
+
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    if not _create_lock(jobs_dir, {"pid": os.getpid(), "starting": time.time()}):
+        return False
+
+    try:
+        with open(jobs_dir / "worker.log", "ab") as log:
+            process = subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve()),
+                 "--jobs-dir", str(jobs_dir), "worker"],
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                start_new_session=True
+            )
+    except BaseException:
+        (jobs_dir / WORKER_LOCK).unlink(missing_ok=True)
+        raise
+
+    _write_json(
+        jobs_dir / WORKER_LOCK,
+        {"pid": process.pid, "starting": time.time()}
+    )
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Background job queue for pipeline runs"
+    )
+    parser.add_argument("--jobs-dir", type=Path, default=JOBS_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker_cmd = commands.add_parser("worker", help="execute queued jobs")
+    worker_cmd.add_argument(
+        "--max-jobs", type=int, default=None,
+        help="pipeline runs executed at the same time"
+    )
+
+    submit_cmd = commands.add_parser("submit", help="queue a pipeline run")
+    submit_cmd.add_argument("batch")
+    submit_cmd.add_argument("--cutoffs", type=float, nargs="+", default=[0.3])
+    submit_cmd.add_argument(
+        "--resume", action="store_true",
+        help="skip steps that already completed with the same inputs"
+    )
+
+    commands.add_parser("list", help="show all jobs")
+
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        if args.max_jobs is not None:
+            write_max_jobs(args.max_jobs, args.jobs_dir)
+        run_worker(args.jobs_dir)
+
+    elif args.command == "submit":
+        job_id = submit_job(
+            args.batch,
+            args.cutoffs,
+            options={"resume": args.resume},
+            jobs_dir=args.jobs_dir
+        )
+        print(f"Queued job {job_id}")
+
+    else:
+        for job in list_jobs(args.jobs_dir):
+            print(f"{job['id']}  {job['status']:<9}  {job['batch']}")
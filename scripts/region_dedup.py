@@ -0,0 +1,220 @@
+from pathlib import Path
+import argparse
+import csv
+import hashlib
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.antismash_cache import link_or_copy
+from scripts.build_antismash_bgc_table import region_files
+from scripts.genbank_regions import parse_region_domains
+
+# inside bigscape/: the slim BiG-SCAPE input and the groups it stands for
+STAGED_DIR = "input"
+REGION_GROUPS_CSV = "region_groups.csv"
+
+REGION_GROUPS_HEADER = [
+    "batch_id",
+    "genome_id",
+    "bgc_name",
+    "group_id",
+    "group_size",
+    "representative_genome",
+    "representative_name",
+]
+
+COMPLEMENT = bytes.maketrans(b"ACGTN", b"TGCAN")
+SEQUENCE_DELETE = b" \t\r\n0123456789/"
+
+
+class RegionFile(NamedTuple):
+    genome_id: str
+    name: str
+    path: Path
+
+
+class StagedRegions(NamedTuple):
+    n_regions: int
+    n_staged: int
+    groups: list
+
+### content keys ###
+
+def region_content_key(gbk_file: Path) -> Optional[str]:
+    """
+    Hash of a region's normalized sequence and domain content.
+
+    The sequence is upper-cased, stripped of whitespace and position
+    numbers and taken in the lexicographically smaller orientation, so the
+    same region annotated on either strand gets the same key; the domain
+    order follows that orientation. Regions without a sequence have no
+    key (None) and are never grouped.
+    """
+    data = gbk_file.read_bytes()
+    origin = data.find(b"\nORIGIN")
+    if origin < 0:
+        return None
+
+    seq = data[data.find(b"\n", origin + 1) + 1:].translate(None, SEQUENCE_DELETE).upper()
+    if not seq:
+        return None
+
+    domains = parse_region_domains(data[:origin].decode("utf-8", errors="replace").splitlines())
+    reverse = seq.translate(COMPLEMENT)[::-1]
+    if reverse < seq:
+        seq = reverse
+        domains = domains[::-1]
+
+    h = hashlib.sha256(seq)
+    h.update(b"\0" + ",".join(domains).encode())
+    return h.hexdigest()
+
+
+def batch_region_files(antismash_dir: Path) -> list:
+    """
+    Region files of every genome directory, ordered by genome and region.
+    """
+    genome_dirs = sorted(
+        d for d in antismash_dir.iterdir()
+        if d.is_dir() and not d.name.startswith(".")
+    )
+    return [
+        RegionFile(genome_dir.name, gbk_file.stem, gbk_file)
+        for genome_dir in genome_dirs
+        for gbk_file in region_files(genome_dir)
+    ]
+
+
+def group_identical_regions(regions: list, workers: int = 1) -> list:
+    """
+    Group regions with the same content key. The first region of a group,
+    in genome and region order, represents it.
+
+    Returns
+    ----
+    list
+        Lists of ``RegionFile``, representative first, one per distinct
+        region.
+    """
+    paths = [region.path for region in regions]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            keys = list(pool.map(region_content_key, paths, chunksize=64))
+    else:
+        keys = [region_content_key(path) for path in paths]
+
+    groups = {}
+    for i, (region, key) in enumerate(zip(regions, keys)):
+        groups.setdefault(key if key is not None else i, []).append(region)
+    return list(groups.values())
+
+### staging ###
+
+def stage_unique_regions(
+    antismash_dir: Path,
+    bigscape_dir: Path,
+    batch_name: str,
+    workers: int = 1
+) -> StagedRegions:
+    """
+    Stage one region per group of identical regions as BiG-SCAPE input.
+
+    The representatives are hardlinked (or copied) into
+    ``bigscape/input/<genome>/`` under their own names, so BiG-SCAPE's
+    results can be read exactly as for a run on the whole ``antismash/``
+    directory. Every region of a group with more than one member is
+    written to ``bigscape/region_groups.csv`` with its representative;
+    the gene cluster family tables give each member its representative's
+    family (see ``scripts/bigscape_families.py``).
+
+    Returns
+    ----
+    StagedRegions
+        Region and staged counts and the groups.
+    """
+    staged_dir = bigscape_dir / STAGED_DIR
+    shutil.rmtree(staged_dir, ignore_errors=True)
+    staged_dir.mkdir(parents=True)
+
+    regions = batch_region_files(antismash_dir)
+    groups = group_identical_regions(regions, workers=workers)
+
+    for representative, *_ in groups:
+        link_or_copy(
+            representative.path,
+            staged_dir / representative.genome_id / representative.path.name
+        )
+
+    with open(bigscape_dir / REGION_GROUPS_CSV, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(REGION_GROUPS_HEADER)
+        numbered = [g for g in groups if len(g) > 1]
+        for number, group in enumerate(numbered, start=1):
+            representative = group[0]
+            for region in group:
+                writer.writerow([
+                    batch_name,
+                    region.genome_id,
+                    region.name,
+                    f"R{number:05d}",
+                    len(group),
+                    representative.genome_id,
+                    representative.name,
+                ])
+
+    return StagedRegions(len(regions), len(groups), groups)
+
+
+def read_region_groups(bigscape_dir: Path) -> dict:
+    """
+    Map ``(genome_id, bgc_name)`` of every grouped region that was not
+    staged to its representative's ``(genome_id, bgc_name)``; None when
+    BiG-SCAPE ran on the whole ``antismash/`` directory.
+    """
+    representatives = {}
+    try:
+        with open(bigscape_dir / REGION_GROUPS_CSV, newline="") as f:
+            for row in csv.DictReader(f):
+                member = (row["genome_id"], row["bgc_name"])
+                representative = (row["representative_genome"], row["representative_name"])
+                if member != representative:
+                    representatives[member] = representative
+    except OSError:
+        return None
+    return representatives
+
+
+def remove_staging(bigscape_dir: Path) -> None:
+    """
+    Remove the staged input and region groups of an earlier run.
+    """
+    shutil.rmtree(bigscape_dir / STAGED_DIR, ignore_errors=True)
+    (bigscape_dir / REGION_GROUPS_CSV).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stage one region per group of identical regions for BiG-SCAPE"
+    )
+    parser.add_argument("--batch", required=True)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+    BATCH_DIR = PIPELINE_ROOT / "batches" / args.batch
+
+    staged = stage_unique_regions(
+        BATCH_DIR / "antismash",
+        BATCH_DIR / "bigscape",
+        args.batch,
+        workers=args.workers
+    )
+    print(
+        f"Staged {staged.n_staged} of {staged.n_regions} region(s) in "
+        f"{BATCH_DIR / 'bigscape' / STAGED_DIR}"
+    )
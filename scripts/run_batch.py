@@ -1,10 +1,64 @@
+import shutil
 import subprocess
 import sys
+import argparse
 from pathlib import Path
 import warnings
 
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.antismash_runner import (
+    run_antismash_pool,
+    antismash_complete,
+    antismash_fingerprint,
+    antismash_step
+)
+from scripts.antismash_cache import AntismashCache, DEFAULT_MAX_BYTES
+from scripts.bigscape_runner import (
+    bigscape_command,
+    classify_bigscape_flags,
+    cutoff_dir_name,
+    run_bigscape,
+    split_cutoff_results,
+    BIGSCAPE_IMAGE,
+    LOG_FILE as BIGSCAPE_LOG
+)
+from scripts.bgc_stats import (
+    build_all_stats,
+    GENOME_STATS_CSV,
+    BATCH_STATS_CSV,
+    TYPE_STATS_CSV,
+    CATALOG_CSV,
+    MASTER_CSV
+)
+from scripts.build_antismash_bgc_table import build_master_table
+from scripts.bgc_index import index_catalog
+from scripts.bigscape_families import build_gcf_tables, GCF_SUMMARY_CSV
+from scripts.batch_state import fingerprint, BatchState
+from scripts.run_manifest import container_name, RunManifest
+from scripts.domain_cache import DomainCache
+from scripts.genome_scheduler import plan_antismash_jobs, CoreBudget
+from scripts.genome_preflight import preflight_batch, INPUT_STATS_CSV
+from scripts.genome_split import chunk_count
+from scripts.genome_sketch import sketch_batch, propagate_results, SIMILARITY_CSV
+from scripts.antismash_archive import compact_batch, extract_batch_regions
+from scripts.region_dedup import (
+    stage_unique_regions,
+    remove_staging,
+    REGION_GROUPS_CSV,
+    STAGED_DIR
+)
+
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
+STATS_LABELS = {
+    GENOME_STATS_CSV: "genome-level BGC statistics",
+    BATCH_STATS_CSV: "batch-level BGC statistics",
+    TYPE_STATS_CSV: "BGC type frequency table",
+    CATALOG_CSV: "BGC catalog",
+}
+
 def check_docker() -> None:
     """
     Check is docker is running by attempting to communicate with the Docker daemon.
@@ -24,53 +78,26 @@ def check_docker() -> None:
     except subprocess.CalledProcessError:
         raise RuntimeError("Docker is not running. Please start Docker Desktop.")
 
-def fasta_txt_check(file_bytes: bytes) -> bool:
-    """
-    Check whether a txt file appears to be in FASTA format.
-
-    Parameters
-    ----
-    file_bytes : bytes
-        Raw file contents read from uploaded files [txt]
-    
-    Returns
-    ----
-    bool
-        True if the file passes FASTA formatting check, else False.
-    """ 
-    text = file_bytes.decode("utf-8", errors="ignore")
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    return bool(lines) and lines[0].startswith(">")
-
-def run_stats_script(script_name: str, batch_name :str) -> None:
-    """
-    Run the a stats script creating scripts for the batch.
-
-    Parameters
-    ----
-    script_name : str
-        Name of the script wanting to be ran.
-    batch_name : str
-        Name of the batch the scripts will be ran on. 
-    
-    Returns
-    ----
-    CSV : file
-        The batch directory will contain the output CSV file.
-    """
-    cmd = [
-        sys.executable,
-        str(Path(__file__).parent / script_name),
-        "--batch",
-        batch_name
-    ]
-    subprocess.run(cmd, check=True)
-
-
 def run_batch(
     batch_name: str,
     bigscape_cutoffs: list,
-    status_callback=None
+    status_callback=None,
+    antismash_workers: int = 1,
+    antismash_cpus: int = None,
+    docker_runner=subprocess.run,
+    table_workers: int = 1,
+    antismash_cache_dir: Path = None,
+    antismash_cache_max_bytes: int = DEFAULT_MAX_BYTES,
+    profiler=None,
+    antismash_core_budget: int = None,
+    domain_cache_dir: Path = None,
+    resume: bool = False,
+    antismash_failures: dict = None,
+    split_chunks: int = None,
+    genome_identity: float = None,
+    dedupe_genomes: bool = False,
+    dedupe_regions: bool = True,
+    compact_outputs: bool = False
 ) -> None:
     """
     Run the complete BGC discovery pipeline for a batch. 
@@ -78,6 +105,60 @@ def run_batch(
     executes antiSMASH on all genome files in the specificed batch input directory, then
     runs BiG-SCAPE for one or more of the selected similarity cutoffs. Results are written
     to batch-specific output directories.
+
+    Up to ``antismash_workers`` antiSMASH containers run at the same time, each limited
+    to ``antismash_cpus`` CPUs. ``docker_runner`` replaces ``subprocess.run`` for the
+    antiSMASH containers, e.g. with a stub when no Docker daemon is available.
+    ``table_workers`` processes parse the antiSMASH region files.
+
+    With ``antismash_core_budget``, genomes are measured first and started longest-first,
+    each with a share of the core budget proportional to its size (overriding
+    ``antismash_cpus``), so a single large genome does not finish long after the rest.
+
+    With ``split_chunks``, multi-contig FASTA genomes are split into up to that many
+    chunks of balanced length (at least ~1 Mb each), run as parallel containers sharing
+    the genome's CPUs, and merged back into ``antismash/<genome>``.
+
+    With ``antismash_cache_dir``, antiSMASH results are shared across batches: a
+    genome already analysed with the same content, image and options is linked
+    into the batch instead of being run again. With ``domain_cache_dir``, BiG-SCAPE's
+    Pfam domain predictions are shared the same way, so hmmscan only runs on new regions.
+
+    With ``dedupe_regions``, BiG-SCAPE only sees one region per group of regions with
+    identical sequence and domain content, hardlinked into ``bigscape/input/``; the
+    others are listed in ``bigscape/region_groups.csv`` and share its family.
+
+    After BiG-SCAPE, gene cluster family tables are built for every cutoff from its
+    clustering and network files (see ``scripts/bigscape_families.py``).
+
+    Before antiSMASH, every genome is scanned for its length, contig count, N50, GC
+    content and ambiguous bases (``genome_input_stats.csv``); fragmented, truncated
+    or very small inputs are reported but still run.
+
+    With ``genome_identity``, every genome is also sketched with MinHash and all pairs
+    are compared (``genome_similarity.csv``); genomes at or above that ANI are grouped
+    (``genome_groups.csv``). With ``dedupe_genomes`` as well, antiSMASH only runs on one
+    representative per group and its results are linked into the other members'
+    output directories; their regions join the representative's gene cluster families.
+
+    With ``compact_outputs``, every genome's antiSMASH output directory is replaced by
+    an indexed archive at the end of the run (see ``scripts/antismash_archive.py``);
+    later steps and runs read its region files through the index.
+
+    Completed steps are recorded in ``batch_state.json`` with a fingerprint of their
+    inputs, and antiSMASH output only appears once a genome has finished. A genome
+    whose output is missing, partial or from a different genome file always runs
+    again. With ``resume``, the statistics, BiG-SCAPE and GCF steps are also skipped
+    when they already completed with the same inputs, so a run interrupted by a
+    failure or preemption continues where it stopped.
+
+    ``antismash_failures`` maps genome file names to the error of an antiSMASH run
+    that already failed elsewhere, e.g. on a shard worker (``scripts/shard_queue.py``);
+    those genomes are reported as failed without being run again.
+
+    Wall time, exit status, CPU time and peak memory of every stage are written to
+    ``run_manifest.json`` and ``run_manifest.csv`` in the batch directory.
+    ``profiler(stage, name)`` may return a context manager wrapped around each stage.
     """
 
     def update_status(msg: str) -> None:
@@ -113,179 +194,449 @@ def run_batch(
     if not genomes:
         sys.exit(f"ERROR: No genome files found in {input_dir}")
 
-    ### run AntiSMASH per genome ###
+    manifest = RunManifest(batch, batch_name, profiler=profiler)
+    state = BatchState(batch)
 
-    for genome in genomes:
+    ### run AntiSMASH per genome ###
 
+    for i, genome in enumerate(genomes):
         if genome.suffix == ".txt":
             fixed_genome = genome.with_suffix(".fasta")
             genome.rename(fixed_genome)
-            genome = fixed_genome
+            genomes[i] = fixed_genome
 
-        name = genome.stem
-        genome_out = antismash_dir / name
+    ### pre-flight input statistics ###
 
-        if genome_out.exists():
+    with manifest.stage("preflight", batch_name) as record:
+        input_stats = preflight_batch(batch, batch_name, genomes)
+        record["detail"] = f"{sum(s.total_length for s in input_stats)} bp"
+    update_status(f"Wrote genome input statistics to {INPUT_STATS_CSV}")
+
+    for genome_stats in input_stats:
+        if genome_stats.flags:
             update_status(
-                f"Skipping antiSMASH for {genome.name} (already exists)"
+                f"Warning: {genome_stats.genome_file} looks "
+                f"{', '.join(genome_stats.flags)} ({genome_stats.n_contigs} "
+                f"contig(s), {genome_stats.total_length} bp, N50 {genome_stats.n50})"
             )
-            continue
 
-        update_status(f"Running antiSMASH on {genome.name}")
+    propagated = {}
+    if genome_identity is not None:
+        with manifest.stage("sketch", batch_name) as record:
+            groups = sketch_batch(batch, batch_name, genomes, identity=genome_identity)
+            record["detail"] = f"{len(groups)} group(s) at ANI >= {genome_identity}"
+        update_status(
+            f"Grouped {len(genomes)} genome(s) into {len(groups)} group(s) at "
+            f"ANI >= {genome_identity} (see {SIMILARITY_CSV})"
+        )
 
-        cmd = [
-            "docker", "run", "--rm",
-            "--platform", "linux/amd64",
-            "-v", f"{input_dir}:/input",
-            "-v", f"{antismash_dir}:/output",
-            "antismash/standalone",
-            genome.name,
-            "--genefinding-tool", "prodigal",
-            "--output-dir", f"/output/{name}"
-        ]
+        if dedupe_genomes:
+            by_name = {genome.name: genome for genome in genomes}
+            for representative, *members in groups:
+                for member in members:
+                    propagated[by_name[member]] = by_name[representative]
+            if propagated:
+                update_status(
+                    f"Running antiSMASH on group representatives only; results of "
+                    f"{len(propagated)} near-identical genome(s) will be propagated"
+                )
+
+    genome_cpus = None
+    core_budget = None
+    if antismash_core_budget:
+        sizes = {
+            genome: genome_stats.size
+            for genome, genome_stats in zip(genomes, input_stats)
+            if genome not in propagated
+        }
+        plan = plan_antismash_jobs(sizes, antismash_core_budget, antismash_workers)
+        genomes = [genome for genome, _ in plan] + list(propagated)
+        genome_cpus = dict(plan)
+        core_budget = CoreBudget(antismash_core_budget)
+
+        for genome, genome_cpu_count in plan:
+            print(
+                f"Scheduled {genome.name}: {sizes[genome].n_bases} bp in "
+                f"{sizes[genome].n_contigs} contig(s), {genome_cpu_count} CPUs"
+            )
+        update_status(
+            f"Scheduled {len(plan)} genome(s) longest-first on "
+            f"{antismash_core_budget} cores"
+        )
 
-        subprocess.run(cmd, check=True)
-        update_status(f"Finished antiSMASH on {genome.name}")
+    genome_chunks = None
+    if split_chunks and split_chunks > 1:
+        stats_by_name = {s.genome_file: s for s in input_stats}
+        genome_chunks = {
+            genome: chunk_count(
+                genome,
+                stats_by_name[genome.name].total_length,
+                stats_by_name[genome.name].n_contigs,
+                split_chunks
+            )
+            for genome in genomes
+        }
+
+    cache = None
+    if antismash_cache_dir is not None:
+        cache = AntismashCache(
+            antismash_cache_dir,
+            max_bytes=antismash_cache_max_bytes
+        )
 
-    ### build statistics from antiSMASH outputs ###
+    failures = run_antismash_pool(
+        [
+            g for g in genomes
+            if g.name not in (antismash_failures or {}) and g not in propagated
+        ],
+        input_dir,
+        antismash_dir,
+        workers=antismash_workers,
+        cpus=antismash_cpus,
+        runner=docker_runner,
+        update_status=update_status,
+        cache=cache,
+        manifest=manifest,
+        genome_cpus=genome_cpus,
+        core_budget=core_budget,
+        state=state,
+        genome_chunks=genome_chunks
+    )
+    failures.update(antismash_failures or {})
 
-    update_status("Building BGC tables and statistics")
+    for member, representative in propagated.items():
+        member_out = antismash_dir / member.stem
+        rep_out = antismash_dir / representative.stem
+        if representative.name in failures:
+            failures[member.name] = f"representative {representative.name} failed"
+            continue
 
-    try:
-        run_stats_script("build_antismash_bgc_table.py", batch_name)
-        update_status("Built master antiSMASH BGC table")
+        step = antismash_step(member)
+        propagated_fingerprint = fingerprint(
+            "propagated",
+            antismash_fingerprint(member),
+            (state.step(antismash_step(representative)) or {}).get("fingerprint")
+        )
+        if state.is_complete(step, propagated_fingerprint):
+            continue
+        if member_out.exists() and antismash_complete(member, member_out, state):
+            update_status(f"Keeping existing antiSMASH results for {member.name}")
+            continue
 
-        run_stats_script("build_genome_bgc_stats.py", batch_name)
-        update_status("Built genome-level BGC statistics")
+        state.invalidate(step)
+        with manifest.stage("propagate", member.name) as record:
+            shutil.rmtree(member_out, ignore_errors=True)
+            propagate_results(rep_out, member_out, representative.stem, member.stem)
+            record["detail"] = f"from {representative.name}"
+        state.mark_complete(
+            step,
+            propagated_fingerprint,
+            [member_out],
+            representative=representative.name
+        )
+        update_status(
+            f"Propagated antiSMASH results of {representative.name} to {member.name}"
+        )
 
-        run_stats_script("build_batch_bgc_stats.py", batch_name)
-        update_status("Built batch-level BGC statistics")
+    if failures:
+        update_status(
+            f"antiSMASH failed for {len(failures)} of {len(genomes)} genome(s): "
+            + ", ".join(sorted(failures))
+        )
+        if len(failures) == len(genomes):
+            raise RuntimeError("antiSMASH failed for every genome in the batch")
 
-        run_stats_script("build_bgc_type_stats.py", batch_name)
-        update_status("Built BGC type frequency table")
+    ### build statistics from antiSMASH outputs ###
 
-        run_stats_script("build_bgc_catalog.py", batch_name)
-        update_status("Built BGC catalog")
+    antismash_steps = [
+        antismash_step(genome) for genome in genomes if genome.name not in failures
+    ]
+    regions_fingerprint = state.combined_fingerprint(antismash_steps)
+    stats_fingerprint = fingerprint("statistics", regions_fingerprint)
 
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError("Statistics generation failed") from e
+    if resume and state.is_complete("statistics", stats_fingerprint):
+        update_status("Skipping BGC tables and statistics (antiSMASH results unchanged)")
+    else:
+        state.invalidate("statistics")
+        update_status("Building BGC tables and statistics")
+
+        try:
+            with manifest.stage("master_table", batch_name) as record:
+                table = build_master_table(batch, batch_name, workers=table_workers)
+                record["detail"] = (
+                    f"{table.n_rows} BGCs, {table.n_parsed} of {table.n_genomes} "
+                    "genomes parsed"
+                )
+            update_status("Built master antiSMASH BGC table")
+
+            for genome_id, file_name, error in table.failures:
+                print(f"Could not parse {genome_id}/{file_name}: {error}")
+            if table.failures:
+                update_status(
+                    f"{len(table.failures)} antiSMASH region file(s) could not be "
+                    "parsed and are missing from the BGC table"
+                )
+
+            with manifest.stage("statistics", batch_name) as record:
+                outputs = build_all_stats(batch, batch_name)
+                record["detail"] = ", ".join(outputs)
+            for output_name in outputs:
+                update_status(f"Built {STATS_LABELS[output_name]}")
+
+            with manifest.stage("index", batch_name):
+                index_catalog(batch_name, outputs[CATALOG_CSV])
+            update_status("Updated cross-batch BGC index")
+
+        except Exception as e:
+            raise RuntimeError("Statistics generation failed") from e
+
+        state.mark_complete(
+            "statistics",
+            stats_fingerprint,
+            [batch / MASTER_CSV] + list(outputs.values())
+        )
 
 
-    ### run BiG-SCAPE per cut
+    ### run BiG-SCAPE once for all cutoffs ###
 
-    bigscape_dir.mkdir(exist_ok=True)
-    pfam_dir = (root / "pfam").resolve()
+    cutoff_label = ", ".join(str(c) for c in bigscape_cutoffs)
+    bigscape_fingerprint = fingerprint(
+        "bigscape", regions_fingerprint, sorted(bigscape_cutoffs), BIGSCAPE_IMAGE,
+        dedupe_regions
+    )
 
-    known_nonfatal = [
-        "no aligned sequences found",
-        "starting with 0 files",
-        "file with list of anchor domains not found",
-        "html_template",
-        "cannot copy tree",
-        "distutilsfileerror"
-    ]
+    if resume and state.is_complete("bigscape", bigscape_fingerprint):
+        outcome = state.step("bigscape")["outcome"]
+        update_status(f"Skipping BiG-SCAPE at cutoffs {cutoff_label} (results up to date)")
+    else:
+        state.invalidate("bigscape")
+        bigscape_dir.mkdir(exist_ok=True)
+        shared_dir = bigscape_dir / "shared"
+        shared_dir.mkdir(exist_ok=True)
+        pfam_dir = (root / "pfam").resolve()
+
+        for cutoff in bigscape_cutoffs:
+            (bigscape_dir / cutoff_dir_name(cutoff)).mkdir(exist_ok=True)
+
+        bigscape_input = antismash_dir
+        bigscape_outputs = []
+        if dedupe_regions:
+            with manifest.stage("region_dedup", batch_name) as record:
+                staged = stage_unique_regions(
+                    antismash_dir,
+                    bigscape_dir,
+                    batch_name,
+                    workers=table_workers
+                )
+                record["detail"] = (
+                    f"{staged.n_staged} of {staged.n_regions} regions staged"
+                )
+            update_status(
+                f"Staged {staged.n_staged} distinct region(s) of {staged.n_regions} "
+                "for BiG-SCAPE"
+            )
+            bigscape_input = bigscape_dir / STAGED_DIR
+            bigscape_outputs = [bigscape_dir / REGION_GROUPS_CSV]
+        else:
+            remove_staging(bigscape_dir)
+            extract_batch_regions(antismash_dir)
+
+        domain_cache = None
+        if domain_cache_dir is not None:
+            domain_cache = DomainCache(domain_cache_dir)
+            try:
+                n_reused, n_regions = domain_cache.seed(
+                    bigscape_input,
+                    shared_dir / "cache",
+                    pfam_dir
+                )
+                update_status(
+                    f"Reused cached domain annotations for {n_reused} of "
+                    f"{n_regions} region(s)"
+                )
+            except OSError as e:
+                domain_cache = None
+                update_status(f"Domain annotation cache disabled ({e})")
+
+        update_status(f"Running BiG-SCAPE at cutoffs {cutoff_label}")
+
+        bigscape_name = container_name("bigscape", batch_name)
+        bigscape_cmd = bigscape_command(
+            bigscape_input,
+            shared_dir,
+            pfam_dir,
+            bigscape_cutoffs,
+            name=bigscape_name
+        )
 
-    for cutoff in bigscape_cutoffs:
-        cutoff_dir = bigscape_dir / f"cutoff_{cutoff}"
-        cutoff_dir.mkdir(exist_ok=True)
-
-        update_status(f"Running BiG-SCAPE at cutoff {cutoff}")
-
-        bigscape_cmd = [
-            "docker", "run", "--rm",
-            "--platform", "linux/amd64",
-            "-v", f"{antismash_dir}:/input",
-            "-v", f"{cutoff_dir}:/output",
-            "-v", f"{pfam_dir}:/pfam",
-            "-w", "/input",
-            "quay.io/biocontainers/bigscape:1.1.5--pyhdfd78af_0",
-            "bigscape.py",
-            "-i", "/input",
-            "-o", "/output",
-            "--cutoffs", str(cutoff),
-            "--mix",
-            "--include_gbk_str", "region",
-            "--skip_ma",
-            "--pfam_dir", "/pfam"
-        ]
-
-        result = subprocess.run(
-            bigscape_cmd,
-            capture_output=True,
-            text=True
+        with manifest.stage("bigscape", cutoff_label, container=bigscape_name) as record:
+            result = run_bigscape(
+                bigscape_cmd,
+                shared_dir / BIGSCAPE_LOG,
+                update_status=update_status
+            )
+
+            outcome = classify_bigscape_flags(
+                result.returncode,
+                result.nonfatal_hit,
+                result.progressed
+            )
+            record.update(exit_code=result.returncode, status=outcome)
+
+        if outcome == "failed":
+            print(f"BiG-SCAPE failed at cutoffs {cutoff_label}")
+            print(f"Full log: {result.log_path}")
+            print("STDERR (tail):")
+            print(result.stderr_tail)
+            print("STDOUT (tail):")
+            print(result.stdout_tail)
+            raise RuntimeError(f"BiG-SCAPE failed at cutoffs {cutoff_label}")
+
+        if domain_cache is not None:
+            try:
+                domain_cache.harvest(shared_dir / "cache")
+            except OSError as e:
+                print(f"Could not update the domain annotation cache ({e})")
+
+        if outcome != "no_bgcs":
+            split_cutoff_results(shared_dir, bigscape_dir, bigscape_cutoffs)
+
+        state.mark_complete(
+            "bigscape",
+            bigscape_fingerprint,
+            [bigscape_dir / cutoff_dir_name(c) for c in bigscape_cutoffs] + bigscape_outputs,
+            outcome=outcome
         )
 
-    stderr = (result.stderr or "").lower()
-    stdout = (result.stdout or "").lower()
-
-    known_nonfatal = [
-        "no aligned sequences found",
-        "starting with 0 files",
-        "file with list of anchor domains not found",
-        "html_template",
-        "cannot copy tree",
-        "running with skip_ma parameter",
-        "unicodedecodeerror",
-        "pickle.load"       
-    ]
+    ### gene cluster families ###
+
+    gcf_fingerprint = fingerprint("gcf_tables", bigscape_fingerprint)
 
-    if result.returncode != 0:
-
-        nonfatal_hit = any(pat in stderr for pat in known_nonfatal)
-
-        progressed = any(
-            pat in stderr or pat in stdout
-            for pat in [
-                "predicting domains",
-                "finished generating pfs and pfd",
-                "processing domains sequence files",
-                "running with skip_ma parameter",
-                "using hmmalign",
-                "calculating distance matrix",
-                "launch_hmmalign"
-            ]
+    if resume and state.is_complete("gcf_tables", gcf_fingerprint):
+        update_status("Skipping gene cluster family tables (BiG-SCAPE results unchanged)")
+    else:
+        state.invalidate("gcf_tables")
+        try:
+            with manifest.stage("gcf_stats", cutoff_label) as record:
+                gcf_summary = build_gcf_tables(batch, batch_name, bigscape_cutoffs)
+                record["detail"] = ", ".join(
+                    f"{row[4]} GCFs at {row[1]}" for row in gcf_summary
+                )
+            update_status("Built gene cluster family tables")
+        except Exception as e:
+            raise RuntimeError("GCF statistics failed") from e
+
+        state.mark_complete(
+            "gcf_tables",
+            gcf_fingerprint,
+            [bigscape_dir / GCF_SUMMARY_CSV]
         )
 
-        if nonfatal_hit and progressed:
-            msg = (
+    for cutoff in bigscape_cutoffs:
+        if outcome == "stats_only":
+            update_status(
                 f"BiG-SCAPE stats completed at cutoff {cutoff} "
                 "(matrix / networks intentionally skipped)."
             )
-            print(msg)
-            if status_callback:
-                status_callback(msg)
-
-        elif nonfatal_hit:
-            msg = (
+        elif outcome == "no_bgcs":
+            update_status(
                 f"BiG-SCAPE completed at cutoff {cutoff} "
                 "(no comparable BGCs found)."
             )
-            print(msg)
-            if status_callback:
-                status_callback(msg)
-
         else:
-            print(f"BiG-SCAPE failed at cutoff {cutoff}")
-            print("STDERR:")
-            print(result.stderr)
-            print("STDOUT:")
-            print(result.stdout)
-            raise RuntimeError(f"BiG-SCAPE failed at cutoff {cutoff}")
-
-    else:
-        msg = f"Finished BiG-SCAPE cutoff {cutoff}"
-        print(msg)
-        if status_callback:
-            status_callback(msg)
+            update_status(f"Finished BiG-SCAPE cutoff {cutoff}")
+
+    if compact_outputs:
+        with manifest.stage("compact", batch_name) as record:
+            results = compact_batch(
+                antismash_dir,
+                workers=table_workers,
+                genome_ids=[
+                    genome.stem for genome in genomes if genome.name not in failures
+                ]
+            )
+            # directories compacted by an earlier run count in neither total
+            compacted = [r for r in results if not r.already_compacted]
+            n_already = len(results) - len(compacted)
+            before = sum(r.bytes_before for r in compacted)
+            after = sum(r.bytes_after for r in compacted)
+            record["detail"] = f"{before} bytes into {after} bytes"
+        update_status(
+            f"Compacted antiSMASH outputs of {len(compacted)} genome(s) from "
+            f"{before / 1e6:.1f} MB to {after / 1e6:.1f} MB"
+            + (f"; {n_already} already compacted" if n_already else "")
+        )
 
-    final_msg = f"Batch {batch_name} complete."
-    print(final_msg)
-    if status_callback:
-        status_callback(final_msg)
+    update_status(f"Batch {batch_name} complete.")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.exit("Usage: python run_batch.py <batch_name>")
-
-    run_batch(sys.argv[1], [0.3])
\ No newline at end of file
+    parser = argparse.ArgumentParser(
+        description="Run the BGC discovery pipeline on a batch"
+    )
+    parser.add_argument("batch")
+    parser.add_argument("--cutoffs", type=float, nargs="+", default=[0.3])
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="antiSMASH containers to run at the same time"
+    )
+    parser.add_argument(
+        "--cpus", type=int, default=None,
+        help="CPU budget per antiSMASH container"
+    )
+    parser.add_argument(
+        "--core-budget", type=int, default=None,
+        help="total cores shared by all antiSMASH containers; "
+             "genomes run longest-first with size-based CPU counts"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="do not reuse antiSMASH results or domain annotations from other batches"
+    )
+    parser.add_argument(
+        "--split-chunks", type=int, default=None,
+        help="split multi-contig genomes into up to this many parallel antiSMASH runs"
+    )
+    parser.add_argument(
+        "--genome-identity", type=float, default=None,
+        help="sketch the genomes and group those at or above this ANI, e.g. 0.999"
+    )
+    parser.add_argument(
+        "--dedupe-genomes", action="store_true",
+        help="run antiSMASH on one genome per --genome-identity group and reuse its results"
+    )
+    parser.add_argument(
+        "--no-region-dedup", action="store_true",
+        help="run BiG-SCAPE on every region, including identical copies"
+    )
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="replace antiSMASH output directories with indexed archives after the run"
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="skip steps that already completed with the same inputs"
+    )
+    args = parser.parse_args()
+
+    cache_dir = None
+    domain_cache_dir = None
+    if not args.no_cache:
+        cache_dir = Path(__file__).resolve().parents[1] / "cache" / "antismash"
+        domain_cache_dir = cache_dir.parent / "bigscape_domains"
+
+    run_batch(
+        args.batch,
+        args.cutoffs,
+        antismash_workers=args.workers,
+        antismash_cpus=args.cpus,
+        antismash_cache_dir=cache_dir,
+        antismash_core_budget=args.core_budget,
+        domain_cache_dir=domain_cache_dir,
+        resume=args.resume,
+        split_chunks=args.split_chunks,
+        genome_identity=args.genome_identity,
+        dedupe_genomes=args.dedupe_genomes,
+        dedupe_regions=not args.no_region_dedup,
+        compact_outputs=args.compact
+    )
\ No newline at end of file
@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MANIFEST_JSON = "run_manifest.json"
+MANIFEST_CSV = "run_manifest.csv"
+
+STAGE_FIELDS = [
+    "stage",
+    "name",
+    "status",
+    "exit_code",
+    "started",
+    "wall_seconds",
+    "cpu_seconds",
+    "peak_memory_bytes",
+    "measured_by",
+    "detail",
+]
+
+SAMPLE_SECONDS = 5.0
+
+MEMORY_UNITS = {
+    "b": 1,
+    "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3, "tb": 1000 ** 4,
+    "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4,
+}
+MEMORY_VALUE = re.compile(r"([\d.]+)\s*([a-zA-Z]+)")
+
+
+def container_name(*parts: str) -> str:
+    """
+    Docker container name built from ``parts``, with characters docker
+    does not accept replaced.
+    """
+    name = "-".join(str(p) for p in parts)
+    name = re.sub(r"[^a-zA-Z0-9_.-]", "_", name)
+    return f"bgc-{name}-{os.getpid()}-{threading.get_ident() % 100000}"
+
+
+def parse_memory(text: str) -> int:
+    """
+    Convert a docker memory figure such as ``1.5GiB`` to bytes.
+    """
+    match = MEMORY_VALUE.match(text.strip())
+    if not match:
+        return None
+    unit = MEMORY_UNITS.get(match.group(2).lower())
+    if unit is None:
+        return None
+    return int(float(match.group(1)) * unit)
+
+
+class ContainerSampler:
+    """
+    Poll ``docker stats`` for a running container in a background thread.
+
+    Docker only reports instantaneous CPU percentages, so CPU time is
+    estimated by integrating them over the sampling interval. Peak memory is
+    the highest usage seen in any sample.
+    """
+
+    def __init__(self, name: str, runner=subprocess.run,
+                 interval: float = SAMPLE_SECONDS):
+        self.name = name
+        self.runner = runner
+        self.interval = interval
+        self.cpu_seconds = None
+        self.peak_memory_bytes = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> tuple:
+        try:
+            result = self.runner(
+                ["docker", "stats", "--no-stream", "--format",
+                 "{{.CPUPerc}}\t{{.MemUsage}}", self.name],
+                check=True,
+                capture_output=True,
+                text=True
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+        fields = (getattr(result, "stdout", "") or "").strip().split("\t")
+        if len(fields) != 2:
+            return None
+        try:
+            cpu = float(fields[0].rstrip("%")) / 100
+        except ValueError:
+            return None
+        return cpu, parse_memory(fields[1].split("/")[0])
+
+    def _run(self) -> None:
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            sample = self._sample()
+            now = time.monotonic()
+            if sample is not None:
+                cpu, memory = sample
+                self.cpu_seconds = (self.cpu_seconds or 0.0) + cpu * (now - last)
+                if memory is not None:
+                    self.peak_memory_bytes = max(self.peak_memory_bytes or 0, memory)
+            last = now
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _process_usage() -> tuple:
+    """
+    CPU seconds used by this process and its reaped children, and the peak
+    resident memory of this process in bytes.
+    """
+    if resource is None:
+        return None, None
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1 if sys.platform == "darwin" else 1024
+    return cpu, own.ru_maxrss * scale
+
+
+class RunManifest:
+    """
+    Structured timing and resource record of one pipeline run.
+
+    Every stage (an antiSMASH genome, the statistics, a BiG-SCAPE run) is
+    recorded with its wall time, status, exit code and, where available,
+    CPU time and peak memory. Container stages are measured with sampled
+    ``docker stats``; in-process stages with ``getrusage``. The manifest is
+    rewritten as JSON and CSV in the batch directory after every stage, so
+    it also shows how far an interrupted run got.
+
+    Parameters
+    ----
+    batch_dir : Path
+        Batch directory the manifest files are written to.
+    batch_name : str
+        Batch name recorded in the manifest.
+    profiler : callable, optional
+        Called as ``profiler(stage, name)`` and expected to return a context
+        manager that wraps the stage, e.g. to run ``cProfile`` or push
+        timings to a monitoring system.
+    """
+
+    def __init__(self, batch_dir: Path, batch_name: str, profiler=None):
+        self.batch_dir = Path(batch_dir)
+        self.batch_name = batch_name
+        self.profiler = profiler
+        self.started = time.time()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, stage: str, name: str = "", container: str = None,
+              runner=subprocess.run):
+        """
+        Record a stage around the ``with`` block.
+
+        The yielded dict can be updated inside the block, e.g. with
+        ``exit_code``, a ``detail`` string or a non-default ``status``.
+        Exceptions mark the stage as failed and are re-raised.
+
+        Parameters
+        ----
+        stage : str
+            Stage kind, e.g. ``"antismash"``.
+        name : str
+            What the stage ran on, e.g. the genome file.
+        container : str, optional
+            Name of the docker container the stage runs, sampled for CPU
+            and memory use.
+        runner : callable
+            Replacement for ``subprocess.run`` for the ``docker stats``
+            calls.
+        """
+        record = dict.fromkeys(STAGE_FIELDS)
+        record.update(stage=stage, name=name, started=time.time())
+
+        sampler = None
+        if container is not None:
+            sampler = ContainerSampler(container, runner=runner)
+            sampler.start()
+        cpu_before, _ = _process_usage()
+        start = time.perf_counter()
+
+        profile = self.profiler(stage, name) if self.profiler else nullcontext()
+
+        try:
+            with profile:
+                yield record
+        except BaseException as e:
+            record["status"] = "failed"
+            if isinstance(e, subprocess.CalledProcessError):
+                record["exit_code"] = e.returncode
+                reason = f"exit code {e.returncode}"
+            else:
+                reason = str(e) or type(e).__name__
+            record["detail"] = record["detail"] or reason
+            raise
+        else:
+            record["status"] = record["status"] or "ok"
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - start, 3)
+
+            if sampler is not None:
+                sampler.stop()
+                record["cpu_seconds"] = sampler.cpu_seconds
+                record["peak_memory_bytes"] = sampler.peak_memory_bytes
+                record["measured_by"] = "docker stats"
+            else:
+                cpu_after, peak = _process_usage()
+                if cpu_after is not None:
+                    record["cpu_seconds"] = cpu_after - cpu_before
+                    record["peak_memory_bytes"] = peak
+                    record["measured_by"] = "getrusage"
+
+            if record["cpu_seconds"] is not None:
+                record["cpu_seconds"] = round(record["cpu_seconds"], 3)
+
+            with self._lock:
+                self.stages.append(record)
+                self.write()
+
+    def write(self) -> None:
+        """
+        Write ``run_manifest.json`` and ``run_manifest.csv``.
+        """
+        manifest = {
+            "batch": self.batch_name,
+            "started": self.started,
+            "updated": time.time(),
+            "host": {
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "stages": self.stages,
+        }
+
+        json_path = self.batch_dir / MANIFEST_JSON
+        tmp_path = json_path.with_name(f".{MANIFEST_JSON}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, json_path)
+
+        csv_path = self.batch_dir / MANIFEST_CSV
+        tmp_path = csv_path.with_name(f".{MANIFEST_CSV}.tmp")
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=STAGE_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.stages)
+        os.replace(tmp_path, csv_path)
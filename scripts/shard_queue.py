@@ -0,0 +1,549 @@
+from pathlib import Path
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scripts.antismash_runner import (
+    run_antismash_pool,
+    antismash_complete,
+    antismash_fingerprint,
+    antismash_step
+)
+from scripts.antismash_cache import AntismashCache, DEFAULT_MAX_BYTES
+from scripts.batch_state import BatchState
+from scripts.run_manifest import RunManifest
+
+PIPELINE_ROOT = Path(__file__).resolve().parents[1]
+
+SHARDS_DIR = "shards"
+QUEUE_FILE = "queue.json"
+CLAIMS_DIR = "claims"
+DONE_DIR = "done"
+WORKERS_DIR = "workers"
+
+LEASE_SECONDS = 300.0
+HEARTBEAT_SECONDS = 60.0
+POLL_SECONDS = 5.0
+
+OK = "ok"
+FAILED = "failed"
+
+GENOME_GLOBS = ("*.fna", "*.fasta", "*.gbk", "*.txt")
+
+### queue files ###
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def batch_dir(batch_name: str) -> Path:
+    return PIPELINE_ROOT / "batches" / batch_name
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def init_queue(batch: Path) -> list:
+    """
+    Create the shard queue of a batch, one task per genome file.
+
+    ``.txt`` genomes are renamed to ``.fasta`` first, as ``run_batch``
+    does. Tasks that failed in an earlier attempt are reset so they are
+    tried again; finished tasks are kept.
+
+    Returns
+    ----
+    list
+        Genome file names of all tasks.
+    """
+    input_dir = batch / "input"
+    if not input_dir.exists():
+        sys.exit(f"ERROR: Input directory not found: {input_dir}")
+
+    for genome in input_dir.glob("*.txt"):
+        genome.rename(genome.with_suffix(".fasta"))
+
+    genomes = sorted({
+        genome.name
+        for pattern in GENOME_GLOBS
+        for genome in input_dir.glob(pattern)
+    })
+    if not genomes:
+        sys.exit(f"ERROR: No genome files found in {input_dir}")
+
+    shards = batch / SHARDS_DIR
+    for name in (CLAIMS_DIR, DONE_DIR, WORKERS_DIR):
+        (shards / name).mkdir(parents=True, exist_ok=True)
+
+    for genome_name in genomes:
+        done = read_done(batch, genome_name)
+        if done is not None and done["status"] == FAILED:
+            (shards / DONE_DIR / f"{genome_name}.json").unlink(missing_ok=True)
+
+    _write_json(shards / QUEUE_FILE, {"genomes": genomes, "created": time.time()})
+    return genomes
+
+
+def queued_genomes(batch: Path) -> list:
+    queue = _read_json(batch / SHARDS_DIR / QUEUE_FILE)
+    return queue["genomes"] if queue else []
+
+
+def read_done(batch: Path, genome_name: str) -> dict:
+    return _read_json(batch / SHARDS_DIR / DONE_DIR / f"{genome_name}.json")
+
+
+def queue_progress(batch: Path) -> dict:
+    """
+    Count the tasks of a batch's shard queue by state.
+
+    Returns
+    ----
+    dict
+        ``{"total", "ok", "failed", "leased", "pending"}``.
+    """
+    counts = dict.fromkeys(("ok", "failed", "leased", "pending"), 0)
+    now = time.time()
+    genomes = queued_genomes(batch)
+
+    for genome_name in genomes:
+        done = read_done(batch, genome_name)
+        if done is not None:
+            counts[done["status"]] += 1
+            continue
+
+        lease = _read_json(batch / SHARDS_DIR / CLAIMS_DIR / f"{genome_name}.lease")
+        if lease is not None and lease["expires"] > now:
+            counts["leased"] += 1
+        else:
+            counts["pending"] += 1
+
+    counts["total"] = len(genomes)
+    return counts
+
+### leases ###
+
+class Lease:
+    """
+    Exclusive, expiring claim of one genome task by one worker.
+
+    A claim is an exclusively created lease file, as for pipeline jobs, so
+    two workers can never hold the same task. The holder renews the lease
+    every ``HEARTBEAT_SECONDS`` (at most a third of the lease) from a
+    background thread; a lease that was not renewed for ``lease_seconds``
+    belongs to a dead worker and may be taken over. Takeovers of a task
+    are serialized by an exclusively created ``.takeover`` file, under
+    which the expired lease is read again before it is removed, so a
+    worker never removes a lease another worker has just created.
+    """
+
+    def __init__(self, batch: Path, genome_name: str, worker_id: str,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.path = batch / SHARDS_DIR / CLAIMS_DIR / f"{genome_name}.lease"
+        self.genome_name = genome_name
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _record(self) -> dict:
+        return {
+            "worker": self.worker_id,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "expires": time.time() + self.lease_seconds,
+        }
+
+    def _remove_expired(self, current: dict) -> bool:
+        takeover = self.path.with_name(f".{self.path.name}.takeover")
+        try:
+            fd = os.open(takeover, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # another worker is taking it over, or died doing so
+            try:
+                if time.time() - takeover.stat().st_mtime > self.lease_seconds:
+                    takeover.unlink()
+            except FileNotFoundError:
+                pass
+            return False
+        os.close(fd)
+
+        try:
+            if _read_json(self.path) != current:
+                # renewed, released or already taken over
+                return False
+            self.path.unlink(missing_ok=True)
+            return True
+        finally:
+            takeover.unlink(missing_ok=True)
+
+    def acquire(self) -> bool:
+        current = _read_json(self.path)
+        if current is not None and current["expires"] < time.time():
+            if not self._remove_expired(current):
+                return False
+
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._record(), f)
+        return True
+
+    def held(self) -> bool:
+        current = _read_json(self.path)
+        return current is not None and current["worker"] == self.worker_id
+
+    def _renew(self) -> None:
+        while not self._stop.wait(min(HEARTBEAT_SECONDS, self.lease_seconds / 3)):
+            if not self.held():
+                return
+            _write_json(self.path, self._record())
+
+    def start_heartbeat(self) -> None:
+        self._thread = threading.Thread(target=self._renew, daemon=True)
+        self._thread.start()
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.held():
+            self.path.unlink(missing_ok=True)
+
+
+def claim_next_task(batch: Path, worker_id: str,
+                    lease_seconds: float = LEASE_SECONDS) -> Lease:
+    """
+    Claim the first unfinished genome task that is not leased, or whose
+    lease expired.
+
+    Returns
+    ----
+    Lease or None
+        The claimed task, with its heartbeat not yet started.
+    """
+    for genome_name in queued_genomes(batch):
+        if read_done(batch, genome_name) is not None:
+            continue
+
+        lease = Lease(batch, genome_name, worker_id, lease_seconds)
+        if lease.acquire():
+            # another worker may have finished it between the checks
+            if read_done(batch, genome_name) is not None:
+                lease.release()
+                continue
+            return lease
+
+    return None
+
+### worker ###
+
+def run_shard_worker(
+    batch_name: str,
+    worker_id: str = None,
+    antismash_cpus: int = None,
+    docker_runner=subprocess.run,
+    antismash_cache_dir: Path = None,
+    antismash_cache_max_bytes: int = DEFAULT_MAX_BYTES,
+    lease_seconds: float = LEASE_SECONDS,
+    poll: float = POLL_SECONDS
+) -> int:
+    """
+    Run antiSMASH on genome tasks of a sharded batch until every task is
+    finished.
+
+    Each claimed genome runs through ``run_antismash_pool`` (so partial
+    output is never left behind) and is then marked done with its status
+    and input fingerprint. An existing output directory is only kept when
+    the batch state, which workers read but never write, does not show it
+    to be from a different genome file. Timing goes to a per-worker run
+    manifest under ``shards/workers/<worker id>/``. While other workers
+    still hold leases the worker keeps polling, so it takes over tasks of
+    workers that die.
+
+    Returns
+    ----
+    int
+        Number of tasks this worker finished.
+    """
+    batch = batch_dir(batch_name)
+    shards = batch / SHARDS_DIR
+    input_dir = batch / "input"
+    antismash_dir = batch / "antismash"
+    antismash_dir.mkdir(exist_ok=True)
+
+    worker_id = worker_id or new_worker_id()
+    worker_dir = shards / WORKERS_DIR / worker_id
+    worker_dir.mkdir(parents=True, exist_ok=True)
+    manifest = RunManifest(worker_dir, batch_name)
+
+    cache = None
+    if antismash_cache_dir is not None:
+        cache = AntismashCache(antismash_cache_dir, max_bytes=antismash_cache_max_bytes)
+
+    def update_status(msg: str) -> None:
+        print(f"[{worker_id}] {msg}", flush=True)
+
+    n_finished = 0
+
+    while True:
+        lease = claim_next_task(batch, worker_id, lease_seconds)
+
+        if lease is None:
+            progress = queue_progress(batch)
+            if progress["pending"] + progress["leased"] == 0:
+                update_status(f"No tasks left, finished {n_finished}")
+                return n_finished
+            time.sleep(poll)
+            continue
+
+        genome = input_dir / lease.genome_name
+        genome_out = antismash_dir / genome.stem
+        lease.start_heartbeat()
+        try:
+            if genome_out.exists() and not antismash_complete(
+                genome, genome_out, BatchState(batch), record_legacy=False
+            ):
+                update_status(
+                    f"Re-running antiSMASH for {genome.name} "
+                    "(output incomplete or from a different genome file)"
+                )
+                shutil.rmtree(genome_out)
+            failures = run_antismash_pool(
+                [genome],
+                input_dir,
+                antismash_dir,
+                cpus=antismash_cpus,
+                runner=docker_runner,
+                update_status=update_status,
+                cache=cache,
+                manifest=manifest
+            )
+            done = {
+                "worker": worker_id,
+                "finished": time.time(),
+                "status": FAILED if failures else OK,
+                "error": failures.get(genome.name),
+                "fingerprint": None if failures else antismash_fingerprint(genome),
+            }
+            if lease.held():
+                _write_json(shards / DONE_DIR / f"{genome.name}.json", done)
+                n_finished += 1
+            else:
+                update_status(
+                    f"Lost the lease of {genome.name} to another worker; "
+                    "not marking it done"
+                )
+        finally:
+            lease.release()
+
+### coordinator ###
+
+def _worker_process(batch_name: str, options: dict) -> None:
+    run_shard_worker(batch_name, **options)
+
+
+def run_sharded_batch(
+    batch_name: str,
+    bigscape_cutoffs: list,
+    local_workers: int = 0,
+    worker_options: dict = None,
+    status_callback=None,
+    poll: float = POLL_SECONDS,
+    **run_batch_options
+) -> None:
+    """
+    Coordinate a batch whose antiSMASH stage is spread over several worker
+    processes or machines sharing the batch directory.
+
+    Creates the shard queue, optionally starts ``local_workers`` worker
+    processes on this machine, and waits until every genome task is done.
+    The finished genomes are then recorded in the batch state and
+    ``run_batch`` runs in resume mode, so it only builds the statistics,
+    BiG-SCAPE and GCF tables; genomes that failed on a worker are passed
+    on as failures instead of being run again. A genome whose file changed
+    after its worker fingerprinted it is not recorded, so ``run_batch``
+    runs it again.
+
+    Parameters
+    ----
+    batch_name : str
+        Batch to run.
+    bigscape_cutoffs : list
+        BiG-SCAPE cutoffs passed to ``run_batch``.
+    local_workers : int
+        Worker processes to start on this machine, e.g. to test sharding
+        on one box. Workers on other machines are started with
+        ``scripts/shard_queue.py worker``.
+    worker_options : dict, optional
+        Keyword arguments for ``run_shard_worker`` of the local workers.
+    status_callback : callable, optional
+        Receives status messages, as for ``run_batch``.
+    **run_batch_options
+        Passed to ``run_batch``.
+    """
+    from scripts.run_batch import run_batch
+
+    def update_status(msg: str) -> None:
+        if status_callback is not None:
+            status_callback(msg)
+        print(msg)
+
+    batch = batch_dir(batch_name)
+    genomes = init_queue(batch)
+    update_status(f"Queued {len(genomes)} genome(s) for sharded antiSMASH")
+
+    processes = [
+        multiprocessing.Process(
+            target=_worker_process,
+            args=(batch_name, worker_options or {})
+        )
+        for _ in range(local_workers)
+    ]
+    for process in processes:
+        process.start()
+
+    last = None
+    while True:
+        progress = queue_progress(batch)
+        if progress != last:
+            update_status(
+                f"antiSMASH shards: {progress['ok']} done, {progress['failed']} "
+                f"failed, {progress['leased']} running, {progress['pending']} "
+                f"waiting of {progress['total']}"
+            )
+            last = progress
+        if progress["pending"] + progress["leased"] == 0:
+            break
+        if processes and not any(p.is_alive() for p in processes) and not progress["leased"]:
+            update_status("All local shard workers stopped; waiting for other workers")
+            processes = []
+        time.sleep(poll)
+
+    for process in processes:
+        process.join()
+
+    state = BatchState(batch)
+    failures = {}
+    for genome_name in genomes:
+        done = read_done(batch, genome_name)
+        genome = batch / "input" / genome_name
+        genome_out = batch / "antismash" / genome.stem
+        if done["status"] == OK and genome_out.exists():
+            if done["fingerprint"] == antismash_fingerprint(genome):
+                state.mark_complete(
+                    antismash_step(genome),
+                    done["fingerprint"],
+                    [genome_out]
+                )
+        else:
+            failures[genome_name] = done["error"] or "failed on a shard worker"
+
+    run_batch(
+        batch_name,
+        bigscape_cutoffs,
+        status_callback=status_callback,
+        antismash_failures=failures,
+        resume=True,
+        **run_batch_options
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Sharded antiSMASH execution over a shared batch directory"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker_cmd = commands.add_parser("worker", help="run antiSMASH tasks of a batch")
+    worker_cmd.add_argument("batch")
+    worker_cmd.add_argument(
+        "--cpus", type=int, default=None,
+        help="CPU budget of the antiSMASH container"
+    )
+    worker_cmd.add_argument(
+        "--no-cache", action="store_true",
+        help="do not reuse antiSMASH results from other batches"
+    )
+
+    coordinate_cmd = commands.add_parser(
+        "coordinate",
+        help="queue a batch, wait for its shards and run the remaining stages"
+    )
+    coordinate_cmd.add_argument("batch")
+    coordinate_cmd.add_argument("--cutoffs", type=float, nargs="+", default=[0.3])
+    coordinate_cmd.add_argument(
+        "--local-workers", type=int, default=0,
+        help="worker processes to start on this machine"
+    )
+    coordinate_cmd.add_argument(
+        "--cpus", type=int, default=None,
+        help="CPU budget of each local worker's antiSMASH container"
+    )
+    coordinate_cmd.add_argument(
+        "--no-cache", action="store_true",
+        help="do not reuse antiSMASH results or domain annotations from other batches"
+    )
+
+    status_cmd = commands.add_parser("status", help="show shard progress of a batch")
+    status_cmd.add_argument("batch")
+
+    args = parser.parse_args()
+
+    cache_dir = None
+    if args.command != "status" and not args.no_cache:
+        cache_dir = PIPELINE_ROOT / "cache" / "antismash"
+
+    if args.command == "worker":
+        n = run_shard_worker(
+            args.batch,
+            antismash_cpus=args.cpus,
+            antismash_cache_dir=cache_dir
+        )
+        print(f"Worker finished {n} genome(s)")
+
+    elif args.command == "coordinate":
+        run_sharded_batch(
+            args.batch,
+            args.cutoffs,
+            local_workers=args.local_workers,
+            worker_options={
+                "antismash_cpus": args.cpus,
+                "antismash_cache_dir": cache_dir,
+            },
+            antismash_cache_dir=cache_dir,
+            domain_cache_dir=cache_dir.parent / "bigscape_domains" if cache_dir else None
+        )
+
+    else:
+        progress = queue_progress(batch_dir(args.batch))
+        print(
+            f"{progress['ok']} done, {progress['failed']} failed, "
+            f"{progress['leased']} running, {progress['pending']} waiting "
+            f"of {progress['total']}"
+        )
@@ -0,0 +1,98 @@
+from pathlib import Path
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.synthetic_batch import region_record
+from scripts.antismash_runner import ANTISMASH_IMAGE
+
+
+class StubDocker:
+    """
+    Stand-in for ``subprocess.run`` answering the docker commands of the
+    antiSMASH runners.
+
+    An antiSMASH run writes one region file and ``index.html`` into its
+    ``--output-dir`` after ``delay`` seconds; genomes named in ``fail``
+    exit with status 1 instead. ``docker stats`` returns no samples.
+    """
+
+    def __init__(self, delay: float = 0.0, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.runs = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, cmd, check=False, **kwargs):
+        if cmd[:2] == ["docker", "stats"]:
+            return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+        mounts = dict(
+            reversed(cmd[i + 1].rsplit(":", 1))
+            for i, arg in enumerate(cmd) if arg == "-v"
+        )
+        genome_name = cmd[cmd.index(ANTISMASH_IMAGE) + 1]
+        output_dir = cmd[cmd.index("--output-dir") + 1]
+        output = Path(mounts["/output"]) / Path(output_dir).relative_to("/output")
+
+        with self._lock:
+            self.runs.append(genome_name)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if genome_name in self.fail:
+                raise subprocess.CalledProcessError(1, cmd)
+            output.mkdir(parents=True)
+            stem = Path(genome_name).stem
+            (output / f"{stem}.region001.gbk").write_text("LOCUS       stub\n//\n")
+            (output / "index.html").write_text("<html></html>\n")
+        finally:
+            with self._lock:
+                self.running -= 1
+
+        return subprocess.CompletedProcess(cmd, 0)
+
+
+def write_genomes(input_dir: Path, names) -> list:
+    input_dir.mkdir(parents=True, exist_ok=True)
+    genomes = []
+    for i, name in enumerate(names):
+        genome = input_dir / name
+        genome.write_text(f">contig{i}\n{'ACGT' * 50}\n")
+        genomes.append(genome)
+    return genomes
+
+
+def write_region(
+    genome_dir: Path,
+    contig_id: str,
+    region_number: int,
+    products=("NRPS",),
+    length: int = 20_000,
+    seed: int = 0,
+    **kwargs
+) -> Path:
+    """
+    Write a synthetic antiSMASH region file; the same seed gives the same
+    features and domains whatever the contig.
+    """
+    genome_dir.mkdir(parents=True, exist_ok=True)
+    gbk_file = genome_dir / f"{contig_id}.region{region_number:03d}.gbk"
+    gbk_file.write_text(region_record(
+        random.Random(seed), contig_id, region_number, list(products), length, **kwargs
+    ))
+    return gbk_file
+
+
+@pytest.fixture
+def stub_docker():
+    return StubDocker()
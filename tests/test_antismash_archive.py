@@ -0,0 +1,124 @@
+import os
+
+from conftest import write_region
+
+import scripts.antismash_archive as antismash_archive
+from scripts.antismash_archive import (
+    ARCHIVE_FILE,
+    EXTRACTED_DIR,
+    INDEX_FILE,
+    archive_has,
+    archived_region_files,
+    compact_genome_dir,
+    default_codec,
+    extract_genome_dir,
+    is_archived,
+    read_index,
+    read_member
+)
+
+
+def write_output(genome_dir):
+    """
+    antiSMASH-like output directory; returns the contents of every file by
+    relative path.
+    """
+    write_region(genome_dir, "contig1", 1, seed=1)
+    write_region(genome_dir, "contig1", 2, products=("T1PKS",), seed=2)
+    write_region(genome_dir, "contig2", 1, seed=3)
+    (genome_dir / "index.html").write_text("<html></html>\n")
+    (genome_dir / "js").mkdir()
+    (genome_dir / "js" / "regions.js").write_bytes(os.urandom(5000))
+    (genome_dir / "empty.txt").write_bytes(b"")
+    return {
+        p.relative_to(genome_dir).as_posix(): p.read_bytes()
+        for p in genome_dir.rglob("*") if p.is_file()
+    }
+
+
+def test_compact_read_and_extract_round_trip(tmp_path):
+    genome_dir = tmp_path / "g1"
+    contents = write_output(genome_dir)
+    mtime_ns = (genome_dir / "index.html").stat().st_mtime_ns
+
+    result = compact_genome_dir(genome_dir)
+
+    assert result.genome_id == "g1" and result.n_files == len(contents)
+    assert not result.already_compacted
+    assert is_archived(genome_dir)
+    assert sorted(p.name for p in genome_dir.iterdir()) == [ARCHIVE_FILE, INDEX_FILE]
+    assert read_index(genome_dir)["codec"] == default_codec()
+    assert archive_has(genome_dir, "index.html") and not archive_has(genome_dir, "x.html")
+    for name, data in contents.items():
+        assert read_member(genome_dir, name) == data
+
+    regions = archived_region_files(genome_dir)
+    assert sorted(p.name for p in regions) == [
+        "contig1.region001.gbk", "contig1.region002.gbk", "contig2.region001.gbk"
+    ]
+    assert all(p.parent == genome_dir / EXTRACTED_DIR for p in regions)
+    assert all(p.read_bytes() == contents[p.name] for p in regions)
+
+    assert extract_genome_dir(genome_dir) == len(contents)
+    assert not is_archived(genome_dir)
+    assert not (genome_dir / ARCHIVE_FILE).exists()
+    assert not (genome_dir / EXTRACTED_DIR).exists()
+    assert {
+        p.relative_to(genome_dir).as_posix(): p.read_bytes()
+        for p in genome_dir.rglob("*") if p.is_file()
+    } == contents
+    assert (genome_dir / "index.html").stat().st_mtime_ns == mtime_ns
+
+
+def test_compacting_twice_removes_leftover_files(tmp_path):
+    genome_dir = tmp_path / "g1"
+    contents = write_output(genome_dir)
+    compact_genome_dir(genome_dir)
+    archive = (genome_dir / ARCHIVE_FILE).read_bytes()
+
+    # an interrupted compaction leaves the loose files next to the archive
+    (genome_dir / "index.html").write_bytes(contents["index.html"])
+    (genome_dir / "js").mkdir()
+    (genome_dir / "js" / "regions.js").write_bytes(contents["js/regions.js"])
+
+    result = compact_genome_dir(genome_dir)
+
+    assert result.already_compacted and result.n_files == 2
+    assert result.bytes_after == len(archive)
+    assert sorted(p.name for p in genome_dir.iterdir()) == [ARCHIVE_FILE, INDEX_FILE]
+    assert (genome_dir / ARCHIVE_FILE).read_bytes() == archive
+
+
+def test_leftover_files_that_differ_are_kept(tmp_path):
+    genome_dir = tmp_path / "g1"
+    write_output(genome_dir)
+    compact_genome_dir(genome_dir)
+    (genome_dir / "index.html").write_text("<html>changed</html>\n")
+
+    assert compact_genome_dir(genome_dir).already_compacted
+    assert (genome_dir / "index.html").exists()
+
+
+def test_zlib_fallback_without_zstandard(tmp_path, monkeypatch):
+    monkeypatch.setattr(antismash_archive, "zstandard", None)
+    assert default_codec() == "zlib"
+
+    genome_dir = tmp_path / "g1"
+    contents = write_output(genome_dir)
+    result = compact_genome_dir(genome_dir)
+
+    assert read_index(genome_dir)["codec"] == "zlib"
+    assert result.bytes_after < result.bytes_before
+    assert read_member(genome_dir, "contig2.region001.gbk") == contents["contig2.region001.gbk"]
+    extract_genome_dir(genome_dir)
+    assert (genome_dir / "js" / "regions.js").read_bytes() == contents["js/regions.js"]
+
+
+def test_explicit_zlib_codec(tmp_path):
+    genome_dir = tmp_path / "g1"
+    contents = write_output(genome_dir)
+
+    compact_genome_dir(genome_dir, codec="zlib")
+
+    assert read_index(genome_dir)["codec"] == "zlib"
+    assert read_member(genome_dir, "index.html") == contents["index.html"]
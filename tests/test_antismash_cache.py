@@ -0,0 +1,56 @@
+import scripts.antismash_cache as antismash_cache
+from scripts.antismash_cache import AntismashCache, file_sha256
+
+
+def write_output(output_dir, basename):
+    output_dir.mkdir(parents=True)
+    (output_dir / f"{basename}.region001.gbk").write_text("LOCUS       a\n//\n")
+    (output_dir / f"{basename}.json").write_text("{}\n")
+    (output_dir / "index.html").write_text("<html></html>\n")
+
+
+def test_key_depends_on_genome_digest_and_options(tmp_path):
+    genome = tmp_path / "g.fna"
+    genome.write_text(">c\nACGT\n")
+    key = AntismashCache.key(genome, "sha256:1", ["--a"])
+
+    assert key == AntismashCache.key(genome, "sha256:1", ["--a"])
+    assert key != AntismashCache.key(genome, "sha256:2", ["--a"])
+    assert key != AntismashCache.key(genome, "sha256:1", ["--b"])
+    genome.write_text(">c\nACGA\n")
+    assert key != AntismashCache.key(genome, "sha256:1", ["--a"])
+
+
+def test_materialize_renames_files_to_the_new_genome(tmp_path):
+    cache = AntismashCache(tmp_path / "cache")
+    write_output(tmp_path / "a", "a")
+    cache.store("ab" * 32, tmp_path / "a", "a")
+
+    assert cache.materialize("ab" * 32, tmp_path / "b", "b")
+    assert sorted(p.name for p in (tmp_path / "b").iterdir()) == [
+        "b.json", "b.region001.gbk", "index.html"
+    ]
+    assert file_sha256(tmp_path / "b" / "b.json") == file_sha256(tmp_path / "a" / "a.json")
+
+
+def test_entry_evicted_while_materializing_is_a_miss(tmp_path, monkeypatch):
+    cache = AntismashCache(tmp_path / "cache")
+    write_output(tmp_path / "a", "a")
+    cache.store("ab" * 32, tmp_path / "a", "a")
+    entry = cache.entry_dir("ab" * 32)
+
+    link_or_copy = antismash_cache.link_or_copy
+    placed = []
+
+    def evicting_link_or_copy(src, dst):
+        link_or_copy(src, dst)
+        placed.append(dst)
+        if len(placed) == 1:
+            # another process evicts the entry after the first file
+            antismash_cache.shutil.rmtree(entry)
+
+    monkeypatch.setattr(antismash_cache, "link_or_copy", evicting_link_or_copy)
+
+    assert not cache.materialize("ab" * 32, tmp_path / "b", "b")
+    assert not (tmp_path / "b").exists()
+    assert not (tmp_path / ".b.cache-tmp").exists()
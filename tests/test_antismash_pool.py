@@ -0,0 +1,90 @@
+import threading
+
+from conftest import StubDocker, write_genomes
+
+from scripts.antismash_runner import run_antismash_pool
+from scripts.batch_state import BatchState
+
+
+def test_pool_bounds_concurrent_containers(tmp_path):
+    genomes = write_genomes(tmp_path / "input", [f"g{i}.fna" for i in range(6)])
+    runner = StubDocker(delay=0.2)
+
+    failures = run_antismash_pool(
+        genomes, tmp_path / "input", tmp_path / "antismash",
+        workers=2, runner=runner, update_status=lambda msg: None
+    )
+
+    assert failures == {}
+    assert sorted(runner.runs) == [g.name for g in genomes]
+    assert runner.max_running == 2
+    assert all((tmp_path / "antismash" / g.stem / "index.html").exists() for g in genomes)
+
+
+def test_pool_isolates_failing_genome(tmp_path):
+    genomes = write_genomes(tmp_path / "input", ["a.fna", "bad.fna", "c.fna"])
+    antismash_dir = tmp_path / "antismash"
+    state = BatchState(tmp_path)
+
+    failures = run_antismash_pool(
+        genomes, tmp_path / "input", antismash_dir,
+        workers=3, runner=StubDocker(fail={"bad.fna"}),
+        update_status=lambda msg: None, state=state
+    )
+
+    assert failures == {"bad.fna": "exit code 1"}
+    assert (antismash_dir / "a").is_dir() and (antismash_dir / "c").is_dir()
+    assert not (antismash_dir / "bad").exists()
+    assert not (antismash_dir / ".bad.partial").exists()
+    assert state.step("antismash:a.fna") is not None
+    assert state.step("antismash:bad.fna") is None
+
+
+def test_pool_skips_existing_output(tmp_path):
+    genomes = write_genomes(tmp_path / "input", ["a.fna", "b.fna"])
+    (tmp_path / "antismash" / "a").mkdir(parents=True)
+    runner = StubDocker()
+    messages = []
+
+    failures = run_antismash_pool(
+        genomes, tmp_path / "input", tmp_path / "antismash",
+        workers=2, runner=runner, update_status=messages.append
+    )
+
+    assert failures == {}
+    assert runner.runs == ["b.fna"]
+    assert "Skipping antiSMASH for a.fna (already exists)" in messages
+
+
+def test_pool_reruns_output_of_changed_genome(tmp_path):
+    genomes = write_genomes(tmp_path / "input", ["a.fna"])
+    state = BatchState(tmp_path)
+    run_antismash_pool(
+        genomes, tmp_path / "input", tmp_path / "antismash",
+        runner=StubDocker(), update_status=lambda msg: None, state=state
+    )
+
+    genomes[0].write_text(">contig0\nTTTT\n")
+    runner = StubDocker()
+    run_antismash_pool(
+        genomes, tmp_path / "input", tmp_path / "antismash",
+        runner=runner, update_status=lambda msg: None, state=state
+    )
+
+    assert runner.runs == ["a.fna"]
+
+
+def test_pool_reports_status_on_calling_thread(tmp_path):
+    genomes = write_genomes(tmp_path / "input", [f"g{i}.fna" for i in range(4)])
+    threads = set()
+
+    def update_status(msg):
+        threads.add(threading.get_ident())
+
+    run_antismash_pool(
+        genomes, tmp_path / "input", tmp_path / "antismash",
+        workers=4, runner=StubDocker(delay=0.05, fail={"g1.fna"}),
+        update_status=update_status
+    )
+
+    assert threads == {threading.get_ident()}
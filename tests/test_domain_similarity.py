@@ -0,0 +1,41 @@
+import csv
+
+from conftest import write_region
+
+from scripts.domain_similarity import (
+    collect_genome_regions,
+    run_prescreen,
+    family_tsv,
+    NETWORK_TSV,
+    OUTPUT_DIR
+)
+
+
+def read_tsv(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f, delimiter="\t"))
+
+
+def test_regions_of_different_contigs_keep_distinct_ids(tmp_path):
+    genome_dir = tmp_path / "antismash" / "g1"
+    write_region(genome_dir, "ctgA.1", 1, seed=1)
+    write_region(genome_dir, "ctgB.1", 1, seed=1)
+    write_region(tmp_path / "antismash" / "g2", "ctgA.1", 1, products=("terpene",), seed=2)
+
+    regions, failures = collect_genome_regions(genome_dir)
+    assert failures == []
+    assert [r.bgc_id for r in regions] == ["g1|ctgA.1.region001", "g1|ctgB.1.region001"]
+
+    result = run_prescreen(tmp_path, [0.3])
+    assert result["regions"] == 3
+
+    output_dir = tmp_path / OUTPUT_DIR
+    edges = read_tsv(output_dir / NETWORK_TSV)
+    assert {(e["bgc_id_a"], e["bgc_id_b"]) for e in edges} >= {
+        ("g1|ctgA.1.region001", "g1|ctgB.1.region001")
+    }
+
+    members = read_tsv(output_dir / family_tsv(0.3))
+    families = {row["bgc_id"]: row["family_id"] for row in members}
+    assert len(members) == len(families) == 3
+    assert families["g1|ctgA.1.region001"] == families["g1|ctgB.1.region001"]
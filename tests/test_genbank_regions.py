@@ -0,0 +1,90 @@
+import pytest
+
+from conftest import write_region
+
+from benchmarks.synthetic_batch import generate_batch
+from scripts.genbank_regions import (
+    _parse_location,
+    _parse_qualifiers,
+    iter_features,
+    parse_region_domains,
+    parse_region_header,
+    read_region_header,
+)
+
+SeqIO = pytest.importorskip("Bio.SeqIO")
+
+# qualifiers Biopython joins over line breaks without a space
+NO_SPACE_QUALIFIERS = {"translation"}
+
+
+def region_files(tmp_path):
+    generate_batch(
+        tmp_path, 3, seed=7, regions_per_genome=(2, 4),
+        region_length=(5_000, 15_000), contigs_per_genome=(1, 3)
+    )
+    return sorted((tmp_path / "antismash").glob("*/*.region*.gbk"))
+
+
+def read_lines(gbk_file):
+    with open(gbk_file) as f:
+        return f.readlines()
+
+
+def test_header_matches_biopython(tmp_path):
+    for gbk_file in region_files(tmp_path):
+        record = SeqIO.read(gbk_file, "genbank")
+        region = next(f for f in record.features if f.type == "region")
+
+        header = parse_region_header(read_lines(gbk_file))
+
+        assert header.contig_id == record.id
+        assert (header.start, header.end) == (
+            int(region.location.start), int(region.location.end)
+        )
+        assert header.products == region.qualifiers["product"]
+        assert read_region_header(gbk_file) == header
+
+
+@pytest.mark.parametrize("header_lines", [
+    ["ACCESSION   NZ_CP000001", "VERSION     NZ_CP000001.2"],
+    ["ACCESSION   NZ_CP000001 NZ_CP000009", "VERSION     NZ_CP000001.2"],
+    ["ACCESSION   NZ_CP000001"],
+    ["VERSION     NZ_CP000001.2"],
+    ["VERSION     contig_7"],
+    [],
+])
+def test_record_id_matches_biopython(tmp_path, header_lines):
+    gbk_file = write_region(tmp_path, "NZ_CP000001.2", 1, length=3_000)
+    lines = [
+        line for line in gbk_file.read_text().splitlines()
+        if not line.startswith(("ACCESSION", "VERSION"))
+    ]
+    lines[1:1] = header_lines
+    gbk_file.write_text("\n".join(lines) + "\n")
+
+    assert parse_region_header(read_lines(gbk_file)).contig_id == (
+        SeqIO.read(gbk_file, "genbank").id
+    )
+
+
+def test_features_match_biopython(tmp_path):
+    for gbk_file in region_files(tmp_path):
+        record = SeqIO.read(gbk_file, "genbank")
+        features = list(iter_features(read_lines(gbk_file)))
+
+        assert [key for key, _, _ in features] == [f.type for f in record.features]
+        for (key, location, qualifier_lines), feature in zip(features, record.features):
+            assert _parse_location(location) == (
+                int(feature.location.start), int(feature.location.end)
+            )
+            qualifiers = _parse_qualifiers(qualifier_lines)
+            for name in NO_SPACE_QUALIFIERS & qualifiers.keys():
+                qualifiers[name] = [v.replace(" ", "") for v in qualifiers[name]]
+            assert qualifiers == {k: list(v) for k, v in feature.qualifiers.items()}
+
+        pfam = sorted(
+            (int(f.location.start), f.qualifiers["db_xref"][0].split(".")[0])
+            for f in record.features if f.type == "PFAM_domain"
+        )
+        assert parse_region_domains(read_lines(gbk_file)) == [name for _, name in pfam]
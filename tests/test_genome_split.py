@@ -0,0 +1,96 @@
+import json
+from pathlib import Path
+
+from scripts.antismash_runner import antismash_complete
+from scripts.batch_state import BatchState
+from scripts.genome_split import CHUNKS_DIR, Chunk, merge_chunk_outputs
+
+# antiSMASH shortens both long identifiers to "long"
+CONTIG_ORDER = ["c1", "long_contig_a", "c2", "long_contig_b"]
+
+
+def write_chunk_output(output_dir, chunk, record_ids, regions):
+    """
+    Fake antiSMASH output of one chunk: region files given as
+    ``(record id, region number)``, the full GenBank and JSON results and
+    an HTML report.
+    """
+    chunk_out = output_dir / CHUNKS_DIR / chunk.path.stem
+    chunk_out.mkdir(parents=True)
+    for record_id, number in regions:
+        (chunk_out / f"{record_id}.region{number:03d}.gbk").write_text(
+            f"LOCUS       {record_id}\n"
+            f'                     /region_number="{number}"\n'
+            f"                     /note=\"from {chunk.path.stem}\"\n//\n"
+        )
+    (chunk_out / f"{chunk.path.stem}.gbk").write_text(
+        "".join(f"LOCUS       {record_id}\n//\n" for record_id in record_ids)
+    )
+    (chunk_out / f"{chunk.path.stem}.json").write_text(json.dumps({
+        "version": "7.1.0",
+        "input_file": chunk.path.name,
+        "records": [{"id": record_id} for record_id in record_ids],
+    }))
+    (chunk_out / "index.html").write_text("<html></html>\n")
+
+
+def test_merged_chunks_match_unsplit_layout(tmp_path):
+    genome = tmp_path / "g.fna"
+    output_dir = tmp_path / "antismash" / "g"
+    chunks = [
+        Chunk(Path("g.part001.fna"), ["c1", "long_contig_b"]),
+        Chunk(Path("g.part002.fna"), ["long_contig_a", "c2"]),
+    ]
+    write_chunk_output(
+        output_dir, chunks[0], ["c1", "long"], [("c1", 1), ("c1", 2), ("long", 1)]
+    )
+    write_chunk_output(
+        output_dir, chunks[1], ["long", "c2"], [("long", 1), ("c2", 1)]
+    )
+
+    n = merge_chunk_outputs(output_dir, genome, chunks, CONTIG_ORDER)
+
+    assert n == 5
+    assert sorted(p.name for p in output_dir.glob("*.region*.gbk")) == [
+        "c1.region001.gbk", "c1.region002.gbk", "c2.region001.gbk",
+        "long.region001.gbk", "long.region002.gbk",
+    ]
+    # regions keep their per-record numbers; the later of the colliding
+    # "long" records (long_contig_b) is renumbered after the earlier one
+    assert '/region_number="2"' in (output_dir / "c1.region002.gbk").read_text()
+    first = (output_dir / "long.region001.gbk").read_text()
+    second = (output_dir / "long.region002.gbk").read_text()
+    assert '/region_number="1"' in first and "g.part002" in first
+    assert '/region_number="2"' in second and "g.part001" in second
+
+    locus = [
+        line.split()[1]
+        for line in (output_dir / "g.gbk").read_text().splitlines()
+        if line.startswith("LOCUS")
+    ]
+    assert locus == ["c1", "long", "c2", "long"]
+    result = json.loads((output_dir / "g.json").read_text())
+    assert result["input_file"] == "g.fna"
+    assert [record["id"] for record in result["records"]] == locus
+
+    for chunk in chunks:
+        chunk_out = output_dir / CHUNKS_DIR / chunk.path.stem
+        assert sorted(p.name for p in chunk_out.iterdir()) == ["index.html"]
+
+
+def test_merged_genome_has_report_index(tmp_path):
+    genome = tmp_path / "input" / "g.fna"
+    genome.parent.mkdir()
+    genome.write_text(">c1\nACGT\n>c2\nACGT\n")
+    output_dir = tmp_path / "antismash" / "g"
+    chunks = [Chunk(Path("g.part001.fna"), ["c1"]), Chunk(Path("g.part002.fna"), ["c2"])]
+    write_chunk_output(output_dir, chunks[0], ["c1"], [("c1", 1)])
+    write_chunk_output(output_dir, chunks[1], ["c2"], [])
+
+    merge_chunk_outputs(output_dir, genome, chunks, ["c1", "c2"])
+
+    report = (output_dir / "index.html").read_text()
+    assert 'href="chunks/g.part001/index.html"' in report
+    assert 'href="chunks/g.part002/index.html"' in report
+    assert not list(output_dir.glob(".*.tmp"))
+    assert antismash_complete(genome, output_dir, BatchState(tmp_path))
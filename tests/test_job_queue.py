@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import scripts.job_queue as job_queue
+
+
+class FakePopen:
+    started = []
+
+    def __init__(self, cmd, **kwargs):
+        self.pid = os.getpid()
+        FakePopen.started.append(cmd)
+
+
+@pytest.fixture
+def fake_popen(monkeypatch):
+    FakePopen.started = []
+    monkeypatch.setattr(job_queue.subprocess, "Popen", FakePopen)
+    return FakePopen
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+
+def test_concurrent_sessions_start_one_worker(tmp_path, fake_popen):
+    barrier = threading.Barrier(6)
+    started = []
+
+    def session():
+        barrier.wait()
+        started.append(job_queue.ensure_worker(tmp_path))
+
+    threads = [threading.Thread(target=session) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert started.count(True) == 1
+    assert len(fake_popen.started) == 1
+    assert not job_queue.ensure_worker(tmp_path)
+
+
+def test_started_worker_takes_over_the_lock(tmp_path, fake_popen):
+    assert job_queue.ensure_worker(tmp_path)
+    assert job_queue.acquire_worker_lock(tmp_path)
+    assert json.loads((tmp_path / job_queue.WORKER_LOCK).read_text()) == {
+        "pid": os.getpid()
+    }
+
+
+def test_second_worker_exits(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "HANDOVER_SECONDS", 0.2)
+    (tmp_path / job_queue.WORKER_LOCK).write_text(json.dumps({"pid": os.getppid()}))
+
+    job_queue.run_worker(tmp_path, poll=0.01)
+
+    assert json.loads((tmp_path / job_queue.WORKER_LOCK).read_text())["pid"] == os.getppid()
+
+
+def test_lock_of_dead_worker_is_taken_over(tmp_path):
+    (tmp_path / job_queue.WORKER_LOCK).write_text(json.dumps({"pid": dead_pid()}))
+
+    assert job_queue.acquire_worker_lock(tmp_path)
+    assert job_queue.holds_worker_lock(tmp_path)
@@ -0,0 +1,101 @@
+import random
+
+from scripts.bigscape_families import batch_regions
+from scripts.region_dedup import (
+    batch_region_files,
+    group_identical_regions,
+    read_region_groups,
+    region_content_key,
+    stage_unique_regions,
+    STAGED_DIR
+)
+
+COMPLEMENT = str.maketrans("acgt", "tgca")
+
+
+def write_region(path, sequence, domains):
+    """
+    Minimal region GenBank file with ``PFAM_domain`` features given as
+    ``(start, end, accession)``.
+    """
+    lines = [
+        f"LOCUS       {path.stem[:16]:<16} {len(sequence):>11} bp    DNA     linear",
+        "FEATURES             Location/Qualifiers",
+    ]
+    for start, end, accession in domains:
+        lines += [
+            f"     PFAM_domain     {start}..{end}",
+            f'                     /db_xref="{accession}.1"',
+        ]
+    lines.append("ORIGIN")
+    for i in range(0, len(sequence), 60):
+        lines.append(f"{i + 1:>9} {sequence[i:i + 60]}")
+    lines.append("//")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def reverse_strand(sequence, domains):
+    n = len(sequence)
+    return (
+        sequence.translate(COMPLEMENT)[::-1],
+        [(n - end + 1, n - start + 1, accession) for start, end, accession in domains],
+    )
+
+
+def test_same_region_on_opposite_strands_gets_one_key(tmp_path):
+    sequence = "".join(random.Random(0).choices("acgt", k=600))
+    domains = [(10, 100, "PF00001"), (200, 300, "PF00002"), (400, 500, "PF00003")]
+
+    forward = write_region(tmp_path / "f.region001.gbk", sequence, domains)
+    reverse = write_region(tmp_path / "r.region001.gbk", *reverse_strand(sequence, domains))
+    # same domains at swapped positions
+    swapped = [(start, end, acc) for (start, end, _), (_, _, acc) in zip(domains, domains[::-1])]
+    other = write_region(tmp_path / "o.region001.gbk", sequence, swapped)
+
+    assert region_content_key(forward) == region_content_key(reverse)
+    assert region_content_key(forward) != region_content_key(other)
+
+
+def test_region_without_sequence_has_no_key(tmp_path):
+    gbk_file = tmp_path / "n.region001.gbk"
+    gbk_file.write_text("LOCUS       n\nFEATURES             Location/Qualifiers\n//\n")
+    assert region_content_key(gbk_file) is None
+
+
+def test_staged_groups_expand_to_every_copy(tmp_path):
+    sequence = "".join(random.Random(1).choices("acgt", k=600))
+    domains = [(10, 100, "PF00010"), (300, 400, "PF00020")]
+    antismash_dir = tmp_path / "antismash"
+    bigscape_dir = tmp_path / "bigscape"
+
+    write_region(antismash_dir / "g1" / "c1.1.region001.gbk", sequence, domains)
+    write_region(
+        antismash_dir / "g2" / "c2.1.region001.gbk", *reverse_strand(sequence, domains)
+    )
+    write_region(antismash_dir / "g2" / "c3.1.region001.gbk", sequence[::-1], domains[:1])
+
+    groups = group_identical_regions(batch_region_files(antismash_dir))
+    assert [[r.name for r in g] for g in groups] == [
+        ["c1.1.region001", "c2.1.region001"], ["c3.1.region001"]
+    ]
+
+    staged = stage_unique_regions(antismash_dir, bigscape_dir, "b1")
+    assert (staged.n_regions, staged.n_staged) == (3, 2)
+    assert sorted(
+        p.relative_to(bigscape_dir / STAGED_DIR).as_posix()
+        for p in (bigscape_dir / STAGED_DIR).rglob("*.gbk")
+    ) == ["g1/c1.1.region001.gbk", "g2/c3.1.region001.gbk"]
+
+    region_groups = read_region_groups(bigscape_dir)
+    assert region_groups == {("g2", "c2.1.region001"): ("g1", "c1.1.region001")}
+
+    nodes, names, copies = batch_regions(antismash_dir, region_groups)
+    index = {(n.genome_id, n.bgc_name): i for i, n in enumerate(nodes)}
+    assert copies == [(index[("g2", "c2.1.region001")], index[("g1", "c1.1.region001")])]
+    assert set(names) == {"c1.1.region001", "c3.1.region001"}
+
+
+def test_read_region_groups_without_staging(tmp_path):
+    assert read_region_groups(tmp_path) is None
@@ -0,0 +1,154 @@
+import json
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from conftest import StubDocker, write_genomes
+
+import scripts.run_batch
+import scripts.shard_queue as shard_queue
+from scripts.antismash_runner import antismash_fingerprint
+from scripts.batch_state import BatchState
+from scripts.run_manifest import MANIFEST_JSON
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(shard_queue, "PIPELINE_ROOT", tmp_path)
+    batch = tmp_path / "batches" / "b1"
+    write_genomes(batch / "input", ["a.fna", "b.fna", "c.fna"])
+    return batch
+
+
+def write_lease(batch, genome_name, worker, expires):
+    path = batch / shard_queue.SHARDS_DIR / shard_queue.CLAIMS_DIR / f"{genome_name}.lease"
+    path.write_text(json.dumps({"worker": worker, "expires": expires}))
+    return path
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="local workers must inherit the patched pipeline root"
+)
+def test_two_local_workers_finish_every_task(batch, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        scripts.run_batch, "run_batch",
+        lambda *args, **kwargs: calls.append(kwargs)
+    )
+
+    shard_queue.run_sharded_batch(
+        "b1", [0.3],
+        local_workers=2,
+        worker_options={"docker_runner": StubDocker(delay=0.2), "poll": 0.05},
+        poll=0.05
+    )
+
+    assert shard_queue.queue_progress(batch) == {
+        "total": 3, "ok": 3, "failed": 0, "leased": 0, "pending": 0
+    }
+    workers_dir = batch / shard_queue.SHARDS_DIR / shard_queue.WORKERS_DIR
+    stages = [
+        stage
+        for manifest in workers_dir.glob(f"*/{MANIFEST_JSON}")
+        for stage in json.loads(manifest.read_text())["stages"]
+    ]
+    assert sorted(stage["name"] for stage in stages) == ["a.fna", "b.fna", "c.fna"]
+
+    state = BatchState(batch)
+    for name in ("a.fna", "b.fna", "c.fna"):
+        assert state.is_complete(
+            f"antismash:{name}", antismash_fingerprint(batch / "input" / name)
+        )
+    assert calls[0]["resume"] and calls[0]["antismash_failures"] == {}
+
+
+def test_expired_lease_is_taken_over(batch):
+    shard_queue.init_queue(batch)
+    write_lease(batch, "a.fna", "dead", time.time() - 1)
+    write_lease(batch, "b.fna", "alive", time.time() + 60)
+
+    lease = shard_queue.claim_next_task(batch, "w1")
+    assert lease.genome_name == "a.fna" and lease.held()
+
+    # b.fna is still leased, so the next free task is c.fna
+    assert shard_queue.claim_next_task(batch, "w2").genome_name == "c.fna"
+    assert shard_queue.claim_next_task(batch, "w3") is None
+
+
+def test_expired_lease_is_taken_over_by_one_worker(batch):
+    shard_queue.init_queue(batch)
+    for _ in range(20):
+        path = write_lease(batch, "a.fna", "dead", time.time() - 1)
+        barrier = threading.Barrier(8)
+        winners = []
+
+        def acquire(worker_id):
+            lease = shard_queue.Lease(batch, "a.fna", worker_id)
+            barrier.wait()
+            if lease.acquire():
+                winners.append(worker_id)
+
+        threads = [threading.Thread(target=acquire, args=(f"w{i}",)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(winners) <= 1
+        if winners:
+            assert json.loads(path.read_text())["worker"] == winners[0]
+
+
+def test_worker_takes_over_task_of_dead_worker(batch):
+    shard_queue.init_queue(batch)
+    write_lease(batch, "a.fna", "dead", time.time() - 1)
+
+    n = shard_queue.run_shard_worker(
+        "b1", worker_id="w1", docker_runner=StubDocker(), poll=0.01
+    )
+
+    assert n == 3
+    assert shard_queue.read_done(batch, "a.fna")["worker"] == "w1"
+
+
+def test_failed_task_is_retried_after_init_queue(batch):
+    shard_queue.init_queue(batch)
+    runner = StubDocker(fail={"b.fna"})
+    shard_queue.run_shard_worker("b1", worker_id="w1", docker_runner=runner, poll=0.01)
+
+    done = shard_queue.read_done(batch, "b.fna")
+    assert done["status"] == shard_queue.FAILED and done["error"] == "exit code 1"
+
+    shard_queue.init_queue(batch)
+    assert shard_queue.read_done(batch, "b.fna") is None
+    assert shard_queue.read_done(batch, "a.fna")["status"] == shard_queue.OK
+
+    runner = StubDocker()
+    shard_queue.run_shard_worker("b1", worker_id="w2", docker_runner=runner, poll=0.01)
+
+    assert runner.runs == ["b.fna"]
+    assert shard_queue.queue_progress(batch)["ok"] == 3
+
+
+def test_worker_reruns_output_of_changed_genome(batch):
+    shard_queue.init_queue(batch)
+    shard_queue.run_shard_worker("b1", worker_id="w1", docker_runner=StubDocker(), poll=0.01)
+    state = BatchState(batch)
+    state.mark_complete(
+        "antismash:a.fna",
+        antismash_fingerprint(batch / "input" / "a.fna"),
+        [batch / "antismash" / "a"]
+    )
+
+    (batch / "input" / "a.fna").write_text(">contig0\nTTTT\n")
+    (batch / shard_queue.SHARDS_DIR / shard_queue.DONE_DIR / "a.fna.json").unlink()
+    runner = StubDocker()
+    shard_queue.run_shard_worker("b1", worker_id="w2", docker_runner=runner, poll=0.01)
+
+    assert runner.runs == ["a.fna"]
+    assert shard_queue.read_done(batch, "a.fna")["fingerprint"] == (
+        antismash_fingerprint(batch / "input" / "a.fna")
+    )